@@ -1,443 +1,2174 @@
-# Full RV32I assembler supporting R/I/S/B/U/J-type instructions.
-# Outputs Verilog-style memory assignments:
-#     memory[0] = 32'hXXXXXXXX;
-#     memory[1] = 32'hYYYYYYYY;
-#     ...
-# Supports labels, comments, and all RV32I base instructions:
-#   R-type:   add, sub, sll, slt, sltu, xor, srl, sra, or, and
-#   I-type:   addi, andi, ori, xori, slti, sltiu, slli, srli, srai, lw, jalr
-#   S-type:   sw
-#   B-type:   beq, bne, blt, bge, bltu, bgeu
-#   U-type:   lui, auipc
-#   J-type:   jal
-# Usage:
-#     python rv32i_assembler.py [--input prog.asm] [--output out_mem.v]
-# HARDCODE_INPUT_PATH / HARDCODE_OUTPUT_PATH can be set at top; if set and valid, they are used.
-
-
-import argparse
-import sys
-import os
-import re
-
-# === Configuration: hardcoded paths (optional) ===
-# If these are non-empty strings and point to valid file/dir, they will be used.
-# Otherwise fall back to CLI args or interactive prompt.
-HARDCODE_INPUT_PATH = r"E:\RISCV Single Cycle Processor using Digital Software\Asm Programs\pixel.asm"
-HARDCODE_OUTPUT_PATH = r"E:\RISCV Single Cycle Processor using Digital Software\test Programs\pixel.v"
-
-# === Instruction definitions ===
-R_TYPE = {
-    'add':  {'funct7': 0b0000000, 'funct3': 0b000, 'opcode': 0b0110011},
-    'sub':  {'funct7': 0b0100000, 'funct3': 0b000, 'opcode': 0b0110011},
-    'sll':  {'funct7': 0b0000000, 'funct3': 0b001, 'opcode': 0b0110011},
-    'slt':  {'funct7': 0b0000000, 'funct3': 0b010, 'opcode': 0b0110011},
-    'sltu': {'funct7': 0b0000000, 'funct3': 0b011, 'opcode': 0b0110011},
-    'xor':  {'funct7': 0b0000000, 'funct3': 0b100, 'opcode': 0b0110011},
-    'srl':  {'funct7': 0b0000000, 'funct3': 0b101, 'opcode': 0b0110011},
-    'sra':  {'funct7': 0b0100000, 'funct3': 0b101, 'opcode': 0b0110011},
-    'or':   {'funct7': 0b0000000, 'funct3': 0b110, 'opcode': 0b0110011},
-    'and':  {'funct7': 0b0000000, 'funct3': 0b111, 'opcode': 0b0110011},
-
-    # RV32M extension
-    'mul':  {'funct7': 0b0000001, 'funct3': 0b000, 'opcode': 0b0110011},
-    'div':  {'funct7': 0b0000001, 'funct3': 0b100, 'opcode': 0b0110011},
-    'rem':  {'funct7': 0b0000001, 'funct3': 0b110, 'opcode': 0b0110011},
-}
-
-
-I_TYPE = {
-    'addi':  {'opcode': 0b0010011, 'funct3': 0b000, 'funct7': 0b0000000},
-    'andi':  {'opcode': 0b0010011, 'funct3': 0b111},
-    'ori':   {'opcode': 0b0010011, 'funct3': 0b110},
-    'xori':  {'opcode': 0b0010011, 'funct3': 0b100},
-    'slti':  {'opcode': 0b0010011, 'funct3': 0b010},
-    'sltiu': {'opcode': 0b0010011, 'funct3': 0b011},
-    # shift-immediate: funct7 needed for slli/srli/srai
-    'slli':  {'opcode': 0b0010011, 'funct3': 0b001, 'funct7': 0b0000000},
-    'srli':  {'opcode': 0b0010011, 'funct3': 0b101, 'funct7': 0b0000000},
-    'srai':  {'opcode': 0b0010011, 'funct3': 0b101, 'funct7': 0b0100000},
-    # loads/jumps
-    'lw':    {'opcode': 0b0000011, 'funct3': 0b010},
-    'jalr':  {'opcode': 0b1100111, 'funct3': 0b000},
-}
-
-S_TYPE = {
-    'sw': {'opcode': 0b0100011, 'funct3': 0b010},
-}
-
-B_TYPE = {
-    'beq':  {'opcode': 0b1100011, 'funct3': 0b000},
-    'bne':  {'opcode': 0b1100011, 'funct3': 0b001},
-    'blt':  {'opcode': 0b1100011, 'funct3': 0b100},
-    'bge':  {'opcode': 0b1100011, 'funct3': 0b101},
-    'bltu': {'opcode': 0b1100011, 'funct3': 0b110},
-    'bgeu': {'opcode': 0b1100011, 'funct3': 0b111},
-}
-
-U_TYPE = {
-    'lui':   {'opcode': 0b0110111},
-    'auipc': {'opcode': 0b0010111},
-}
-
-J_TYPE = {
-    'jal': {'opcode': 0b1101111},
-}
-
-# Regex for register parsing: x0..x31
-REG_PATTERN = re.compile(r'^x([0-9]|[12][0-9]|3[01])$')
-
-def parse_register(reg_str):
-    """Parse register string 'x0'..'x31' and return integer 0..31."""
-    m = REG_PATTERN.match(reg_str)
-    if not m:
-        raise ValueError(f"Invalid register '{reg_str}'")
-    return int(m.group(1))
-
-def parse_immediate(imm_str):
-    """
-    Parse immediate: decimal or hex (0x...). Returns Python int (signed or unsigned as per usage).
-    Note: For branch/jump offsets, user writes label or immediate. Label-handling done separately.
-    """
-    try:
-        # int(str, 0) handles 0x..., decimal, and also octal if prefixed.
-        val = int(imm_str, 0)
-    except ValueError:
-        raise ValueError(f"Invalid immediate '{imm_str}'")
-    return val
-
-# === Encoding functions ===
-
-def encode_r_type(mnemonic, rd, rs1, rs2):
-    info = R_TYPE[mnemonic]
-    funct7 = info['funct7'] & 0x7F
-    funct3 = info['funct3'] & 0x7
-    opcode = info['opcode'] & 0x7F
-    return (funct7 << 25) | ((rs2 & 0x1F) << 20) | ((rs1 & 0x1F) << 15) | (funct3 << 12) | ((rd & 0x1F) << 7) | opcode
-
-def encode_i_type(mnemonic, rd, rs1, imm):
-    info = I_TYPE[mnemonic]
-    funct3 = info['funct3'] & 0x7
-    opcode = info['opcode'] & 0x7F
-    imm12 = imm & 0xFFF if imm >= 0 else (imm + (1 << 12)) & 0xFFF
-    return (imm12 << 20) | ((rs1 & 0x1F) << 15) | (funct3 << 12) | ((rd & 0x1F) << 7) | opcode
-
-def encode_i_shift_type(mnemonic, rd, rs1, shamt):
-    info = I_TYPE[mnemonic]
-    funct7 = info.get('funct7', 0) & 0x7F
-    funct3 = info['funct3'] & 0x7
-    opcode = info['opcode'] & 0x7F
-    shamt5 = shamt & 0x1F
-    return (funct7 << 25) | (shamt5 << 20) | ((rs1 & 0x1F) << 15) | (funct3 << 12) | ((rd & 0x1F) << 7) | opcode
-
-def encode_s_type(mnemonic, rs2, rs1, imm):
-    info = S_TYPE[mnemonic]
-    funct3 = info['funct3'] & 0x7
-    opcode = info['opcode'] & 0x7F
-    imm12 = imm & 0xFFF
-    imm11_5 = (imm12 >> 5) & 0x7F
-    imm4_0  = imm12 & 0x1F
-    return (imm11_5 << 25) | ((rs2 & 0x1F) << 20) | ((rs1 & 0x1F) << 15) | (funct3 << 12) | (imm4_0 << 7) | opcode
-
-def encode_b_type(mnemonic, rs1, rs2, imm):
-    info = B_TYPE[mnemonic]
-    funct3 = info['funct3'] & 0x7
-    opcode = info['opcode'] & 0x7F
-    # imm is byte offset (can be negative). Must be multiple of 2; lower bit always zero in encoding.
-    imm12 = imm & 0x1000  # bit12
-    # Actually imm is signed 13-bit (bit12 is sign), but in encoding:
-    # imm[12] -> bit31, imm[10:5] -> bits30:25, imm[4:1] -> bits11:8, imm[11] -> bit7, LSB is zero.
-    # We take imm & 0x1FFF to cover bits 12..0.
-    imm13 = imm & 0x1FFF if imm >= 0 else (imm + (1 << 13)) & 0x1FFF
-    bit12 = (imm13 >> 12) & 0x1
-    bits10_5 = (imm13 >> 5) & 0x3F
-    bits4_1 = (imm13 >> 1) & 0xF
-    bit11 = (imm13 >> 11) & 0x1
-    return (bit12 << 31) | (bits10_5 << 25) | ((rs2 & 0x1F) << 20) | ((rs1 & 0x1F) << 15) | (funct3 << 12) | (bits4_1 << 8) | (bit11 << 7) | opcode
-
-def encode_u_type(mnemonic, rd, imm):
-    info = U_TYPE[mnemonic]
-    opcode = info['opcode'] & 0x7F
-    imm20 = (imm & 0xFFFFF) << 12
-    return imm20 | ((rd & 0x1F) << 7) | opcode
-
-def encode_j_type(mnemonic, rd, imm):
-    info = J_TYPE[mnemonic]
-    imm20 = (imm >> 20) & 0x1
-    imm10_1 = (imm >> 1) & 0x3FF
-    imm11 = (imm >> 11) & 0x1
-    imm19_12 = (imm >> 12) & 0xFF
-    return (imm20 << 31) | (imm10_1 << 21) | (imm11 << 20) | (imm19_12 << 12) | \
-        ((rd & 0x1F) << 7) | (info['opcode'] & 0x7F)
-
-# === Utility functions ===
-
-def prompt_for_path(prompt_msg, must_exist=False, default=None):
-    """
-    Prompt user for a file path. If must_exist=True, keep prompting until an existing file path is entered.
-    If must_exist=False, check that directory exists.
-    default: default path to show in prompt.
-    """
-    while True:
-        if default:
-            resp = input(f"{prompt_msg} [default: {default}]: ").strip()
-            path = resp if resp else default
-        else:
-            path = input(f"{prompt_msg}: ").strip()
-        # Strip quotes if any
-        if (path.startswith('"') and path.endswith('"')) or (path.startswith("'") and path.endswith("'")):
-            path = path[1:-1]
-        path = os.path.expanduser(path)
-        if must_exist:
-            if os.path.isfile(path):
-                return path
-            else:
-                print(f"Path '{path}' does not exist or is not a file. Please try again.")
-        else:
-            dirn = os.path.dirname(path) or '.'
-            if os.path.isdir(dirn):
-                return path
-            else:
-                print(f"Directory '{dirn}' does not exist. Please enter a valid path.")
-
-def write_verilog_memory_file(output_path, machine_words):
-    """
-    Write lines like:
-       memory[0] = 32'hXXXXXXXX;
-       memory[1] = 32'hYYYYYYYY;
-    """
-    try:
-        with open(output_path, 'w') as f:
-            for i, word in enumerate(machine_words):
-                hexstr = f"{word & 0xFFFFFFFF:08X}"
-                f.write(f"    memory[{i}] = 32'h{hexstr};\n")
-    except Exception as e:
-        print(f"Failed to write Verilog memory file '{output_path}': {e}", file=sys.stderr)
-        sys.exit(1)
-    print(f"Wrote Verilog memory assignments to '{output_path}', {len(machine_words)} entries.")
-
-# === Assembler logic ===
-
-def updated_assemble(asm_lines):
-    """
-    First pass: collect labels and instruction lines.
-    Second pass: encode each instruction to 32-bit word.
-    """
-    labels = {}
-    instructions = []
-    pc = 0
-    # First pass: label collection
-    for lineno, line in enumerate(asm_lines, start=1):
-        # Remove comments
-        if '#' in line:
-            line = line.split('#', 1)[0]
-        line = line.strip()
-        if not line:
-            continue
-        # Check for label definition: label: possibly followed by instruction
-        if ':' in line:
-            parts = line.split(':', 1)
-            label = parts[0].strip()
-            if not re.match(r'^[A-Za-z_]\w*$', label):
-                raise ValueError(f"Invalid label '{label}' on line {lineno}")
-            if label in labels:
-                raise ValueError(f"Duplicate label '{label}' on line {lineno}")
-            labels[label] = pc
-            rest = parts[1].strip()
-            if rest:
-                # There's instruction after label on same line
-                instructions.append((lineno, rest))
-                pc += 4
-        else:
-            instructions.append((lineno, line))
-            pc += 4
-
-    # Second pass: encode instructions
-    machine_words = []
-    for idx, (lineno, inst_line) in enumerate(instructions):
-        curr_pc = idx * 4
-        text = inst_line.strip()
-        if not text:
-            continue
-        # Split tokens by whitespace, commas, parentheses.
-        tokens = re.split(r'[,\s()]+', text)
-        tokens = [tok for tok in tokens if tok]
-        mnemonic = tokens[0].lower()
-        try:
-            if mnemonic in R_TYPE:
-                # Expect: mnemonic rd, rs1, rs2
-                if len(tokens) != 4:
-                    raise ValueError(f"R-type '{mnemonic}' expects 3 operands (rd, rs1, rs2)")
-                rd = parse_register(tokens[1])
-                rs1 = parse_register(tokens[2])
-                rs2 = parse_register(tokens[3])
-                word = encode_r_type(mnemonic, rd, rs1, rs2)
-
-            elif mnemonic in I_TYPE:
-                if mnemonic == 'lw':
-                    # Expect: lw rd, imm(rs1) or tokens: ['lw','rd','imm','rs1']
-                    # After split: tokens[1]=rd, tokens[2]=imm, tokens[3]=rs1
-                    if len(tokens) != 4:
-                        raise ValueError(f"Invalid lw syntax on line {lineno}: '{inst_line}'")
-                    rd = parse_register(tokens[1])
-                    imm = parse_immediate(tokens[2])
-                    rs1 = parse_register(tokens[3])
-                    word = encode_i_type('lw', rd, rs1, imm)
-                elif mnemonic in ('slli', 'srli', 'srai'):
-                    # Expect: mnemonic rd, rs1, shamt
-                    if len(tokens) != 4:
-                        raise ValueError(f"Shift-immediate '{mnemonic}' expects 3 operands")
-                    rd = parse_register(tokens[1])
-                    rs1 = parse_register(tokens[2])
-                    shamt = parse_immediate(tokens[3])
-                    # Optionally: check shamt fits 5 bits (0..31)
-                    if shamt < 0 or shamt > 31:
-                        raise ValueError(f"Shift amount out of range 0..31: {shamt}")
-                    word = encode_i_shift_type(mnemonic, rd, rs1, shamt)
-                elif mnemonic == 'jalr':
-                    if len(tokens) != 4:
-                        raise ValueError(f"I-type '{mnemonic}' expects 3 operands")
-                    rd = parse_register(tokens[1])
-                    rs1 = parse_register(tokens[2])
-                    imm = parse_immediate(tokens[3])
-                    word = encode_i_type(mnemonic, rd, rs1, imm)
-                else:
-                    # Other I-type arithmetic: addi, andi, ori, xori, slti, sltiu
-                    if len(tokens) != 4:
-                        raise ValueError(f"I-type '{mnemonic}' expects 3 operands (rd, rs1, imm)")
-                    rd = parse_register(tokens[1])
-                    rs1 = parse_register(tokens[2])
-                    imm = parse_immediate(tokens[3])
-                    word = encode_i_type(mnemonic, rd, rs1, imm)
-
-            elif mnemonic in S_TYPE:
-                # sw rs2, imm(rs1)
-                # After split: tokens = ['sw', 'rs2', 'imm', 'rs1']
-                if len(tokens) != 4:
-                    raise ValueError(f"S-type '{mnemonic}' expects syntax 'sw rs2, imm(rs1)'")
-                rs2 = parse_register(tokens[1])
-                imm = parse_immediate(tokens[2])
-                rs1 = parse_register(tokens[3])
-                word = encode_s_type('sw', rs2, rs1, imm)
-
-            elif mnemonic in B_TYPE:
-                # beq rs1, rs2, label_or_imm
-                if len(tokens) != 4:
-                    raise ValueError(f"B-type '{mnemonic}' expects 3 operands (rs1, rs2, target)")
-                rs1 = parse_register(tokens[1])
-                rs2 = parse_register(tokens[2])
-                target = tokens[3]
-                if re.match(r'^[A-Za-z_]\w*$', target):
-                    if target not in labels:
-                        raise ValueError(f"Undefined label '{target}' on line {lineno}")
-                    target_addr = labels[target]
-                    imm = target_addr - curr_pc
-                else:
-                    imm = parse_immediate(target)
-                word = encode_b_type(mnemonic, rs1, rs2, imm)
-
-            elif mnemonic in U_TYPE:
-                # lui rd, imm  or auipc rd, imm
-                if len(tokens) != 3:
-                    raise ValueError(f"U-type '{mnemonic}' expects 2 operands (rd, imm20)")
-                rd = parse_register(tokens[1])
-                imm = parse_immediate(tokens[2])
-                word = encode_u_type(mnemonic, rd, imm)
-
-            elif mnemonic in J_TYPE:
-                # jal rd, label_or_imm
-                if len(tokens) != 3:
-                    raise ValueError(f"J-type '{mnemonic}' expects 2 operands (rd, target)")
-                rd = parse_register(tokens[1])
-                target = tokens[2]
-                if re.match(r'^[A-Za-z_]\w*$', target):
-                    if target not in labels:
-                        raise ValueError(f"Undefined label '{target}' on line {lineno}")
-                    target_addr = labels[target]
-                    imm = target_addr - curr_pc
-                else:
-                    imm = parse_immediate(target)
-                word = encode_j_type('jal', rd, imm)
-
-            else:
-                raise ValueError(f"Unsupported instruction '{mnemonic}' on line {lineno}")
-
-        except ValueError as ve:
-            print(f"Error at line {lineno}: {ve}", file=sys.stderr)
-            print(f"  >>> {inst_line}", file=sys.stderr)
-            sys.exit(1)
-
-        machine_words.append(word)
-
-    return machine_words
-
-def main():
-    parser = argparse.ArgumentParser(description="Extended RISC-V RV32I assembler → Verilog memory[...] assignments")
-    parser.add_argument("--input", "-i", help="Input assembly file (.asm)")
-    parser.add_argument("--output", "-o", help="Output file for Verilog assignments")
-    args = parser.parse_args()
-
-    # Determine input path
-    asm_path = None
-    # 1. HARDCODE_INPUT_PATH if valid file
-    if HARDCODE_INPUT_PATH:
-        p = os.path.expanduser(HARDCODE_INPUT_PATH.strip('"').strip("'"))
-        if os.path.isfile(p):
-            asm_path = p
-        else:
-            # warn but continue
-            print(f"Warning: HARDCODE_INPUT_PATH '{p}' not found. Ignoring hardcode.", file=sys.stderr)
-    # 2. CLI arg
-    if asm_path is None and args.input:
-        p = os.path.expanduser(args.input.strip('"').strip("'"))
-        if os.path.isfile(p):
-            asm_path = p
-        else:
-            print(f"Warning: input file '{p}' not found. Will prompt.", file=sys.stderr)
-    # 3. Prompt
-    if asm_path is None:
-        asm_path = prompt_for_path("Enter path to input .asm file", must_exist=True)
-
-    # Determine output path
-    out_path = None
-    # HARDCODE_OUTPUT_PATH if its directory exists
-    if HARDCODE_OUTPUT_PATH:
-        p = os.path.expanduser(HARDCODE_OUTPUT_PATH.strip('"').strip("'"))
-        dirn = os.path.dirname(p) or '.'
-        if os.path.isdir(dirn):
-            out_path = p
-        else:
-            print(f"Warning: HARDCODE_OUTPUT_PATH directory '{dirn}' not exist. Ignoring hardcode.", file=sys.stderr)
-    # CLI arg
-    if out_path is None and args.output:
-        p = os.path.expanduser(args.output.strip('"').strip("'"))
-        dirn = os.path.dirname(p) or '.'
-        if os.path.isdir(dirn):
-            out_path = p
-        else:
-            print(f"Warning: directory for output '{dirn}' does not exist. Will prompt.", file=sys.stderr)
-    # Prompt if still None
-    if out_path is None:
-        default_out = os.path.splitext(asm_path)[0] + "_mem.v"
-        out_path = prompt_for_path("Enter path to output Verilog memory file", must_exist=False, default=default_out)
-
-    # Read lines
-    try:
-        with open(asm_path, 'r') as f:
-            lines = f.readlines()
-    except Exception as e:
-        print(f"Error reading '{asm_path}': {e}", file=sys.stderr)
-        sys.exit(1)
-
-    # Assemble
-    try:
-        machine_words = updated_assemble(lines)
-    except Exception as e:
-        print(f"Assembly failed: {e}", file=sys.stderr)
-        sys.exit(1)
-
-    # Write output
-    write_verilog_memory_file(out_path, machine_words)
-
-if __name__ == "__main__":
-    main()
+# Full RV32I assembler supporting R/I/S/B/U/J-type instructions.
+# Outputs Verilog-style memory assignments:
+#     memory[0] = 32'hXXXXXXXX;
+#     memory[1] = 32'hYYYYYYYY;
+#     ...
+# Supports labels, comments, .data/.text sections with .byte/.half/.word/.space/.align
+# directives (see "Data section" below), %hi()/%lo() operands, pseudo-instructions (li, la, mv,
+# nop, j, jr, ret, call, beqz, ..., see "Pseudo-instructions" below) and all RV32I base instructions:
+#   R-type:   add, sub, sll, slt, sltu, xor, srl, sra, or, and
+#   I-type:   addi, andi, ori, xori, slti, sltiu, slli, srli, srai, lw, jalr
+#   S-type:   sw
+#   B-type:   beq, bne, blt, bge, bltu, bgeu
+#   U-type:   lui, auipc
+#   J-type:   jal
+# Usage:
+#     python rv32i_assembler.py [--input prog.asm] [--output out_mem.v] [--hex-output out.hex]
+#                               [--data-output out_data.hex] [--data-base 0x10000]
+#                               [--no-prompt] [--stream | --ir] [--stats] [--profile prog.prof]
+#     python rv32i_assembler.py -i prog.asm -x "../Test Programs/test.hex" --watch [more.asm ...]
+# Library use (no printing, no sys.exit):
+#     from Assembler import assemble, AssemblyError
+#     program = assemble(source_text)    # Program: .words, .labels, .line_numbers, .data
+#     program.ram_words()                 # Data Memory image (RAM word 0 = DATA_BASE)
+#     stats = AssemblyStats(); assemble(source_text, stats=stats); print(stats.report())
+#     add_stats_hook(fn)                  # fn(stats) after every assembly, for build systems
+#     ir = assemble_ir(open(path))        # ProgramIR: compact columns; ir.encode(), ir.rows()
+# HARDCODE_INPUT_PATH / HARDCODE_OUTPUT_PATH can be set at top; if set and valid, they are used.
+# They (and the prompts) only apply to interactive runs: with --no-prompt, or when stdin is
+# not a terminal (CI), --input is required and nothing is probed or asked.
+# build_zipapp.py packs this CLI into a single assembler.pyz.
+
+
+# Only cheap modules are imported here: argparse and re are imported where they are
+# used (parse_args(), read_verilog_memory_file()), so assembling never pays for them.
+import sys
+import os
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import islice
+
+# === Configuration: hardcoded paths (optional) ===
+# If these are non-empty strings and point to valid file/dir, they will be used.
+# Otherwise fall back to CLI args or interactive prompt.
+HARDCODE_INPUT_PATH = r"E:\RISCV Single Cycle Processor using Digital Software\Asm Programs\pixel.asm"
+HARDCODE_OUTPUT_PATH = r"E:\RISCV Single Cycle Processor using Digital Software\test Programs\pixel.v"
+
+# === Instruction definitions ===
+R_TYPE = {
+    'add':  {'funct7': 0b0000000, 'funct3': 0b000, 'opcode': 0b0110011},
+    'sub':  {'funct7': 0b0100000, 'funct3': 0b000, 'opcode': 0b0110011},
+    'sll':  {'funct7': 0b0000000, 'funct3': 0b001, 'opcode': 0b0110011},
+    'slt':  {'funct7': 0b0000000, 'funct3': 0b010, 'opcode': 0b0110011},
+    'sltu': {'funct7': 0b0000000, 'funct3': 0b011, 'opcode': 0b0110011},
+    'xor':  {'funct7': 0b0000000, 'funct3': 0b100, 'opcode': 0b0110011},
+    'srl':  {'funct7': 0b0000000, 'funct3': 0b101, 'opcode': 0b0110011},
+    'sra':  {'funct7': 0b0100000, 'funct3': 0b101, 'opcode': 0b0110011},
+    'or':   {'funct7': 0b0000000, 'funct3': 0b110, 'opcode': 0b0110011},
+    'and':  {'funct7': 0b0000000, 'funct3': 0b111, 'opcode': 0b0110011},
+
+    # RV32M extension
+    'mul':  {'funct7': 0b0000001, 'funct3': 0b000, 'opcode': 0b0110011},
+    'div':  {'funct7': 0b0000001, 'funct3': 0b100, 'opcode': 0b0110011},
+    'rem':  {'funct7': 0b0000001, 'funct3': 0b110, 'opcode': 0b0110011},
+}
+
+
+I_TYPE = {
+    'addi':  {'opcode': 0b0010011, 'funct3': 0b000, 'funct7': 0b0000000},
+    'andi':  {'opcode': 0b0010011, 'funct3': 0b111},
+    'ori':   {'opcode': 0b0010011, 'funct3': 0b110},
+    'xori':  {'opcode': 0b0010011, 'funct3': 0b100},
+    'slti':  {'opcode': 0b0010011, 'funct3': 0b010},
+    'sltiu': {'opcode': 0b0010011, 'funct3': 0b011},
+    # shift-immediate: funct7 needed for slli/srli/srai
+    'slli':  {'opcode': 0b0010011, 'funct3': 0b001, 'funct7': 0b0000000},
+    'srli':  {'opcode': 0b0010011, 'funct3': 0b101, 'funct7': 0b0000000},
+    'srai':  {'opcode': 0b0010011, 'funct3': 0b101, 'funct7': 0b0100000},
+    # loads/jumps
+    'lw':    {'opcode': 0b0000011, 'funct3': 0b010},
+    'jalr':  {'opcode': 0b1100111, 'funct3': 0b000},
+}
+
+S_TYPE = {
+    'sw': {'opcode': 0b0100011, 'funct3': 0b010},
+}
+
+B_TYPE = {
+    'beq':  {'opcode': 0b1100011, 'funct3': 0b000},
+    'bne':  {'opcode': 0b1100011, 'funct3': 0b001},
+    'blt':  {'opcode': 0b1100011, 'funct3': 0b100},
+    'bge':  {'opcode': 0b1100011, 'funct3': 0b101},
+    'bltu': {'opcode': 0b1100011, 'funct3': 0b110},
+    'bgeu': {'opcode': 0b1100011, 'funct3': 0b111},
+}
+
+U_TYPE = {
+    'lui':   {'opcode': 0b0110111},
+    'auipc': {'opcode': 0b0010111},
+}
+
+J_TYPE = {
+    'jal': {'opcode': 0b1101111},
+}
+
+def parse_register(reg_str):
+    """Parse register string 'x0'..'x31' and return integer 0..31."""
+    reg = REGISTERS.get(reg_str)
+    if reg is None:
+        raise ValueError(f"Invalid register '{reg_str}'")
+    return reg
+
+def parse_immediate(imm_str):
+    """
+    Parse immediate: decimal or hex (0x...). Returns Python int (signed or unsigned as per usage).
+    Note: For branch/jump offsets, user writes label or immediate. Label-handling done separately.
+    """
+    try:
+        # int(str, 0) handles 0x..., decimal, and also octal if prefixed.
+        val = int(imm_str, 0)
+    except ValueError:
+        raise ValueError(f"Invalid immediate '{imm_str}'")
+    return val
+
+# === Encoding functions ===
+
+def encode_r_type(mnemonic, rd, rs1, rs2):
+    info = R_TYPE[mnemonic]
+    funct7 = info['funct7'] & 0x7F
+    funct3 = info['funct3'] & 0x7
+    opcode = info['opcode'] & 0x7F
+    return (funct7 << 25) | ((rs2 & 0x1F) << 20) | ((rs1 & 0x1F) << 15) | (funct3 << 12) | ((rd & 0x1F) << 7) | opcode
+
+def encode_i_type(mnemonic, rd, rs1, imm):
+    info = I_TYPE[mnemonic]
+    funct3 = info['funct3'] & 0x7
+    opcode = info['opcode'] & 0x7F
+    imm12 = imm & 0xFFF if imm >= 0 else (imm + (1 << 12)) & 0xFFF
+    return (imm12 << 20) | ((rs1 & 0x1F) << 15) | (funct3 << 12) | ((rd & 0x1F) << 7) | opcode
+
+def encode_i_shift_type(mnemonic, rd, rs1, shamt):
+    info = I_TYPE[mnemonic]
+    funct7 = info.get('funct7', 0) & 0x7F
+    funct3 = info['funct3'] & 0x7
+    opcode = info['opcode'] & 0x7F
+    shamt5 = shamt & 0x1F
+    return (funct7 << 25) | (shamt5 << 20) | ((rs1 & 0x1F) << 15) | (funct3 << 12) | ((rd & 0x1F) << 7) | opcode
+
+def encode_s_type(mnemonic, rs2, rs1, imm):
+    info = S_TYPE[mnemonic]
+    funct3 = info['funct3'] & 0x7
+    opcode = info['opcode'] & 0x7F
+    imm12 = imm & 0xFFF
+    imm11_5 = (imm12 >> 5) & 0x7F
+    imm4_0  = imm12 & 0x1F
+    return (imm11_5 << 25) | ((rs2 & 0x1F) << 20) | ((rs1 & 0x1F) << 15) | (funct3 << 12) | (imm4_0 << 7) | opcode
+
+def encode_b_type(mnemonic, rs1, rs2, imm):
+    info = B_TYPE[mnemonic]
+    funct3 = info['funct3'] & 0x7
+    opcode = info['opcode'] & 0x7F
+    # imm is byte offset (can be negative). Must be multiple of 2; lower bit always zero in encoding.
+    imm12 = imm & 0x1000  # bit12
+    # Actually imm is signed 13-bit (bit12 is sign), but in encoding:
+    # imm[12] -> bit31, imm[10:5] -> bits30:25, imm[4:1] -> bits11:8, imm[11] -> bit7, LSB is zero.
+    # We take imm & 0x1FFF to cover bits 12..0.
+    imm13 = imm & 0x1FFF if imm >= 0 else (imm + (1 << 13)) & 0x1FFF
+    bit12 = (imm13 >> 12) & 0x1
+    bits10_5 = (imm13 >> 5) & 0x3F
+    bits4_1 = (imm13 >> 1) & 0xF
+    bit11 = (imm13 >> 11) & 0x1
+    return (bit12 << 31) | (bits10_5 << 25) | ((rs2 & 0x1F) << 20) | ((rs1 & 0x1F) << 15) | (funct3 << 12) | (bits4_1 << 8) | (bit11 << 7) | opcode
+
+def encode_u_type(mnemonic, rd, imm):
+    info = U_TYPE[mnemonic]
+    opcode = info['opcode'] & 0x7F
+    imm20 = (imm & 0xFFFFF) << 12
+    return imm20 | ((rd & 0x1F) << 7) | opcode
+
+def encode_j_type(mnemonic, rd, imm):
+    info = J_TYPE[mnemonic]
+    imm20 = (imm >> 20) & 0x1
+    imm10_1 = (imm >> 1) & 0x3FF
+    imm11 = (imm >> 11) & 0x1
+    imm19_12 = (imm >> 12) & 0xFF
+    return (imm20 << 31) | (imm10_1 << 21) | (imm11 << 20) | (imm19_12 << 12) | \
+        ((rd & 0x1F) << 7) | (info['opcode'] & 0x7F)
+
+# === Dispatch table ===
+# One entry per mnemonic: (base_word, operand_parser, operand_count, syntax).
+# base_word already has opcode/funct3/funct7 ORed in, so encoding a line is just
+#     word = base_word | operand_parser(operands, pc, labels)
+# Operand parsers return the register/immediate fields already shifted into place.
+# Registers are plain REGISTERS[...] lookups; the encode loop turns a KeyError into
+# the same "Invalid register" error parse_register() raises.
+
+REGISTERS = {f"x{i}": i for i in range(32)}
+_R = REGISTERS
+_LABEL_START = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_")
+
+def is_label(tok):
+    """True for a valid label name: a letter or '_' followed by letters, digits or '_'."""
+    return tok.isidentifier() and tok[0] in _LABEL_START
+
+# Reach of the pc-relative B-type and J-type offsets (bytes)
+B_RANGE = (-(1 << 12), (1 << 12) - 2)
+J_RANGE = (-(1 << 20), (1 << 20) - 2)
+B_REACH, J_REACH = -B_RANGE[0], -J_RANGE[0]
+
+def _target(tok, pc, labels):
+    """Resolve a branch/jump operand (label or literal offset) to a pc-relative offset."""
+    addr = labels.get(tok)
+    if addr is not None:
+        return addr - pc
+    if is_label(tok):
+        raise ValueError(f"Undefined label '{tok}'")
+    return parse_immediate(tok)
+
+def _operands_r(ops, pc, labels):
+    # rd, rs1, rs2
+    return (_R[ops[2]] << 20) | (_R[ops[1]] << 15) | (_R[ops[0]] << 7)
+
+def _operands_i(ops, pc, labels):
+    # rd, rs1, imm
+    imm = parse_immediate(ops[2])
+    return ((imm & 0xFFF) << 20) | (_R[ops[1]] << 15) | (_R[ops[0]] << 7)
+
+def _operands_shift(ops, pc, labels):
+    # rd, rs1, shamt
+    shamt = parse_immediate(ops[2])
+    if shamt < 0 or shamt > 31:
+        raise ValueError(f"Shift amount out of range 0..31: {shamt}")
+    return (shamt << 20) | (_R[ops[1]] << 15) | (_R[ops[0]] << 7)
+
+def _operands_load(ops, pc, labels):
+    # rd, imm(rs1) -> tokens rd, imm, rs1
+    imm = parse_immediate(ops[1])
+    return ((imm & 0xFFF) << 20) | (_R[ops[2]] << 15) | (_R[ops[0]] << 7)
+
+def _operands_jalr(ops, pc, labels):
+    # Both 'jalr rd, rs1, imm' and 'jalr rd, imm(rs1)' appear in the example programs.
+    if ops[1] in REGISTERS:
+        return _operands_i(ops, pc, labels)
+    return _operands_load(ops, pc, labels)
+
+def _operands_s(ops, pc, labels):
+    # rs2, imm(rs1) -> tokens rs2, imm, rs1
+    imm = parse_immediate(ops[1])
+    return (((imm >> 5) & 0x7F) << 25) | (_R[ops[0]] << 20) | (_R[ops[2]] << 15) | ((imm & 0x1F) << 7)
+
+def _operands_b(ops, pc, labels):
+    # rs1, rs2, label_or_imm
+    imm = _target(ops[2], pc, labels)
+    if not B_RANGE[0] <= imm <= B_RANGE[1]:
+        raise ValueError(f"Branch target out of range ({imm:+d} bytes, B-type reaches +/-4 KiB)")
+    return (((imm >> 12) & 0x1) << 31) | (((imm >> 5) & 0x3F) << 25) | (_R[ops[1]] << 20) | \
+        (_R[ops[0]] << 15) | (((imm >> 1) & 0xF) << 8) | (((imm >> 11) & 0x1) << 7)
+
+def _operands_u(ops, pc, labels):
+    # rd, imm20
+    imm = parse_immediate(ops[1])
+    return ((imm & 0xFFFFF) << 12) | (_R[ops[0]] << 7)
+
+def _operands_j(ops, pc, labels):
+    # rd, label_or_imm
+    imm = _target(ops[1], pc, labels)
+    if not J_RANGE[0] <= imm <= J_RANGE[1]:
+        raise ValueError(f"Jump target out of range ({imm:+d} bytes, jal reaches +/-1 MiB)")
+    return (((imm >> 20) & 0x1) << 31) | (((imm >> 1) & 0x3FF) << 21) | (((imm >> 11) & 0x1) << 20) | \
+        (((imm >> 12) & 0xFF) << 12) | (_R[ops[0]] << 7)
+
+def build_dispatch_table():
+    """
+    Build {mnemonic: (base_word, operand_parser, operand_count, syntax)} from the
+    instruction definition dicts. Base words come from the per-format encoders with
+    all operands zero, so the table can never disagree with them.
+    """
+    table = {}
+    for mnemonic in R_TYPE:
+        table[mnemonic] = (encode_r_type(mnemonic, 0, 0, 0), _operands_r, 3, "rd, rs1, rs2")
+    for mnemonic in I_TYPE:
+        if mnemonic == 'lw':
+            table[mnemonic] = (encode_i_type(mnemonic, 0, 0, 0), _operands_load, 3, "rd, imm(rs1)")
+        elif mnemonic == 'jalr':
+            table[mnemonic] = (encode_i_type(mnemonic, 0, 0, 0), _operands_jalr, 3, "rd, imm(rs1)")
+        elif mnemonic in ('slli', 'srli', 'srai'):
+            table[mnemonic] = (encode_i_shift_type(mnemonic, 0, 0, 0), _operands_shift, 3, "rd, rs1, shamt")
+        else:
+            table[mnemonic] = (encode_i_type(mnemonic, 0, 0, 0), _operands_i, 3, "rd, rs1, imm")
+    for mnemonic in S_TYPE:
+        table[mnemonic] = (encode_s_type(mnemonic, 0, 0, 0), _operands_s, 3, "rs2, imm(rs1)")
+    for mnemonic in B_TYPE:
+        table[mnemonic] = (encode_b_type(mnemonic, 0, 0, 0), _operands_b, 3, "rs1, rs2, target")
+    for mnemonic in U_TYPE:
+        table[mnemonic] = (encode_u_type(mnemonic, 0, 0), _operands_u, 2, "rd, imm20")
+    for mnemonic in J_TYPE:
+        table[mnemonic] = (encode_j_type(mnemonic, 0, 0), _operands_j, 2, "rd, target")
+    return table
+
+DISPATCH_TABLE = build_dispatch_table()
+
+def _operands_word(ops, pc, labels):
+    # value_or_label: a raw 32-bit word in the instruction stream
+    if ops[0] in labels:
+        value = labels[ops[0]]
+    elif is_label(ops[0]):
+        raise ValueError(f"Undefined label '{ops[0]}'")
+    else:
+        value = parse_immediate(ops[0])
+    if not -(1 << 31) <= value < (1 << 32):
+        raise ValueError(f"Value {value} does not fit in a .word")
+    return value & 0xFFFFFFFF
+
+# Directives that pass 1 leaves in the instruction stream (one value per line); kept out
+# of DISPATCH_TABLE so tools that enumerate mnemonics only see real instructions.
+TEXT_DIRECTIVES = {
+    '.word': (0, _operands_word, 1, "value"),
+}
+
+def expand_relocations(text, labels):
+    """
+    Replace every %hi(sym) / %lo(sym) in an instruction with its value; sym is a label or a
+    number. %hi is the upper-20 value for lui/auipc, rounded so that adding the sign-extended
+    %lo gives back sym: 'lui x10, %hi(buf)' + 'addi x10, x10, %lo(buf)' loads buf's address.
+    Raises ValueError for unknown operators, undefined labels or a missing ')'.
+    """
+    parts = []
+    pos = 0
+    while True:
+        start = text.find('%', pos)
+        if start < 0:
+            break
+        kind = text[start + 1:start + 3]
+        if kind not in ('hi', 'lo') or text[start + 3:start + 4] != '(':
+            raise ValueError(f"Unknown relocation '{text[start:].split()[0]}' (expected %hi(...) or %lo(...))")
+        end = text.find(')', start)
+        if end < 0:
+            raise ValueError(f"Missing ')' after '{text[start:]}'")
+        sym = text[start + 4:end].strip()
+        if sym in labels:
+            value = labels[sym]
+        elif is_label(sym):
+            raise ValueError(f"Undefined label '{sym}'")
+        else:
+            value = parse_immediate(sym)
+        hi = (value + 0x800) >> 12
+        parts.append(text[pos:start])
+        parts.append(str(hi & 0xFFFFF if kind == 'hi' else value - (hi << 12)))
+        pos = end + 1
+    parts.append(text[pos:])
+    return "".join(parts)
+
+# === Pseudo-instructions ===
+# Expanded in pass 1 (scan_instructions), so label addresses account for their length.
+# Each expander takes the operand tokens and the labels defined so far and returns the
+# real instruction lines. Constants get the shortest sequence:
+#     li x5, 100       -> addi x5, x0, 100                 (fits in 12 bits)
+#     li x5, 0x12000   -> lui x5, 0x12                     (low 12 bits zero)
+#     li x5, 0x12345   -> lui x5, 0x12; addi x5, x5, 0x345 (lui rounded up when the low part is negative)
+# 'la' of a .data label defined above it is a constant too. Any other label takes
+# lui + addi with %hi/%lo: a forward label's address is not known yet, and text addresses
+# can still move when relax_branches() lengthens a branch.
+
+def _hi_lo(value):
+    """Split a 32-bit constant into (hi20, lo12) with lui(hi20) + sign-extended lo12 == value."""
+    value &= 0xFFFFFFFF
+    if value >= 1 << 31:
+        value -= 1 << 32
+    hi = (value + 0x800) >> 12
+    return hi & 0xFFFFF, value - (hi << 12)
+
+def load_constant(rd, value):
+    """Shortest instruction sequence (1 or 2 lines) that sets rd to a 32-bit constant."""
+    if not -(1 << 31) <= value < (1 << 32):
+        raise ValueError(f"Constant {value} does not fit in 32 bits")
+    hi, lo = _hi_lo(value)
+    if hi == 0:
+        return [f"addi {rd}, x0, {lo}"]
+    if lo == 0:
+        return [f"lui {rd}, {hi:#x}"]
+    return [f"lui {rd}, {hi:#x}", f"addi {rd}, {rd}, {lo}"]
+
+def _pseudo_li(ops, labels):
+    return load_constant(ops[0], parse_immediate(ops[1]))
+
+def _pseudo_la(ops, labels):
+    rd, sym = ops
+    if sym in labels:
+        return load_constant(rd, labels[sym])
+    if not is_label(sym):
+        raise ValueError(f"Invalid label '{sym}'")
+    return [f"lui {rd}, %hi({sym})", f"addi {rd}, {rd}, %lo({sym})"]
+
+def _pseudo(template):
+    """Expander for a fixed one-line expansion; template uses {0}, {1}, ... for the operands."""
+    return lambda ops, labels: [template.format(*ops)]
+
+# {mnemonic: (expander, operand_count, syntax)}
+PSEUDO_INSTRUCTIONS = {
+    'nop':  (_pseudo("addi x0, x0, 0"), 0, ""),
+    'li':   (_pseudo_li, 2, "rd, imm"),
+    'la':   (_pseudo_la, 2, "rd, label"),
+    'mv':   (_pseudo("addi {0}, {1}, 0"), 2, "rd, rs"),
+    'not':  (_pseudo("xori {0}, {1}, -1"), 2, "rd, rs"),
+    'neg':  (_pseudo("sub {0}, x0, {1}"), 2, "rd, rs"),
+    'seqz': (_pseudo("sltiu {0}, {1}, 1"), 2, "rd, rs"),
+    'snez': (_pseudo("sltu {0}, x0, {1}"), 2, "rd, rs"),
+    'sltz': (_pseudo("slt {0}, {1}, x0"), 2, "rd, rs"),
+    'sgtz': (_pseudo("slt {0}, x0, {1}"), 2, "rd, rs"),
+    'beqz': (_pseudo("beq {0}, x0, {1}"), 2, "rs, target"),
+    'bnez': (_pseudo("bne {0}, x0, {1}"), 2, "rs, target"),
+    'blez': (_pseudo("bge x0, {0}, {1}"), 2, "rs, target"),
+    'bgez': (_pseudo("bge {0}, x0, {1}"), 2, "rs, target"),
+    'bltz': (_pseudo("blt {0}, x0, {1}"), 2, "rs, target"),
+    'bgtz': (_pseudo("blt x0, {0}, {1}"), 2, "rs, target"),
+    'bgt':  (_pseudo("blt {1}, {0}, {2}"), 3, "rs1, rs2, target"),
+    'ble':  (_pseudo("bge {1}, {0}, {2}"), 3, "rs1, rs2, target"),
+    'bgtu': (_pseudo("bltu {1}, {0}, {2}"), 3, "rs1, rs2, target"),
+    'bleu': (_pseudo("bgeu {1}, {0}, {2}"), 3, "rs1, rs2, target"),
+    'j':    (_pseudo("jal x0, {0}"), 1, "target"),
+    'jr':   (_pseudo("jalr x0, {0}, 0"), 1, "rs"),
+    'ret':  (_pseudo("jalr x0, x1, 0"), 0, ""),
+    'call': (_pseudo("jal x1, {0}"), 1, "target"),
+    'tail': (_pseudo("jal x0, {0}"), 1, "target"),
+}
+# One-operand forms of real instructions: 'jal target' and 'jalr rs'.
+SHORT_FORMS = {
+    'jal':  (_pseudo("jal x1, {0}"), 1, "target"),
+    'jalr': (_pseudo("jalr x1, {0}, 0"), 1, "rs"),
+}
+
+_PSEUDO_HEADS = frozenset(PSEUDO_INSTRUCTIONS) | frozenset(SHORT_FORMS)
+
+def expand_pseudo(line, labels):
+    """
+    Return the real instruction lines for a pseudo-instruction line, or None when line is
+    an ordinary instruction. labels holds the addresses that are already final (the .data
+    labels defined so far). Raises ValueError.
+    """
+    tokens = line.replace(',', ' ').split()
+    mnemonic = tokens[0].lower()
+    entry = PSEUDO_INSTRUCTIONS.get(mnemonic)
+    if entry is None:
+        entry = SHORT_FORMS.get(mnemonic)
+        if entry is None or len(tokens) != 2 or (mnemonic == 'jal' and tokens[1] in REGISTERS):
+            return None
+    expander, count, syntax = entry
+    if len(tokens) != count + 1:
+        raise ValueError(f"'{mnemonic}' expects {count} operands" + (f" ({syntax})" if syntax else ""))
+    return expander(tokens[1:], labels)
+
+# === Utility functions ===
+
+def prompt_for_path(prompt_msg, must_exist=False, default=None):
+    """
+    Prompt user for a file path. If must_exist=True, keep prompting until an existing file path is entered.
+    If must_exist=False, check that directory exists.
+    default: default path to show in prompt.
+    """
+    while True:
+        if default:
+            resp = input(f"{prompt_msg} [default: {default}]: ").strip()
+            path = resp if resp else default
+        else:
+            path = input(f"{prompt_msg}: ").strip()
+        # Strip quotes if any
+        if (path.startswith('"') and path.endswith('"')) or (path.startswith("'") and path.endswith("'")):
+            path = path[1:-1]
+        path = os.path.expanduser(path)
+        if must_exist:
+            if os.path.isfile(path):
+                return path
+            else:
+                print(f"Path '{path}' does not exist or is not a file. Please try again.")
+        else:
+            dirn = os.path.dirname(path) or '.'
+            if os.path.isdir(dirn):
+                return path
+            else:
+                print(f"Directory '{dirn}' does not exist. Please enter a valid path.")
+
+def write_verilog_memory_file(output_path, machine_words):
+    """
+    Write lines like:
+       memory[0] = 32'hXXXXXXXX;
+       memory[1] = 32'hYYYYYYYY;
+    Returns the number of entries written. I/O errors (OSError) propagate to the caller.
+    """
+    count = 0
+    with open(output_path, 'w') as f:
+        for i, word in enumerate(machine_words):
+            hexstr = f"{word & 0xFFFFFFFF:08X}"
+            f.write(f"    memory[{i}] = 32'h{hexstr};\n")
+            count += 1
+    return count
+
+def write_hex_file(output_path, machine_words, compress=False, addr_bits=None):
+    """
+    Write a v2.0 raw .hex file with header:
+      v2.0 raw
+    followed by each 32-bit machine word as 8 hex digits per line.
+    compress=True writes Digital's run-length form instead: unpadded lowercase values,
+    with runs of a repeated value as 'N*value' (e.g. '17*0'), like alphanum.hex.
+    addr_bits, if given, pads with zeros or truncates to exactly 2**addr_bits entries
+    (the ROM/RAM 'AddrBits' setting).
+    Returns the number of entries written. I/O errors (OSError) propagate to the caller.
+    """
+    depth = None if addr_bits is None else 1 << addr_bits
+    words = machine_words if depth is None else islice(machine_words, depth)
+    count = 0
+    with open(output_path, 'w') as f:
+        f.write("v2.0 raw\n")
+        if not compress:
+            for word in words:
+                # Uppercase 8-digit hex without prefix
+                f.write(f"{word & 0xFFFFFFFF:08X}\n")
+                count += 1
+            if depth is not None and count < depth:
+                f.write("00000000\n" * (depth - count))
+                count = depth
+            return count
+
+        prev, run = None, 0
+        for word in words:
+            word &= 0xFFFFFFFF
+            if word == prev:
+                run += 1
+                continue
+            if run:
+                f.write(_hex_run(prev, run))
+                count += run
+            prev, run = word, 1
+        if depth is not None and count + run < depth:
+            # Zero padding merges into a trailing run of zeros.
+            if prev != 0:
+                if run:
+                    f.write(_hex_run(prev, run))
+                    count += run
+                prev, run = 0, 0
+            run += depth - count - run
+        if run:
+            f.write(_hex_run(prev, run))
+            count += run
+    return count
+
+def write_atomic(writer, output_path, machine_words, *args):
+    """
+    Call writer(temp_path, machine_words, *args) on a temporary file beside output_path,
+    then rename it over output_path, so a reader (Digital reloading its ROM) sees either
+    the old file or the complete new one. Returns what writer returns.
+    """
+    directory, name = os.path.split(output_path)
+    temp_path = os.path.join(directory, f".{name}.{os.getpid()}.tmp")
+    try:
+        result = writer(temp_path, machine_words, *args)
+        os.replace(temp_path, output_path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    return result
+
+def _hex_run(value, run):
+    return f"{run}*{value:x}\n" if run > 1 else f"{value:x}\n"
+
+def read_hex_file(input_path):
+    """
+    Read a v2.0 raw .hex file (plain or run-length 'N*value' entries) and return the
+    expanded list of words.
+    Raises ValueError for a missing header or a bad value, OSError if the file cannot be read.
+    """
+    with open(input_path, 'r') as f:
+        header = f.readline().strip()
+        if header != "v2.0 raw":
+            raise ValueError(f"'{input_path}' is not a v2.0 raw file (header '{header}')")
+        words = []
+        for lineno, line in enumerate(f, start=2):
+            for value in line.split():
+                try:
+                    if '*' in value:
+                        run, _, value = value.partition('*')
+                        words.extend([int(value, 16) & 0xFFFFFFFF] * int(run))
+                    else:
+                        words.append(int(value, 16) & 0xFFFFFFFF)
+                except ValueError:
+                    raise ValueError(f"Bad hex value '{value}' on line {lineno} of '{input_path}'") from None
+        return words
+
+VERILOG_ENTRY_PATTERN = r"memory\[(\d+)\]\s*=\s*32'h([0-9A-Fa-f]+)\s*;"
+
+def read_verilog_memory_file(input_path):
+    """
+    Read a file of 'memory[i] = 32'hXXXXXXXX;' lines (as written by write_verilog_memory_file)
+    and return the word list. Indices not assigned in the file read as 0.
+    Raises ValueError if the file has no entries, OSError if it cannot be read.
+    """
+    import re
+    with open(input_path, 'r') as f:
+        entries = re.findall(VERILOG_ENTRY_PATTERN, f.read())
+    if not entries:
+        raise ValueError(f"'{input_path}' has no memory[i] = 32'h... entries")
+    indices = [int(i) for i, _ in entries]
+    words = [0] * (max(indices) + 1)
+    for index, (_, value) in zip(indices, entries):
+        words[index] = int(value, 16) & 0xFFFFFFFF
+    return words
+
+# === Errors and results ===
+
+class AssemblyError(ValueError):
+    """
+    A source line could not be assembled.
+    line/column are 1-based positions in the source; mnemonic and text are the
+    offending instruction (None for label errors). Subclasses ValueError, so code
+    that caught the old ValueErrors keeps working.
+    """
+    def __init__(self, message, line=None, column=None, mnemonic=None, text=None):
+        super().__init__(message)
+        self.message = message
+        self.line = line
+        self.column = column
+        self.mnemonic = mnemonic
+        self.text = text
+
+    def __str__(self):
+        if self.line is None:
+            return self.message
+        return f"line {self.line}, column {self.column}: {self.message}"
+
+class Program:
+    """
+    Result of assemble():
+      words        - list of 32-bit machine words, one per instruction
+      labels       - {label: byte address}; .data labels hold data addresses
+      line_numbers - source line (1-based) of each word
+      data         - bytearray built by the .data directives (empty if there are none)
+      data_base    - address of data[0]
+      relaxations  - number of branches/jumps relax_branches() had to rewrite
+      clobbers     - source lines whose relaxed far jump overwrites x6 although the
+                     program itself uses x6 (see far_jump_clobbers())
+    """
+    __slots__ = ('words', 'labels', 'line_numbers', 'data', 'data_base', 'relaxations', 'clobbers')
+
+    def __init__(self, words, labels, line_numbers, data=None, data_base=None, relaxations=0, clobbers=()):
+        self.words = words
+        self.labels = labels
+        self.line_numbers = line_numbers
+        self.data = data if data is not None else bytearray()
+        self.data_base = DATA_BASE if data_base is None else data_base
+        self.relaxations = relaxations
+        self.clobbers = list(clobbers)
+
+    def ram_words(self, addr_bits=None):
+        """
+        Data Memory image as 32-bit words from RAM index 0, the way RAMDualPort sees it
+        (indexed by address[addr_bits+1:2], RAM_ADDR_BITS by default); empty without data.
+        """
+        if not self.data:
+            return []
+        return data_image_words(self.data, self.data_base, RAM_ADDR_BITS if addr_bits is None else addr_bits)
+
+    def __len__(self):
+        return len(self.words)
+
+    def __iter__(self):
+        return iter(self.words)
+
+    def __repr__(self):
+        return f"Program({len(self.words)} words, {len(self.labels)} labels)"
+
+# === Instrumentation ===
+# assemble(..., stats=AssemblyStats()) records per-phase times and per-mnemonic counts;
+# main() does the same for --stats/--profile and adds the read and write phases.
+# An embedding build system can call add_stats_hook(fn): from then on every assemble()
+# call (and every CLI run) is instrumented and fn(stats) receives the finished stats.
+
+INSTRUCTION_FORMATS = {}
+for _table, _fmt in ((R_TYPE, 'R'), (I_TYPE, 'I'), (S_TYPE, 'S'), (B_TYPE, 'B'), (U_TYPE, 'U'), (J_TYPE, 'J')):
+    INSTRUCTION_FORMATS.update(dict.fromkeys(_table, _fmt))
+
+_STATS_HOOKS = []
+
+def add_stats_hook(fn):
+    """Call fn(stats) with the AssemblyStats of every following assembly."""
+    _STATS_HOOKS.append(fn)
+
+def remove_stats_hook(fn):
+    _STATS_HOOKS.remove(fn)
+
+def publish_stats(stats):
+    """Pass finished stats to every registered hook."""
+    for fn in list(_STATS_HOOKS):
+        fn(stats)
+
+class _PhaseTimer:
+    """with-block timer for AssemblyStats.timer(); a no-op when stats is None."""
+    __slots__ = ('stats', 'phase', 'start')
+
+    def __init__(self, stats, phase):
+        self.stats = stats
+        self.phase = phase
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        if self.stats is not None:
+            self.stats.add_time(self.phase, time.perf_counter() - self.start)
+        return False
+
+class AssemblyStats:
+    """
+    Counters for one assembly:
+      phases        - {phase: seconds} in the order the phases ran
+                      (read, labels, relax, encode, write ...)
+      mnemonics     - {mnemonic: instruction count}
+      labels        - size of the label table
+      instructions  - number of machine words
+      relaxations   - branches/jumps rewritten because their target was out of range
+      bytes_written - {output path: size in bytes}
+    """
+    def __init__(self):
+        self.phases = {}
+        self.mnemonics = {}
+        self.labels = 0
+        self.instructions = 0
+        self.relaxations = 0
+        self.bytes_written = {}
+
+    def add_time(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def timer(self, phase):
+        """Context manager adding the time spent in its body to `phase`."""
+        return _PhaseTimer(self, phase)
+
+    def format_counts(self):
+        """{'R': n, 'I': n, ...} derived from the per-mnemonic counts."""
+        counts = {}
+        for mnemonic, n in self.mnemonics.items():
+            fmt = INSTRUCTION_FORMATS.get(mnemonic, '?')
+            counts[fmt] = counts.get(fmt, 0) + n
+        return counts
+
+    def record_output(self, path):
+        try:
+            self.bytes_written[path] = os.path.getsize(path)
+        except OSError:
+            pass
+
+    def as_dict(self):
+        return {'phases': dict(self.phases), 'mnemonics': dict(self.mnemonics),
+                'formats': self.format_counts(), 'labels': self.labels,
+                'instructions': self.instructions, 'relaxations': self.relaxations,
+                'bytes_written': dict(self.bytes_written)}
+
+    def report(self):
+        """Human-readable breakdown, as printed by --stats."""
+        total = sum(self.phases.values())
+        lines = ["Assembly statistics:"]
+        for phase, seconds in self.phases.items():
+            share = seconds / total * 100 if total else 0.0
+            lines.append(f"  {phase:<14} {seconds * 1000:10.2f} ms  {share:5.1f}%")
+        lines.append(f"  {'total':<14} {total * 1000:10.2f} ms")
+        lines.append(f"  instructions: {self.instructions}, labels: {self.labels}, "
+                     f"relaxed jumps: {self.relaxations}")
+        for path, size in self.bytes_written.items():
+            lines.append(f"  wrote {size} bytes to '{path}'")
+        if self.mnemonics:
+            formats = self.format_counts()
+            lines.append("  formats:   " + "  ".join(f"{fmt}={formats[fmt]}" for fmt in sorted(formats)))
+            ranked = sorted(self.mnemonics.items(), key=lambda kv: (-kv[1], kv[0]))
+            lines.append("  mnemonics: " + "  ".join(f"{m}={n}" for m, n in ranked))
+        return "\n".join(lines)
+
+def _column(raw_line, token, start=0):
+    """1-based column of token in the raw source line (1 if it cannot be found)."""
+    pos = raw_line.find(token, start) if raw_line is not None else -1
+    return pos + 1 if pos >= 0 else 1
+
+# === Data section ===
+# Pass 1 also handles assembler directives:
+#   .section .data / .text (also .rodata, .bss), .data, .text   switch sections
+#   .byte / .half / .word v, ...   little-endian values; .word also takes labels
+#   .space / .zero n [, fill]      n bytes
+#   .align n (2**n bytes, as in GNU as for RISC-V), .balign n (n bytes)
+#   .globl / .global sym, ...      exports for linker.py; ignored when assembling one file
+# Lines in a data section go into a DataSegment bytearray and their labels get data
+# addresses from DATA_BASE. In .text, '.word v' emits a raw word and .align pads with nops.
+# The Data Memory (RAMDualPort) only decodes address[13:2], so DATA_BASE 0x10000 (what
+# golden_tb.hex was built with) is RAM word 0.
+
+DATA_BASE = 0x10000
+RAM_ADDR_BITS = 12
+DATA_SECTIONS = ('.data', '.rodata', '.bss', '.sdata', '.sbss')
+NOP = "addi x0, x0, 0"
+_DATA_SIZES = {'.byte': 1, '.half': 2, '.short': 2, '.word': 4, '.long': 4}
+
+class DataSegment:
+    """
+    Bytes emitted by data directives; base is the address of data[0].
+    labels maps the labels defined in data sections to their addresses.
+    .word operands naming labels are recorded in fixups and patched by resolve().
+    globals maps the names given to .globl/.global (linker.py exports these) to the
+    (line, column) where each was first named.
+    relocatable=True is for object files (linker.py): base is 0 and data addresses are
+    only offsets, so pass 1 must not fold them into constants.
+    """
+    __slots__ = ('base', 'data', 'fixups', 'labels', 'globals', 'relocatable')
+
+    def __init__(self, base=DATA_BASE, relocatable=False):
+        self.base = 0 if relocatable else base
+        self.data = bytearray()
+        self.fixups = []
+        self.labels = {}    # labels defined in data sections; relaxation never moves these
+        self.globals = {}
+        self.relocatable = relocatable
+
+    @property
+    def address(self):
+        return self.base + len(self.data)
+
+    def emit(self, value, size):
+        self.data += (value & ((1 << (8 * size)) - 1)).to_bytes(size, 'little')
+
+    def align(self, boundary, fill=0):
+        self.data += bytes([fill]) * (-self.address % boundary)
+
+    def resolve(self, labels):
+        """Patch label operands of .word directives. Raises AssemblyError for undefined labels."""
+        for offset, label, lineno, raw in self.fixups:
+            if label not in labels:
+                raise AssemblyError(f"Undefined label '{label}'", lineno, _column(raw, label))
+            self.data[offset:offset + 4] = (labels[label] & 0xFFFFFFFF).to_bytes(4, 'little')
+        self.fixups.clear()
+
+def data_image_words(data, base, addr_bits=RAM_ADDR_BITS):
+    """Place data (bytes starting at address base) into a list of RAM words from index 0."""
+    start = (base >> 2) & ((1 << addr_bits) - 1)
+    data = bytes(data) + bytes(-(len(data) + (base & 3)) % 4)
+    data = bytes(base & 3) + data
+    words = [int.from_bytes(data[i:i + 4], 'little') for i in range(0, len(data), 4)]
+    return [0] * start + words
+
+def _directive_values(operands, lineno, raw):
+    """Split a directive's comma-separated operands; raises AssemblyError if there are none."""
+    values = [v.strip() for v in operands.split(',')] if operands.strip() else []
+    if not values or '' in values:
+        raise AssemblyError("Directive expects comma-separated values", lineno, _column(raw, operands or '.'))
+    return values
+
+def _data_directive(name, operands, data, lineno, raw):
+    """Apply one directive inside a data section to data."""
+    if name in _DATA_SIZES:
+        size = _DATA_SIZES[name]
+        for value in _directive_values(operands, lineno, raw):
+            if size == 4 and is_label(value):
+                data.fixups.append((len(data.data), value, lineno, raw))
+                data.emit(0, 4)
+                continue
+            try:
+                number = parse_immediate(value)
+            except ValueError as e:
+                raise AssemblyError(str(e), lineno, _column(raw, value)) from None
+            if not -(1 << (8 * size - 1)) <= number < (1 << (8 * size)):
+                raise AssemblyError(f"Value {value} does not fit in {name}", lineno, _column(raw, value))
+            data.emit(number, size)
+    elif name in ('.space', '.zero', '.align', '.balign'):
+        values = _directive_values(operands, lineno, raw)
+        try:
+            numbers = [parse_immediate(v) for v in values]
+        except ValueError as e:
+            raise AssemblyError(str(e), lineno, _column(raw, operands)) from None
+        if len(numbers) > 2 or numbers[0] < 0 or not 0 <= (numbers[1] if len(numbers) > 1 else 0) <= 0xFF:
+            raise AssemblyError(f"Bad operands for {name}", lineno, _column(raw, operands))
+        fill = numbers[1] if len(numbers) > 1 else 0
+        if name in ('.space', '.zero'):
+            data.data += bytes([fill]) * numbers[0]
+        else:
+            data.align(1 << numbers[0] if name == '.align' else max(numbers[0], 1), fill)
+    else:
+        raise AssemblyError(f"Unsupported directive '{name}' in a data section", lineno, _column(raw, name))
+
+def _section_name(name, operands, lineno, raw):
+    """Section selected by a .section/.data/.text line."""
+    section = operands.split(',')[0].strip() if name == '.section' else name
+    if section != '.text' and section not in DATA_SECTIONS:
+        raise AssemblyError(f"Unknown section '{section}'", lineno, _column(raw, section or name))
+    return section
+
+# === Assembler logic ===
+
+def scan_instructions(asm_lines, labels, data=None, layout=None):
+    """
+    First pass as a generator: strip comments, record label addresses into `labels`
+    and yield (lineno, instruction_text, raw_line) for every instruction line.
+    Data directives go into `data` (a DataSegment; a scratch one if None); call
+    data.resolve(labels) once the generator is exhausted.
+    layout (a SourceLayout), if given, records where labels and directives are.
+    Consumes asm_lines lazily, so it works on an open file as well as a list.
+    """
+    if data is None:
+        data = DataSegment()
+    in_data = False
+    pc = 0
+    for lineno, raw in enumerate(asm_lines, start=1):
+        line = raw
+        # Remove comments
+        if '#' in line:
+            line = line.split('#', 1)[0]
+        line = line.strip()
+        if not line:
+            continue
+        # Check for label definition: label: possibly followed by instruction
+        if ':' in line:
+            parts = line.split(':', 1)
+            label = parts[0].strip()
+            if not is_label(label):
+                raise AssemblyError(f"Invalid label '{label}'", lineno, _column(raw, label))
+            if label in labels:
+                raise AssemblyError(f"Duplicate label '{label}'", lineno, _column(raw, label))
+            if in_data:
+                labels[label] = data.labels[label] = data.address
+            else:
+                labels[label] = pc
+            if layout is not None:
+                layout.label_lines[label] = lineno
+            line = parts[1].strip()
+            if not line:
+                continue
+            # There's instruction after label on same line
+        if line[0] == '.':
+            name, _, operands = line.partition(' ')
+            name = name.lower()
+            if name in ('.section', '.data', '.text'):
+                in_data = _section_name(name, operands, lineno, raw) != '.text'
+                if layout is not None:
+                    layout.sections.append((lineno, in_data))
+            elif name in ('.globl', '.global'):
+                for value in _directive_values(operands, lineno, raw):
+                    data.globals.setdefault(value, (lineno, _column(raw, value)))
+            elif in_data:
+                _data_directive(name, operands, data, lineno, raw)
+            elif name in ('.word', '.long'):
+                for value in _directive_values(operands, lineno, raw):
+                    yield lineno, f".word {value}", raw
+                    pc += 4
+            elif name in ('.align', '.balign'):
+                _directive_values(operands, lineno, raw)
+                try:
+                    n = parse_immediate(operands.split(',')[0])
+                except ValueError as e:
+                    raise AssemblyError(str(e), lineno, _column(raw, operands)) from None
+                boundary = 1 << n if name == '.align' else max(n, 1)
+                if layout is not None:
+                    layout.text_aligns.append(lineno)
+                for _ in range(-pc % boundary // 4):
+                    yield lineno, NOP, raw
+                    pc += 4
+            else:
+                raise AssemblyError(f"Unsupported directive '{name}' in .text", lineno, _column(raw, name))
+            continue
+        if in_data:
+            raise AssemblyError("Instruction in a data section", lineno, _column(raw, line.split()[0]))
+        head = line.split(None, 1)[0]
+        if head in _PSEUDO_HEADS or (not head.islower() and head.lower() in _PSEUDO_HEADS):
+            try:
+                expansion = expand_pseudo(line, {} if data.relocatable else data.labels)
+            except ValueError as e:
+                raise AssemblyError(str(e), lineno, _column(raw, head), head.lower(), line) from None
+            if expansion is not None:
+                for real in expansion:
+                    yield lineno, real, raw
+                    pc += 4
+                continue
+        yield lineno, line, raw
+        pc += 4
+
+def encode_instructions(instructions, labels, cache=None, mnemonics=None, pc=0, refs=None):
+    """
+    Second pass as a generator: yield one 32-bit word per (lineno, text, raw_line)
+    from scan_instructions(). labels must already hold every label address.
+    cache (an encoding_cache.EncodingCache) is optional: cached lines are reused
+    unless their branch/jal target moved, and newly encoded lines are stored.
+    mnemonics, if given, is a {mnemonic: count} dict updated for every line (--stats).
+    pc is the address of the first instruction. With a cache, refs (a list) receives
+    (pc, label, reach, instruction) for every label the word of an instruction (the input
+    tuple) depends on; reach is how far a branch or jal can jump, 0 for an absolute
+    address (see "Incremental reassembly").
+    """
+    table = DISPATCH_TABLE
+    if cache is not None:
+        # Entries are looked up here, not through a method: this is the hot path of a rebuild.
+        cached = cache.entries.get
+        touch = cache.entries.move_to_end
+    curr_pc = pc
+    for source in instructions:
+        lineno, inst_line, raw = source
+        if '%' in inst_line:
+            try:
+                expanded = expand_relocations(inst_line, labels)
+            except ValueError as ve:
+                raise AssemblyError(str(ve), lineno, _column(raw, '%'), inst_line.split()[0].lower(), inst_line) from None
+            if refs is not None:
+                refs.extend((curr_pc, tok[4:], 0, source)
+                            for tok in _mark_relocations(inst_line).split() if tok[0] == '%' and tok[4:] in labels)
+            inst_line = expanded
+        if cache is not None:
+            hit = cached(inst_line)
+            if hit is not None:
+                touch(inst_line)
+                word, target, offset = hit
+                # A label that no longer exists falls through, so re-encoding reports it.
+                if target is None or (target in labels and labels[target] - curr_pc == offset):
+                    cache.hits += 1
+                    if target is not None and refs is not None:
+                        reach = J_REACH if inst_line[0] in 'jJ' else B_REACH
+                        refs.append((curr_pc, target, reach, source))
+                    if mnemonics is not None:
+                        mnemonic = inst_line.replace(',', ' ').split(None, 1)[0].lower()
+                        mnemonics[mnemonic] = mnemonics.get(mnemonic, 0) + 1
+                    yield word
+                    curr_pc += 4
+                    continue
+                cache.relinks += 1
+            else:
+                cache.misses += 1
+        # Commas and parentheses become whitespace, giving the same tokens as
+        # re.split(r'[,\s()]+'), e.g. "sw x5, 4(x2)" -> ['sw', 'x5', '4', 'x2'].
+        tokens = inst_line.replace(',', ' ').replace('(', ' ').replace(')', ' ').split()
+        mnemonic = tokens[0].lower()
+        if mnemonics is not None:
+            mnemonics[mnemonic] = mnemonics.get(mnemonic, 0) + 1
+        try:
+            entry = table.get(mnemonic) or TEXT_DIRECTIVES.get(mnemonic)
+            if entry is None:
+                raise ValueError(f"Unsupported instruction '{mnemonic}'")
+            base, parse_operands, count, syntax = entry
+            if len(tokens) != count + 1:
+                raise ValueError(f"'{mnemonic}' expects {count} operands ({syntax})")
+            word = base | parse_operands(tokens[1:], curr_pc, labels)
+        except KeyError as ke:
+            start = _column(raw, tokens[0]) - 1 + len(tokens[0])
+            raise AssemblyError(f"Invalid register '{ke.args[0]}'", lineno,
+                                _column(raw, ke.args[0], start), mnemonic, inst_line) from None
+        except ValueError as ve:
+            raise AssemblyError(str(ve), lineno, _column(raw, tokens[0]), mnemonic, inst_line) from None
+
+        if cache is not None:
+            target = tokens[-1]
+            if target in labels and parse_operands in (_operands_b, _operands_j):
+                cache.put(inst_line, word, target, labels[target] - curr_pc)
+                if refs is not None:
+                    reach = B_REACH if parse_operands is _operands_b else J_REACH
+                    refs.append((curr_pc, target, reach, source))
+            elif target in labels and parse_operands is _operands_word:
+                # An absolute address; it is not worth caching against label moves.
+                if refs is not None:
+                    refs.append((curr_pc, target, 0, source))
+            else:
+                cache.put(inst_line, word)
+        yield word
+        curr_pc += 4
+
+# === Branch relaxation ===
+# Pass 1 gives every instruction one word. A branch or jal whose label ends up out of
+# reach is rewritten, and the code after it moves, which can push other jumps out of
+# reach; so the rewrites are repeated until nothing changes. A jump only ever grows:
+#     beq  rs1, rs2, far  ->  bne  rs1, rs2, +8     ->  bne  rs1, rs2, +12
+#                             jal  x0, far              auipc x6, hi
+#                                                       jalr x0, x6, lo
+#     jal  rd, far        ->  auipc rd, hi ; jalr rd, rd, lo   (x6 instead of rd when rd is x0)
+# Like GNU as's 'tail', a far jump without a link register clobbers x6 (t1). When the
+# program itself uses x6, far_jump_clobbers() names those lines and the CLI warns.
+# .align padding in .text is worked out in pass 1 and is not redone here.
+
+_INVERTED_BRANCH = {'beq': 'bne', 'bne': 'beq', 'blt': 'bge', 'bge': 'blt', 'bltu': 'bgeu', 'bgeu': 'bltu'}
+FAR_JUMP_SCRATCH = 'x6'
+
+def _jump_candidates(instructions, labels):
+    """[(index, mnemonic, operands, target)] for every branch/jal whose target is a label."""
+    candidates = []
+    for index, (_, text, _) in enumerate(instructions):
+        if text[0] not in 'bjBJ':
+            continue
+        tokens = text.replace(',', ' ').split()
+        mnemonic = tokens[0].lower()
+        if mnemonic in _INVERTED_BRANCH and len(tokens) == 4 and tokens[3] in labels:
+            candidates.append((index, mnemonic, tokens[1:3], tokens[3]))
+        elif mnemonic == 'jal' and len(tokens) == 3 and tokens[2] in labels:
+            candidates.append((index, mnemonic, tokens[1:2], tokens[2]))
+    return candidates
+
+def relax_branches(instructions, labels, fixed_labels=(), scratch_lines=None):
+    """
+    Rewrite branches and jal instructions whose label is out of range (see above).
+    instructions is pass 1's list of (lineno, text, raw); labels is updated in place with
+    the final text addresses (names in fixed_labels, i.e. .data labels, are left alone).
+    Returns (instructions, number of rewritten instructions); the list is returned
+    unchanged when nothing needed relaxing. The source line of every rewrite that uses
+    FAR_JUMP_SCRATCH is appended to scratch_lines, if given.
+    """
+    # No B-type offset can overflow in a text section smaller than the B-type reach.
+    if 4 * len(instructions) <= B_RANGE[1]:
+        return instructions, 0
+    candidates = _jump_candidates(instructions, labels)
+    moving = {name: address >> 2 for name, address in labels.items() if name not in fixed_labels}
+    # level per candidate: 0 = as written; branch 1 = inverted + jal, 2 = inverted + auipc/jalr;
+    # jal 1 = auipc/jalr. Each level adds one word.
+    levels = [0] * len(candidates)
+    extra = {}          # instruction index -> words added in front of the next instruction
+    changed = True
+    while changed:
+        changed = False
+        if extra:
+            # Word address of every original instruction index after the current rewrites.
+            shift = [0] * (len(instructions) + 1)
+            total = 0
+            for index in range(len(instructions) + 1):
+                shift[index] = total
+                total += extra.get(index, 0)
+            where = lambda index: 4 * (index + shift[index])
+        else:
+            where = lambda index: 4 * index
+        for n, (index, mnemonic, _, target) in enumerate(candidates):
+            level = levels[n]
+            if target in moving:
+                goal = where(moving[target])
+            else:
+                goal = labels[target]
+            pc = where(index)
+            if mnemonic == 'jal':
+                fits = level > 0 or J_RANGE[0] <= goal - pc <= J_RANGE[1]
+            elif level == 0:
+                fits = B_RANGE[0] <= goal - pc <= B_RANGE[1]
+            else:
+                fits = level == 2 or J_RANGE[0] <= goal - pc - 4 <= J_RANGE[1]
+            if not fits:
+                levels[n] = level + 1
+                extra[index] = extra.get(index, 0) + 1
+                changed = True
+    if not extra:
+        return instructions, 0
+
+    # Final layout: label addresses first, then the rewritten instructions.
+    for name, index in moving.items():
+        labels[name] = where(index)
+    relaxed = {index: n for n, (index, _, _, _) in enumerate(candidates) if levels[n]}
+    out = []
+    for index, entry in enumerate(instructions):
+        n = relaxed.get(index)
+        if n is None:
+            out.append(entry)
+            continue
+        lineno, _, raw = entry
+        _, mnemonic, ops, target = candidates[n]
+        pc = 4 * len(out)
+        goal = labels[target]
+        if mnemonic == 'jal':
+            rd = ops[0]
+            scratch = FAR_JUMP_SCRATCH if REGISTERS.get(rd) == 0 else rd
+            hi, lo = _hi_lo(goal - pc)
+            lines = [f"auipc {scratch}, {hi:#x}", f"jalr {rd}, {scratch}, {lo}"]
+        elif levels[n] == 1:
+            scratch = None
+            lines = [f"{_INVERTED_BRANCH[mnemonic]} {ops[0]}, {ops[1]}, 8", f"jal x0, {target}"]
+        else:
+            scratch = FAR_JUMP_SCRATCH
+            hi, lo = _hi_lo(goal - pc - 4)
+            lines = [f"{_INVERTED_BRANCH[mnemonic]} {ops[0]}, {ops[1]}, 12",
+                     f"auipc {FAR_JUMP_SCRATCH}, {hi:#x}", f"jalr x0, {FAR_JUMP_SCRATCH}, {lo}"]
+        if scratch == FAR_JUMP_SCRATCH and scratch_lines is not None:
+            scratch_lines.append(lineno)
+        out.extend((lineno, line, raw) for line in lines)
+    return out, len(relaxed)
+
+def far_jump_clobbers(instructions, scratch_lines):
+    """
+    The scratch_lines (from relax_branches) that matter: all of them when any source
+    instruction in pass 1's list names FAR_JUMP_SCRATCH, otherwise none.
+    """
+    if not scratch_lines:
+        return []
+    for _, text, _ in instructions:
+        if FAR_JUMP_SCRATCH in text.replace(',', ' ').replace('(', ' ').replace(')', ' ').split():
+            return sorted(set(scratch_lines))
+    return []
+
+# === Incremental reassembly ===
+# assemble(source, cache) keeps the finished build on cache.build. The next call with the
+# same cache compares the source with that build's lines: the common prefix and suffix are
+# kept, and only the lines in between go through pass 1 and pass 2. Labels after the edit
+# move by the change in word count, and the words outside it that depend on a label that
+# moved (branches and jal, %hi/%lo operands, .word label, .word label in .data) are
+# re-encoded. Everything else falls back to the full passes: a build that needed branch
+# relaxation, an edit touching a directive or a .data section, .align after an edit that
+# changes the word count, an edit spanning more than a quarter of the file, and any error
+# (so errors are always reported by the full passes). Instrumented assemblies (stats or
+# stats hooks) always run the full passes. The build is kept in memory only: watch mode
+# and long-running callers of updated_assemble() benefit, a --cache file does not.
+
+class SourceLayout:
+    """
+    Positions recorded by scan_instructions(..., layout):
+      label_lines - {label: line it is defined on}
+      sections    - [(line, in_data)] for every .section/.data/.text directive
+      text_aligns - lines of the .align/.balign directives in .text
+    """
+    __slots__ = ('label_lines', 'sections', 'text_aligns')
+
+    def __init__(self):
+        self.label_lines = {}
+        self.sections = []
+        self.text_aligns = []
+
+class _LabelRefs:
+    """
+    Label references from encode_instructions(refs=...), sorted by pc, as parallel lists
+    so that they are sliced and filtered without a Python loop per reference.
+    """
+    __slots__ = ('pcs', 'labels', 'reach', 'sources')
+
+    def __init__(self, refs=()):
+        self.pcs, self.labels, self.reach, self.sources = (
+            [list(column) for column in zip(*refs)] if refs else ([], [], [], []))
+
+    def spliced(self, r0, r1, middle, delta):
+        """These refs with [r0:r1] replaced by middle and the ones after it moved by delta bytes."""
+        refs = _LabelRefs()
+        after = self.pcs[r1:]
+        refs.pcs = self.pcs[:r0] + middle.pcs + ([pc + delta for pc in after] if delta else after)
+        refs.labels = self.labels[:r0] + middle.labels + self.labels[r1:]
+        refs.reach = self.reach[:r0] + middle.reach + self.reach[r1:]
+        refs.sources = self.sources[:r0] + middle.sources + self.sources[r1:]
+        return refs
+
+    def stale(self, start, stop, shift, edited, after_text):
+        """
+        (index, shift) of the refs in [start:stop] whose word must be re-encoded when the
+        words move by shift bytes (see _reassemble()).
+        """
+        labels = self.labels[start:stop]
+        if not shift:
+            return [(k, 0) for k, name in zip(range(start, stop), labels) if name in edited or name in after_text]
+        return [(k, shift) for k, name, reach in zip(range(start, stop), labels, self.reach[start:stop])
+                if (name not in after_text if reach else name in edited or name in after_text)]
+
+def _near_far(refs):
+    """(near, far) _LabelRefs: the branches, which only reach B_REACH bytes, and all the others."""
+    return (_LabelRefs([ref for ref in refs if ref[2] == B_REACH]),
+            _LabelRefs([ref for ref in refs if ref[2] != B_REACH]))
+
+class _Build:
+    """
+    What _reassemble() needs from the previous assembly: its source lines, Program and
+    SourceLayout, the .data labels, the (offset, label) operands of .word directives in
+    .data, and the near and far _LabelRefs (see _near_far()).
+    """
+    __slots__ = ('lines', 'program', 'layout', 'data_labels', 'data_refs', 'near', 'far')
+
+    def __init__(self, lines, program, layout, data_labels, data_refs, near, far):
+        self.lines = lines
+        self.program = program
+        self.layout = layout
+        self.data_labels = data_labels
+        self.data_refs = data_refs
+        self.near = near
+        self.far = far
+
+_DIFF_BLOCK = 1024      # lines compared per slice when looking for the edit
+
+def _common_prefix(a, b, limit):
+    """Number of equal leading items of lists a and b, at most limit."""
+    done = 0
+    while done < limit:
+        end = min(done + _DIFF_BLOCK, limit)
+        if a[done:end] != b[done:end]:
+            while a[done] == b[done]:
+                done += 1
+            return done
+        done = end
+    return limit
+
+def _common_suffix(a, b, limit):
+    """Number of equal trailing items of lists a and b, at most limit."""
+    n, m = len(a), len(b)
+    done = 0
+    while done < limit:
+        step = min(_DIFF_BLOCK, limit - done)
+        if a[n - done - step:n - done] != b[m - done - step:m - done]:
+            while a[n - done - 1] == b[m - done - 1]:
+                done += 1
+            return done
+        done += step
+    return limit
+
+def _reassemble(lines, cache, data_base):
+    """
+    Assemble the list lines by patching cache.build (see above). Returns the Program and
+    replaces cache.build, or returns None when the full passes are needed.
+    """
+    build = cache.build
+    program = build.program
+    old = build.lines
+    if program.data_base != data_base:
+        return None
+    shorter = min(len(old), len(lines))
+    first = _common_prefix(old, lines, shorter)
+    tail = _common_suffix(old, lines, shorter - first)
+    old_end, new_end = len(old) - tail, len(lines) - tail
+    if first == old_end == new_end:
+        return program
+    if (old_end - first) + (new_end - first) > max(len(lines) // 4, 64):
+        return None
+    # Lines first+1 .. old_end (1-based) were replaced by lines first+1 .. new_end.
+    for raw in old[first:old_end] + lines[first:new_end]:
+        if '.' in raw.split('#', 1)[0]:
+            return None
+    layout = build.layout
+    in_data = False
+    for lineno, state in layout.sections:
+        if lineno > first:
+            break
+        in_data = state
+    if in_data:
+        return None
+
+    label_lines, data_labels = layout.label_lines, build.data_labels
+    segment = DataSegment(data_base)
+    # Pass 1 folds 'la' of a .data label defined above it into a constant.
+    segment.labels = {name: address for name, address in data_labels.items() if label_lines[name] <= first}
+    region_labels = {}
+    region_layout = SourceLayout()
+    try:
+        scanned = [(lineno + first, text, raw) for lineno, text, raw
+                   in scan_instructions(lines[first:new_end], region_labels, segment, region_layout)]
+    except AssemblyError:
+        return None
+    line_numbers = program.line_numbers
+    w0 = bisect_left(line_numbers, first + 1)
+    w1 = bisect_left(line_numbers, old_end + 1, w0)
+    pc0, pc1 = 4 * w0, 4 * w1
+    delta = 4 * len(scanned) - (pc1 - pc0)
+    line_delta = new_end - old_end
+    if delta and layout.text_aligns and layout.text_aligns[-1] > old_end:
+        return None
+
+    # Labels are in source order: before the edit (k0 of them), in it, after it.
+    old_labels = program.labels
+    names, addresses, defined_at = list(old_labels), list(old_labels.values()), list(label_lines.values())
+    k0 = bisect_right(defined_at, first)
+    k1 = bisect_right(defined_at, old_end, k0)
+    after = names[k1:]
+    labels = dict(zip(names[:k0], addresses[:k0]))
+    labels.update((name, address + pc0) for name, address in region_labels.items())
+    if delta:
+        labels.update((name, address if name in data_labels else address + delta)
+                      for name, address in zip(after, addresses[k1:]))
+    else:
+        labels.update(zip(after, addresses[k1:]))
+    if len(labels) != k0 + len(region_labels) + len(after):
+        return None     # a label defined twice
+    new_label_lines = dict(zip(names[:k0], defined_at[:k0]))
+    new_label_lines.update((name, lineno + first) for name, lineno in region_layout.label_lines.items())
+    new_label_lines.update(zip(after, [lineno + line_delta for lineno in defined_at[k1:]]
+                                      if line_delta else defined_at[k1:]))
+    old_region = dict(zip(names[k0:k1], addresses[k0:k1]))
+    moved = delta != 0 or old_region != {name: labels[name] for name in region_labels}
+
+    region_refs = []
+    try:
+        region_words = list(encode_instructions(scanned, labels, cache, pc=pc0, refs=region_refs))
+    except AssemblyError:
+        return None
+    words = program.words[:w0] + region_words + program.words[w1:]
+    region_near, region_far = _near_far(region_refs)
+    near, far = build.near, build.far
+    n0, n1 = bisect_left(near.pcs, pc0), bisect_left(near.pcs, pc1)
+    f0, f1 = bisect_left(far.pcs, pc0), bisect_left(far.pcs, pc1)
+    if moved:
+        # Words outside the edit whose label moved relative to them are re-encoded: any word
+        # whose label is in the edit, a word before the edit whose label is after it, and a
+        # branch or jal after the edit whose label is before it. Only the branches within
+        # B_REACH of the edit can be affected. A superset of the words is harmless.
+        edited = set(old_region) | set(region_labels)
+        after_text = {name for name in after if name not in data_labels} if delta else set()
+        stale = [(near, k, shift) for k, shift in
+                 near.stale(bisect_left(near.pcs, pc0 - B_REACH, 0, n0), n0, 0, edited, after_text) +
+                 near.stale(n1, bisect_left(near.pcs, pc1 + B_REACH, n1), delta, edited, after_text)]
+        stale += [(far, k, shift) for k, shift in
+                  far.stale(0, f0, 0, edited, after_text) + far.stale(f1, len(far.pcs), delta, edited, after_text)]
+        for refs, k, shift in stale:
+            pc = refs.pcs[k] + shift
+            try:
+                words[pc >> 2] = next(encode_instructions([refs.sources[k]], labels, cache, pc=pc))
+            except AssemblyError:
+                return None
+    data = program.data
+    if moved and build.data_refs:
+        patches = [(offset, labels.get(name)) for offset, name in build.data_refs
+                   if labels.get(name) != old_labels[name]]
+        if patches:
+            data = bytearray(data)
+            for offset, address in patches:
+                if address is None:
+                    return None
+                data[offset:offset + 4] = (address & 0xFFFFFFFF).to_bytes(4, 'little')
+
+    shift_line = lambda lineno: lineno + line_delta if lineno > old_end else lineno
+    new_layout = SourceLayout()
+    new_layout.label_lines = new_label_lines
+    new_layout.sections = [(shift_line(lineno), state) for lineno, state in layout.sections]
+    new_layout.text_aligns = [shift_line(lineno) for lineno in layout.text_aligns]
+    program = Program(words, labels,
+                      line_numbers[:w0] + [lineno for lineno, _, _ in scanned] +
+                      ([lineno + line_delta for lineno in line_numbers[w1:]] if line_delta else line_numbers[w1:]),
+                      data, data_base)
+    cache.build = _Build(lines, program, new_layout, data_labels, build.data_refs,
+                         near.spliced(n0, n1, region_near, delta), far.spliced(f0, f1, region_far, delta))
+    return program
+
+def assemble(source, cache=None, stats=None, data_base=DATA_BASE):
+    """
+    Assemble source into a Program without printing or exiting.
+    source may be a whole program as one string or an iterable of lines.
+    cache is an optional encoding_cache.EncodingCache shared between calls; it also keeps
+    the last build, so the next call only reassembles the edited lines (see above).
+    data_base is the address the .data section starts at.
+    stats is an optional AssemblyStats to fill in (labels/relax/encode phases and
+    counts); with stats hooks registered one is created and published automatically.
+    Raises AssemblyError (with line, column, mnemonic) on the first bad line.
+    """
+    if isinstance(source, str):
+        source = source.splitlines()
+    elif cache is not None:
+        source = list(source)     # kept in cache.build; the caller may change its own list
+    instrumented = stats is not None or bool(_STATS_HOOKS)
+    if cache is not None and cache.build is not None and not instrumented:
+        program = _reassemble(source, cache, data_base)
+        if program is not None:
+            return program
+    labels = {}
+    data = DataSegment(data_base)
+    scratch_lines = []
+    layout = refs = data_refs = None
+    if cache is not None:
+        layout, refs = SourceLayout(), []
+    if not instrumented:
+        scanned = list(scan_instructions(source, labels, data, layout))
+        instructions, relaxations = relax_branches(scanned, labels, data.labels, scratch_lines)
+        if cache is not None:
+            data_refs = [(offset, label) for offset, label, _, _ in data.fixups]
+        data.resolve(labels)
+        machine_words = list(encode_instructions(instructions, labels, cache, refs=refs))
+    else:
+        publish = stats is None
+        if publish:
+            stats = AssemblyStats()
+        with stats.timer('labels'):
+            scanned = list(scan_instructions(source, labels, data, layout))
+        with stats.timer('relax'):
+            instructions, relaxations = relax_branches(scanned, labels, data.labels, scratch_lines)
+        with stats.timer('labels'):
+            if cache is not None:
+                data_refs = [(offset, label) for offset, label, _, _ in data.fixups]
+            data.resolve(labels)
+        # Pass 2 tokenizes and encodes each line in one go; the mnemonic counts come from it.
+        with stats.timer('encode'):
+            machine_words = list(encode_instructions(instructions, labels, cache, stats.mnemonics, refs=refs))
+        stats.labels = len(labels)
+        stats.instructions += len(machine_words)
+        stats.relaxations += relaxations
+        if publish:
+            publish_stats(stats)
+    program = Program(machine_words, labels, [lineno for lineno, _, _ in instructions], data.data, data_base,
+                      relaxations, far_jump_clobbers(scanned, scratch_lines))
+    if cache is not None:
+        # Any edit can change which jumps a relaxed build rewrites, so it is not patched.
+        cache.build = None if relaxations else _Build(source, program, layout, data.labels, data_refs,
+                                                      *_near_far(refs))
+    return program
+
+def assemble_file(path, cache=None, data_base=DATA_BASE):
+    """Read and assemble one .asm file. Returns a Program; raises AssemblyError or OSError."""
+    with open(path, 'r') as f:
+        return assemble(f.readlines(), cache, data_base=data_base)
+
+# === Streaming assembly ===
+# For very large generated sources: pass 1 keeps only the label table, pass 2
+# re-reads the file and yields words straight into the writers, so memory use
+# does not grow with program size. There is no instruction list to relax, so a branch
+# that cannot reach its label is an error here.
+
+def collect_labels(asm_lines, data=None):
+    """
+    Run pass 1 only. Returns ({label: address}, instruction_count).
+    data (a DataSegment) receives the .data bytes, with label operands resolved.
+    """
+    labels = {}
+    count = 0
+    if data is None:
+        data = DataSegment()
+    for _ in scan_instructions(asm_lines, labels, data):
+        count += 1
+    data.resolve(labels)
+    return labels, count
+
+def iter_assemble(path, labels=None, cache=None, data_base=DATA_BASE):
+    """
+    Generator: yield machine words for the .asm file at path, reading it lazily.
+    labels may be passed in from an earlier collect_labels() call to skip pass 1.
+    """
+    if labels is None:
+        with open(path, 'r') as f:
+            labels, _ = collect_labels(f, DataSegment(data_base))
+    with open(path, 'r') as f:
+        # Pass 2 rescans with a scratch label dict; the addresses come from pass 1. The
+        # scratch dict fills in the same order, so pseudo-instructions expand the same way.
+        yield from encode_instructions(scan_instructions(f, {}, DataSegment(data_base)), labels, cache)
+
+def updated_assemble(asm_lines, cache=None):
+    """
+    First pass: collect labels and instruction lines.
+    Second pass: encode each instruction to 32-bit word (reusing `cache` entries if given;
+    with the same cache, a later call only reassembles the lines that changed).
+    Returns the list of machine words; raises AssemblyError on a bad line.
+    """
+    return assemble(asm_lines, cache).words
+
+def report_assembly_error(e):
+    """Print an AssemblyError the way the CLI always has, then exit with status 1."""
+    print(f"Assembly failed: {e}", file=sys.stderr)
+    if e.text:
+        print(f"  >>> {e.text}", file=sys.stderr)
+    sys.exit(1)
+
+# === Compact IR ===
+# assemble_ir() tokenizes each instruction once, straight out of pass 1, into parallel
+# arrays instead of keeping (lineno, text, raw) tuples and a list of ints:
+#     op         array('h')  index into IR_OPS (DISPATCH_TABLE order, then '.word')
+#     rd/rs1/rs2 array('B')  register numbers (0 where the format has none)
+#     imm        array('i')  immediate; shamt for shifts, upper-20 value for lui/auipc
+#     sym        array('i')  id into symbols for a label operand, -1 for none
+#     reloc      array('b')  how sym is used: RELOC_PCREL (branch/jal), RELOC_HI / RELOC_LO
+#                            (%hi()/%lo()), RELOC_ABS (.word label)
+#     line       array('I')  source line
+# That is 18 bytes per instruction. Labels are only resolved by encode()/rows(), so forward
+# references cost nothing extra. The records follow batch_encoder's conventions, so
+# encode(), the disassembler (rows=) and the simulator (Simulator.from_ir) all read the
+# columns directly. There is no instruction text to rewrite, so, as with --stream, a branch
+# that cannot reach its label is an error rather than relaxed.
+
+IR_OPS = list(DISPATCH_TABLE) + list(TEXT_DIRECTIVES)
+IR_OP_IDS = {m: i for i, m in enumerate(IR_OPS)}
+IR_R, IR_I, IR_SHIFT, IR_S, IR_B, IR_U, IR_J, IR_WORD = range(8)
+RELOC_NONE, RELOC_PCREL, RELOC_HI, RELOC_LO, RELOC_ABS = range(5)
+
+# operand parser -> (IR format, tokens -> (rd, rs1, rs2, immediate token))
+_IR_FIELDS = {
+    _operands_r:     (IR_R, lambda o: (_R[o[0]], _R[o[1]], _R[o[2]], None)),
+    _operands_i:     (IR_I, lambda o: (_R[o[0]], _R[o[1]], 0, o[2])),
+    _operands_shift: (IR_SHIFT, lambda o: (_R[o[0]], _R[o[1]], 0, o[2])),
+    _operands_load:  (IR_I, lambda o: (_R[o[0]], _R[o[2]], 0, o[1])),
+    _operands_jalr:  (IR_I, lambda o: (_R[o[0]], _R[o[1]], 0, o[2]) if o[1] in REGISTERS
+                      else (_R[o[0]], _R[o[2]], 0, o[1])),
+    _operands_s:     (IR_S, lambda o: (0, _R[o[2]], _R[o[0]], o[1])),
+    _operands_b:     (IR_B, lambda o: (0, _R[o[0]], _R[o[1]], o[2])),
+    _operands_u:     (IR_U, lambda o: (_R[o[0]], 0, 0, o[1])),
+    _operands_j:     (IR_J, lambda o: (_R[o[0]], 0, 0, o[1])),
+    _operands_word:  (IR_WORD, lambda o: (0, 0, 0, o[0])),
+}
+def _ir_entry(mnemonic):
+    base, parse_operands, count, syntax = DISPATCH_TABLE.get(mnemonic) or TEXT_DIRECTIVES[mnemonic]
+    fmt, fields = _IR_FIELDS[parse_operands]
+    return base, fmt, fields, count, syntax
+
+# Per op id: (base_word, IR format, field extractor, operand_count, syntax)
+IR_TABLE = [_ir_entry(m) for m in IR_OPS]
+
+def _int32(value):
+    """value's low 32 bits as a signed int, so any 32-bit pattern fits an array('i') slot."""
+    value &= 0xFFFFFFFF
+    return value - (1 << 32) if value & 0x80000000 else value
+
+# Operand bits for each IR format from (rd, rs1, rs2, imm) with imm already resolved.
+_IR_PLACE = [
+    lambda rd, rs1, rs2, imm: (rs2 << 20) | (rs1 << 15) | (rd << 7),
+    lambda rd, rs1, rs2, imm: ((imm & 0xFFF) << 20) | (rs1 << 15) | (rd << 7),
+    lambda rd, rs1, rs2, imm: (imm << 20) | (rs1 << 15) | (rd << 7),
+    lambda rd, rs1, rs2, imm: (((imm >> 5) & 0x7F) << 25) | (rs2 << 20) | (rs1 << 15) | ((imm & 0x1F) << 7),
+    lambda rd, rs1, rs2, imm: (((imm >> 12) & 0x1) << 31) | (((imm >> 5) & 0x3F) << 25) | (rs2 << 20) |
+                              (rs1 << 15) | (((imm >> 1) & 0xF) << 8) | (((imm >> 11) & 0x1) << 7),
+    lambda rd, rs1, rs2, imm: ((imm & 0xFFFFF) << 12) | (rd << 7),
+    lambda rd, rs1, rs2, imm: (((imm >> 20) & 0x1) << 31) | (((imm >> 1) & 0x3FF) << 21) |
+                              (((imm >> 11) & 0x1) << 20) | (((imm >> 12) & 0xFF) << 12) | (rd << 7),
+    lambda rd, rs1, rs2, imm: imm & 0xFFFFFFFF,
+]
+
+# Per IR format: (sign bit count, mask) giving the immediate as stored in the word; 0 = as is.
+_IR_IMM_BITS = [(0, 0), (12, 0xFFF), (0, 0), (12, 0xFFF), (13, 0x1FFE), (0, 0), (21, 0x1FFFFE), (0, 0)]
+
+def _mark_relocations(text):
+    """Rewrite %hi(sym)/%lo(sym) as single '%hi:sym' tokens so tokenizing keeps them whole."""
+    parts = []
+    pos = 0
+    while True:
+        start = text.find('%', pos)
+        if start < 0:
+            break
+        kind = text[start + 1:start + 3]
+        end = text.find(')', start)
+        if kind not in ('hi', 'lo') or text[start + 3:start + 4] != '(' or end < 0:
+            raise ValueError(f"Unknown relocation '{text[start:].split()[0]}' (expected %hi(...) or %lo(...))")
+        parts.append(text[pos:start])
+        parts.append(f" %{kind}:{text[start + 4:end].strip()} ")
+        pos = end + 1
+    parts.append(text[pos:])
+    return "".join(parts)
+
+class ProgramIR:
+    """
+    Columnar form of an assembled program (see the section comment above).
+      symbols  - label names, indexed by the sym column
+      labels   - {label: address}, complete once assemble_ir() returns
+      data     - the DataSegment built by the .data directives
+    """
+    __slots__ = ('op', 'rd', 'rs1', 'rs2', 'imm', 'sym', 'reloc', 'line',
+                 'symbols', 'symbol_ids', 'labels', 'data')
+
+    def __init__(self, labels=None, data=None):
+        self.op = array('h')
+        self.rd = array('B')
+        self.rs1 = array('B')
+        self.rs2 = array('B')
+        self.imm = array('i')
+        self.sym = array('i')
+        self.reloc = array('b')
+        self.line = array('I')
+        self.symbols = []
+        self.symbol_ids = {}
+        self.labels = {} if labels is None else labels
+        self.data = DataSegment() if data is None else data
+
+    def __len__(self):
+        return len(self.op)
+
+    def _symbol(self, name):
+        sid = self.symbol_ids.get(name)
+        if sid is None:
+            sid = self.symbol_ids[name] = len(self.symbols)
+            self.symbols.append(name)
+        return sid
+
+    def append(self, lineno, text, raw=None):
+        """Tokenize one instruction line from pass 1 and add it as a row. Raises AssemblyError."""
+        if '%' in text:
+            try:
+                text = _mark_relocations(text)
+            except ValueError as ve:
+                raise AssemblyError(str(ve), lineno, _column(raw, '%'), None, text) from None
+        tokens = text.replace(',', ' ').replace('(', ' ').replace(')', ' ').split()
+        mnemonic = tokens[0].lower()
+        try:
+            op = IR_OP_IDS.get(mnemonic)
+            if op is None:
+                raise ValueError(f"Unsupported instruction '{mnemonic}'")
+            _, fmt, fields, count, syntax = IR_TABLE[op]
+            if len(tokens) != count + 1:
+                raise ValueError(f"'{mnemonic}' expects {count} operands ({syntax})")
+            rd, rs1, rs2, tok = fields(tokens[1:])
+            imm, sym, reloc = 0, -1, RELOC_NONE
+            if tok is None:
+                pass
+            elif tok[0] == '%':
+                reloc = RELOC_HI if tok[1] == 'h' else RELOC_LO
+                name = tok[4:]
+                if is_label(name):
+                    sym = self._symbol(name)
+                else:
+                    value = parse_immediate(name)
+                    hi = (value + 0x800) >> 12
+                    imm, reloc = (hi & 0xFFFFF if reloc == RELOC_HI else value - (hi << 12)), RELOC_NONE
+            elif fmt in (IR_B, IR_J, IR_WORD) and is_label(tok):
+                sym = self._symbol(tok)
+                reloc = RELOC_ABS if fmt == IR_WORD else RELOC_PCREL
+            else:
+                imm = parse_immediate(tok)
+                if fmt == IR_SHIFT and not 0 <= imm <= 31:
+                    raise ValueError(f"Shift amount out of range 0..31: {imm}")
+                if fmt == IR_B and not B_RANGE[0] <= imm <= B_RANGE[1]:
+                    raise ValueError(f"Branch target out of range ({imm:+d} bytes, B-type reaches +/-4 KiB)")
+                if fmt == IR_J and not J_RANGE[0] <= imm <= J_RANGE[1]:
+                    raise ValueError(f"Jump target out of range ({imm:+d} bytes, jal reaches +/-1 MiB)")
+                if fmt == IR_WORD and not -(1 << 31) <= imm < (1 << 32):
+                    raise ValueError(f"Value {imm} does not fit in a .word")
+                imm = _int32(imm)
+        except KeyError as ke:
+            start = _column(raw, tokens[0]) - 1 + len(tokens[0])
+            raise AssemblyError(f"Invalid register '{ke.args[0]}'", lineno,
+                                _column(raw, ke.args[0], start), mnemonic, text) from None
+        except ValueError as ve:
+            raise AssemblyError(str(ve), lineno, _column(raw, tokens[0]), mnemonic, text) from None
+        self.op.append(op)
+        self.rd.append(rd)
+        self.rs1.append(rs1)
+        self.rs2.append(rs2)
+        self.imm.append(imm)
+        self.sym.append(sym)
+        self.reloc.append(reloc)
+        self.line.append(lineno)
+
+    def resolved(self):
+        """
+        Generator of (op, format, rd, rs1, rs2, imm) per row with every label operand
+        replaced by its value. Raises AssemblyError for undefined or unreachable labels.
+        """
+        addresses = [self.labels.get(name) for name in self.symbols]
+        table = IR_TABLE
+        for index, (op, rd, rs1, rs2, imm, sym) in enumerate(zip(self.op, self.rd, self.rs1, self.rs2,
+                                                                 self.imm, self.sym)):
+            fmt = table[op][1]
+            if sym >= 0:
+                value = addresses[sym]
+                if value is None:
+                    raise AssemblyError(f"Undefined label '{self.symbols[sym]}'", self.line[index], 1, IR_OPS[op])
+                reloc = self.reloc[index]
+                if reloc == RELOC_PCREL:
+                    imm = value - 4 * index
+                    reach = B_RANGE if fmt == IR_B else J_RANGE
+                    if not reach[0] <= imm <= reach[1]:
+                        raise AssemblyError(f"Target '{self.symbols[sym]}' out of range ({imm:+d} bytes)",
+                                            self.line[index], 1, IR_OPS[op])
+                elif reloc == RELOC_HI:
+                    imm = ((value + 0x800) >> 12) & 0xFFFFF
+                elif reloc == RELOC_LO:
+                    imm = value - (((value + 0x800) >> 12) << 12)
+                else:
+                    imm = value
+            yield op, fmt, rd, rs1, rs2, imm
+
+    def encode(self):
+        """Machine words for every row, as an array('I')."""
+        words = array('I')
+        append = words.append
+        table = IR_TABLE
+        place = _IR_PLACE
+        for op, fmt, rd, rs1, rs2, imm in self.resolved():
+            append(table[op][0] | place[fmt](rd, rs1, rs2, imm))
+        return words
+
+    def rows(self):
+        """
+        (mnemonic, rd, rs1, rs2, imm) per row in the disassembler's decode_rows() conventions:
+        imm is what the encoded word holds (sign-extended, branch/jal offsets resolved, upper-20
+        value for lui/auipc); .word rows are (None, 0, 0, 0, 0).
+        """
+        rows = []
+        append = rows.append
+        for op, fmt, rd, rs1, rs2, imm in self.resolved():
+            if fmt == IR_WORD:
+                append((None, 0, 0, 0, 0))
+                continue
+            bits, mask = _IR_IMM_BITS[fmt]
+            if bits:
+                imm &= mask
+                imm -= (imm & (1 << (bits - 1))) << 1
+            append((IR_OPS[op], rd, rs1, rs2, imm & 0xFFFFF if fmt == IR_U else imm))
+        return rows
+
+    def ram_words(self, addr_bits=None):
+        """Data Memory image from RAM word 0, as Program.ram_words()."""
+        if not self.data.data:
+            return []
+        return data_image_words(self.data.data, self.data.base, RAM_ADDR_BITS if addr_bits is None else addr_bits)
+
+def assemble_ir(source, data_base=DATA_BASE):
+    """
+    Assemble source (a string or any iterable of lines, e.g. an open file, read lazily)
+    into a ProgramIR without keeping the source text. Raises AssemblyError.
+    """
+    if isinstance(source, str):
+        source = source.splitlines()
+    labels = {}
+    data = DataSegment(data_base)
+    ir = ProgramIR(labels, data)
+    append = ir.append
+    for lineno, text, raw in scan_instructions(source, labels, data):
+        append(lineno, text, raw)
+    data.resolve(labels)
+    return ir
+
+# === Command line ===
+# main() first tries parse_fast_args(), which handles the usual non-interactive invocations
+# without importing argparse (and the re/gettext/enum modules it pulls in); anything else
+# (--help, --stats, --profile, '--opt=value', unknown options) goes through argparse.
+
+class CliArgs:
+    """Parsed command line; argparse fills one of these too, so both parsers agree on defaults."""
+    input = output = hex_output = data_output = cache = profile = rom_addr_bits = None
+    data_base = DATA_BASE
+    watch = None
+    poll_interval = 0.02
+    stream = ir = rle = stats = no_prompt = False
+
+# Options parse_fast_args() understands: flag -> (attribute, value converter or None for a switch)
+_FAST_OPTIONS = {
+    '-i': ('input', str), '--input': ('input', str),
+    '-o': ('output', str), '--output': ('output', str),
+    '-x': ('hex_output', str), '--hex-output': ('hex_output', str),
+    '-d': ('data_output', str), '--data-output': ('data_output', str),
+    '--data-base': ('data_base', lambda value: int(value, 0)),
+    '--cache': ('cache', str), '--rom-addr-bits': ('rom_addr_bits', int),
+    '--stream': ('stream', None), '--ir': ('ir', None), '--rle': ('rle', None), '--no-prompt': ('no_prompt', None),
+}
+
+def parse_fast_args(argv):
+    """
+    Parse argv with the options in _FAST_OPTIONS only. Returns a CliArgs, or None when
+    argv needs the full argparse parser (anything unknown, malformed or requesting help).
+    """
+    args = CliArgs()
+    it = iter(argv)
+    for flag in it:
+        option = _FAST_OPTIONS.get(flag)
+        if option is None:
+            return None
+        name, convert = option
+        if convert is None:
+            setattr(args, name, True)
+            continue
+        value = next(it, None)
+        if value is None or value.startswith('-'):
+            return None
+        try:
+            setattr(args, name, convert(value))
+        except ValueError:
+            return None
+    return args
+
+def parse_args(argv):
+    """Full argparse parser for every CLI option."""
+    import argparse
+    parser = argparse.ArgumentParser(description="Extended RISC-V RV32I assembler → Verilog memory[...] assignments")
+    parser.add_argument("--input", "-i", help="Input assembly file (.asm)")
+    parser.add_argument("--output", "-o", help="Output file for Verilog assignments")
+    parser.add_argument("--hex-output", "-x", help="Output file for v2.0 raw .hex (optional)")
+    parser.add_argument("--data-output", "-d", metavar="PATH",
+                        help="Data Memory image (v2.0 raw .hex) for programs with a .data section "
+                             "(default: <hex or output name>_data.hex)")
+    parser.add_argument("--data-base", type=lambda value: int(value, 0), default=DATA_BASE, metavar="ADDR",
+                        help=f"Address of the .data section (default: {DATA_BASE:#x}, RAM word 0)")
+    parser.add_argument("--no-prompt", action="store_true",
+                        help="Never prompt and ignore HARDCODE_*_PATH; --input is required and --output "
+                             "defaults to <input>_mem.v. Implied when stdin is not a terminal.")
+    parser.add_argument("--watch", nargs="*", metavar="ASM",
+                        help="Rebuild on every save until Ctrl-C: --input goes to --hex-output (default "
+                             "<input>.hex) and any extra ASM sources to <source>.hex; files are replaced "
+                             "atomically, so Digital never reads a half-written test.hex")
+    parser.add_argument("--poll-interval", type=float, default=0.02, metavar="SECONDS",
+                        help="How often --watch checks the sources (default: 0.02)")
+    parser.add_argument("--stream", action="store_true",
+                        help="Two lazy passes over the input; memory stays flat for very large sources "
+                             "(out-of-range branches are reported instead of relaxed)")
+    parser.add_argument("--ir", action="store_true",
+                        help="Assemble through the compact columnar IR: one tokenizing pass and ~18 bytes "
+                             "per instruction (no branch relaxation, no cache)")
+    parser.add_argument("--rle", action="store_true",
+                        help="Write the .hex in Digital's run-length form (e.g. '17*0')")
+    parser.add_argument("--rom-addr-bits", type=int, metavar="N",
+                        help="Pad/truncate the .hex to 2**N entries (Instruction Memory uses 8)")
+    parser.add_argument("--cache", metavar="PATH",
+                        help="On-disk per-line encoding cache; only changed lines are re-encoded")
+    parser.add_argument("--stats", action="store_true",
+                        help="Print per-phase timings, per-mnemonic/per-format counts and bytes written "
+                             "(counts are not collected with --stream)")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="Run under cProfile, dump the stats to PATH and print the top functions")
+    return parser.parse_args(argv, namespace=CliArgs())
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    args = parse_fast_args(argv) or parse_args(argv)
+
+    if not args.profile:
+        run(args)
+        return
+    import cProfile
+    import pstats
+    profiler = cProfile.Profile()
+    try:
+        profiler.runcall(run, args)
+    finally:
+        profiler.dump_stats(args.profile)
+        print(f"Profile written to '{args.profile}' (view with: python -m pstats {args.profile})", file=sys.stderr)
+        pstats.Stats(profiler, stream=sys.stderr).sort_stats('cumulative').print_stats(15)
+
+def _clean_path(path):
+    return os.path.expanduser(path.strip('"').strip("'"))
+
+def resolve_paths(args):
+    """
+    Return (asm_path, out_path) for non-interactive runs: no prompts, no HARDCODE_*_PATH probing.
+    Exits with status 2 when --input is missing, 1 when a path is unusable.
+    """
+    if not args.input:
+        print("Error: --input is required when not prompting (--no-prompt, or stdin is not a terminal)",
+              file=sys.stderr)
+        sys.exit(2)
+    asm_path = _clean_path(args.input)
+    if not os.path.isfile(asm_path):
+        print(f"Error: input file '{asm_path}' not found.", file=sys.stderr)
+        sys.exit(1)
+    out_path = _clean_path(args.output) if args.output else os.path.splitext(asm_path)[0] + "_mem.v"
+    dirn = os.path.dirname(out_path) or '.'
+    if not os.path.isdir(dirn):
+        print(f"Error: directory for output '{dirn}' does not exist.", file=sys.stderr)
+        sys.exit(1)
+    return asm_path, out_path
+
+def prompt_paths(args):
+    """Return (asm_path, out_path) the interactive way: HARDCODE_*_PATH, then CLI args, then prompts."""
+    # Determine input path
+    asm_path = None
+    # 1. HARDCODE_INPUT_PATH if valid file
+    if HARDCODE_INPUT_PATH:
+        p = _clean_path(HARDCODE_INPUT_PATH)
+        if os.path.isfile(p):
+            asm_path = p
+        else:
+            # warn but continue
+            print(f"Warning: HARDCODE_INPUT_PATH '{p}' not found. Ignoring hardcode.", file=sys.stderr)
+    # 2. CLI arg
+    if asm_path is None and args.input:
+        p = _clean_path(args.input)
+        if os.path.isfile(p):
+            asm_path = p
+        else:
+            print(f"Warning: input file '{p}' not found. Will prompt.", file=sys.stderr)
+    # 3. Prompt
+    if asm_path is None:
+        asm_path = prompt_for_path("Enter path to input .asm file", must_exist=True)
+
+    # Determine output path
+    out_path = None
+    # HARDCODE_OUTPUT_PATH if its directory exists
+    if HARDCODE_OUTPUT_PATH:
+        p = _clean_path(HARDCODE_OUTPUT_PATH)
+        dirn = os.path.dirname(p) or '.'
+        if os.path.isdir(dirn):
+            out_path = p
+        else:
+            print(f"Warning: HARDCODE_OUTPUT_PATH directory '{dirn}' not exist. Ignoring hardcode.", file=sys.stderr)
+    # CLI arg
+    if out_path is None and args.output:
+        p = _clean_path(args.output)
+        dirn = os.path.dirname(p) or '.'
+        if os.path.isdir(dirn):
+            out_path = p
+        else:
+            print(f"Warning: directory for output '{dirn}' does not exist. Will prompt.", file=sys.stderr)
+    # Prompt if still None
+    if out_path is None:
+        default_out = os.path.splitext(asm_path)[0] + "_mem.v"
+        out_path = prompt_for_path("Enter path to output Verilog memory file", must_exist=False, default=default_out)
+    return asm_path, out_path
+
+# === Watch mode ===
+# --watch polls the sources' mtime/size every --poll-interval seconds (the standard library
+# has no portable file-change notification, and a stat() per file is a few microseconds).
+# A changed source is reassembled in-process with its own warm EncodingCache, so only edited
+# lines are scanned and encoded again (see "Incremental reassembly"), and its files are
+# replaced with write_atomic(). A failed build prints the error and leaves the previous
+# files in place.
+
+class _WatchJob:
+    """One watched source and the files rebuilt from it."""
+    __slots__ = ('asm_path', 'verilog_path', 'hex_path', 'data_path', 'cache', 'signature')
+
+    def __init__(self, asm_path, verilog_path, hex_path, data_path):
+        from encoding_cache import EncodingCache
+        self.asm_path = asm_path
+        self.verilog_path = verilog_path
+        self.hex_path = hex_path
+        self.data_path = data_path
+        self.cache = EncodingCache()
+        self.signature = None
+
+def _source_signature(path):
+    """(mtime_ns, size, inode) of path, or None while it is missing (editors that save by rename)."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+def watch_jobs(args, asm_path, out_path):
+    """
+    _WatchJobs for --watch: the --input source writes --hex-output (default <input>.hex),
+    --data-output and, if --output was given, the .v file; every extra --watch source
+    writes <source>.hex and <source>_data.hex beside itself.
+    """
+    hex_path = _clean_path(args.hex_output) if args.hex_output else os.path.splitext(asm_path)[0] + ".hex"
+    data_path = (_clean_path(args.data_output) if args.data_output else
+                 os.path.splitext(hex_path)[0] + "_data.hex")
+    jobs = [_WatchJob(asm_path, out_path if args.output else None, hex_path, data_path)]
+    for extra in args.watch:
+        path = _clean_path(extra)
+        stem = os.path.splitext(path)[0]
+        jobs.append(_WatchJob(path, None, stem + ".hex", stem + "_data.hex"))
+    return jobs
+
+def rebuild(job, args):
+    """Reassemble one watched source and atomically replace its files. Returns the word count."""
+    with open(job.asm_path, 'r') as f:
+        program = assemble(f.readlines(), job.cache, data_base=args.data_base)
+    if job.verilog_path:
+        write_atomic(write_verilog_memory_file, job.verilog_path, program.words)
+    write_atomic(write_hex_file, job.hex_path, program.words, args.rle, args.rom_addr_bits)
+    if program.data:
+        write_atomic(write_hex_file, job.data_path, program.ram_words(), args.rle)
+    return len(program.words)
+
+def watch(jobs, args, max_builds=None):
+    """
+    Poll the jobs' sources and rebuild each one when it changes, until Ctrl-C
+    (or until max_builds rebuilds have run, for scripted use). Every source is built once at start.
+    """
+    builds = 0
+    names = ", ".join(os.path.basename(job.asm_path) for job in jobs)
+    print(f"Watching {names} (Ctrl-C to stop)", flush=True)
+    try:
+        while max_builds is None or builds < max_builds:
+            for job in jobs:
+                signature = _source_signature(job.asm_path)
+                if signature is None or signature == job.signature:
+                    continue
+                job.signature = signature
+                start = time.perf_counter()
+                try:
+                    count = rebuild(job, args)
+                except AssemblyError as e:
+                    print(f"[{time.strftime('%H:%M:%S')}] {job.asm_path}: {e}", file=sys.stderr, flush=True)
+                    if e.text:
+                        print(f"  >>> {e.text}", file=sys.stderr, flush=True)
+                    continue
+                except OSError as e:
+                    print(f"[{time.strftime('%H:%M:%S')}] {job.asm_path}: {e}", file=sys.stderr, flush=True)
+                    continue
+                finally:
+                    builds += 1
+                elapsed = (time.perf_counter() - start) * 1000
+                print(f"[{time.strftime('%H:%M:%S')}] {job.hex_path}: {count} words in {elapsed:.1f} ms "
+                      f"({job.cache.misses} lines encoded)", flush=True)
+                job.cache.hits = job.cache.misses = job.cache.relinks = 0
+            time.sleep(args.poll_interval)
+    except KeyboardInterrupt:
+        print("Stopped watching.")
+    return builds
+
+def run(args):
+    """Body of main(): resolve paths, assemble and write the outputs for parsed CLI args."""
+    stats = AssemblyStats() if (args.stats or args.profile or _STATS_HOOKS) else None
+    phase = lambda name: _PhaseTimer(stats, name)
+
+    if args.watch is not None or args.no_prompt or sys.stdin is None or not sys.stdin.isatty():
+        asm_path, out_path = resolve_paths(args)
+    else:
+        asm_path, out_path = prompt_paths(args)
+    if args.watch is not None:
+        watch(watch_jobs(args, asm_path, out_path), args)
+        return
+
+    # Read lines (in --stream mode only the label table and data bytes are kept from this pass)
+    data = DataSegment(args.data_base)
+    try:
+        with open(asm_path, 'r') as f:
+            if args.stream:
+                with phase('labels'):
+                    labels, n_words = collect_labels(f, data)
+            elif args.ir:
+                with phase('assemble'):
+                    ir = assemble_ir(f, args.data_base)
+            else:
+                with phase('read'):
+                    lines = f.readlines()
+    except OSError as e:
+        print(f"Error reading '{asm_path}': {e}", file=sys.stderr)
+        sys.exit(1)
+    except AssemblyError as e:
+        report_assembly_error(e)
+
+    cache = None
+    if args.cache:
+        from encoding_cache import EncodingCache
+        cache = EncodingCache(os.path.expanduser(args.cache))
+
+    # Assemble
+    if args.stream:
+        # Pass 2 re-reads the source for each output file; nothing is buffered.
+        make_words = lambda: iter_assemble(asm_path, labels, cache, args.data_base)
+    elif args.ir:
+        try:
+            with phase('encode'):
+                machine_words = ir.encode()
+        except AssemblyError as e:
+            report_assembly_error(e)
+        data = ir.data
+        labels, n_words = ir.labels, len(machine_words)
+        make_words = lambda: machine_words
+    else:
+        try:
+            program = assemble(lines, cache, stats, args.data_base)
+        except AssemblyError as e:
+            report_assembly_error(e)
+        machine_words, data.data = program.words, program.data
+        n_words = len(machine_words)
+        if program.relaxations:
+            print(f"Relaxed {program.relaxations} out-of-range branch/jump instruction(s).")
+        for lineno in program.clobbers:
+            print(f"Warning: line {lineno}: the relaxed far jump overwrites {FAR_JUMP_SCRATCH} (t1), "
+                  f"which this program also uses.", file=sys.stderr)
+        make_words = lambda: machine_words
+
+    # Write outputs
+    outputs = [("Verilog memory file", write_verilog_memory_file, out_path,
+                "Wrote Verilog memory assignments to '{}', {} entries.", "write .v")]
+    if args.hex_output:
+        hex_out_path = _clean_path(args.hex_output)
+        hex_writer = lambda path, words: write_hex_file(path, words, args.rle, args.rom_addr_bits)
+        outputs.append(("HEX file", hex_writer, hex_out_path, "Wrote HEX file '{}', {} entries.", "write .hex"))
+        if args.rom_addr_bits is not None and n_words > 1 << args.rom_addr_bits:
+            print(f"Warning: program has {n_words} words but the ROM holds {1 << args.rom_addr_bits}; "
+                  f"the .hex is truncated.", file=sys.stderr)
+    if data.data or args.data_output:
+        # The Data Memory image starts at RAM word 0, so it loads straight into RAMDualPort.
+        data_out_path = (_clean_path(args.data_output) if args.data_output else
+                         os.path.splitext(_clean_path(args.hex_output) if args.hex_output else out_path)[0] + "_data.hex")
+        ram_image = data_image_words(data.data, data.base) if data.data else []
+        data_writer = lambda path, words: write_hex_file(path, ram_image, args.rle)
+        outputs.append(("data file", data_writer, data_out_path, "Wrote data file '{}', {} entries.", "write data"))
+    for kind, writer, path, done_msg, phase_name in outputs:
+        try:
+            # In --stream mode this phase includes encoding. Writing goes through a temporary
+            # file, so a failure part-way leaves any previous output intact.
+            with phase(phase_name):
+                count = write_atomic(writer, path, make_words())
+        except OSError as e:
+            print(f"Failed to write {kind} '{path}': {e}", file=sys.stderr)
+            sys.exit(1)
+        except AssemblyError as e:
+            # Only reachable in --stream mode, where encoding happens while writing.
+            print(f"'{path}' was not written; any previous file is unchanged.", file=sys.stderr)
+            report_assembly_error(e)
+        print(done_msg.format(path, count))
+        if stats is not None:
+            stats.record_output(path)
+
+    if cache is not None:
+        try:
+            cache.save()
+        except OSError as e:
+            print(f"Warning: could not save cache '{cache.path}': {e}", file=sys.stderr)
+
+    if stats is not None:
+        if args.stream or args.ir:
+            stats.labels, stats.instructions = len(labels), n_words
+        if args.stats:
+            print(stats.report())
+        publish_stats(stats)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# Batch assembler: assemble every .asm file in one or more directories/globs on a
+# process pool, writing <name>.v and <name>.hex side by side for each program, plus
+# <name>_data.hex (the Data Memory image) for programs with a .data section.
+# No hardcoded paths and no prompts, so it is safe to run from scripts/CI.
+# Sources whose outputs would land on the same name (a/x.asm and b/x.asm with one --out-dir)
+# are reported as failures instead of silently overwriting each other.
+# Usage:
+#     python batch_assemble.py "../Asm Programs"
+#     python batch_assemble.py "../Asm Programs/*.asm" --out-dir build --jobs 8
+
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from Assembler import AssemblyError, assemble_file, write_hex_file, write_verilog_memory_file
+
+def find_sources(patterns):
+    """Expand directories (all *.asm inside) and glob patterns into a sorted, de-duplicated path list."""
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            paths.update(glob.glob(os.path.join(glob.escape(pattern), '*.asm')))
+        else:
+            paths.update(p for p in glob.glob(pattern) if os.path.isfile(p))
+    return sorted(paths)
+
+def assemble_one(asm_path, out_dir=None):
+    """
+    Worker: assemble one file and write its .v/.hex outputs (and _data.hex if it has data).
+    Returns (asm_path, word_count, seconds, error_message_or_None); never raises,
+    so one bad program does not take down the rest of the batch.
+    """
+    start = time.perf_counter()
+    stem = os.path.splitext(os.path.basename(asm_path))[0]
+    base = os.path.join(out_dir or os.path.dirname(asm_path), stem)
+    try:
+        program = assemble_file(asm_path)
+        write_verilog_memory_file(base + ".v", program.words)
+        write_hex_file(base + ".hex", program.words)
+        if program.data:
+            write_hex_file(base + "_data.hex", program.ram_words())
+    except AssemblyError as e:
+        return asm_path, 0, time.perf_counter() - start, f"{e}"
+    except OSError as e:
+        return asm_path, 0, time.perf_counter() - start, f"I/O error: {e}"
+    except ValueError as e:
+        # e.g. UnicodeDecodeError for a source that is not valid text
+        return asm_path, 0, time.perf_counter() - start, f"cannot read source: {e}"
+    return asm_path, len(program.words), time.perf_counter() - start, None
+
+def output_clashes(paths, out_dir=None):
+    """{path: message} for sources whose outputs would overwrite another source's (same stem, same directory)."""
+    owners = {}
+    for path in paths:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        base = os.path.normcase(os.path.abspath(os.path.join(out_dir or os.path.dirname(path), stem)))
+        owners.setdefault(base, []).append(path)
+    clashes = {}
+    for base, owned in owners.items():
+        if len(owned) > 1:
+            for path in owned:
+                others = ", ".join(p for p in owned if p != path)
+                clashes[path] = f"output '{base}.v' would also be written for {others}"
+    return clashes
+
+def assemble_batch(paths, out_dir=None, jobs=None):
+    """
+    Assemble paths on a process pool; returns the assemble_one() results in input order.
+    Sources whose outputs would collide (e.g. a/x.asm and b/x.asm with one out_dir) are
+    not assembled and fail with a message naming the other sources.
+    """
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    clashes = output_clashes(paths, out_dir)
+    todo = [p for p in paths if p not in clashes]
+    if jobs == 1 or len(todo) <= 1:
+        done = [assemble_one(p, out_dir) for p in todo]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            chunksize = max(1, len(todo) // ((jobs or os.cpu_count() or 1) * 4))
+            done = list(pool.map(assemble_one, todo, [out_dir] * len(todo), chunksize=chunksize))
+    results = {r[0]: r for r in done}
+    return [results[p] if p not in clashes else (p, 0, 0.0, clashes[p]) for p in paths]
+
+def main():
+    parser = argparse.ArgumentParser(description="Assemble a directory or glob of .asm files in parallel")
+    parser.add_argument("sources", nargs="+", help="Directories (all *.asm inside) or glob patterns")
+    parser.add_argument("--out-dir", "-d", help="Write outputs here instead of next to each source")
+    parser.add_argument("--jobs", "-j", type=int, default=None, help="Worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    paths = find_sources(args.sources)
+    if not paths:
+        print("No .asm files found.", file=sys.stderr)
+        sys.exit(1)
+
+    start = time.perf_counter()
+    results = assemble_batch(paths, args.out_dir, args.jobs)
+    wall = time.perf_counter() - start
+
+    failures = 0
+    width = max(len(os.path.basename(p)) for p in paths)
+    for path, words, seconds, error in results:
+        name = os.path.basename(path)
+        if error:
+            failures += 1
+            print(f"  FAIL {name:<{width}}  {seconds * 1000:8.1f} ms  {error}")
+        else:
+            print(f"  ok   {name:<{width}}  {seconds * 1000:8.1f} ms  {words} words")
+    busy = sum(r[2] for r in results)
+    print(f"{len(results)} files, {failures} failed, wall {wall:.3f} s, "
+          f"summed per-file {busy:.3f} s, {args.jobs or os.cpu_count()} workers")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+# Vectorized batch encoder (requires NumPy).
+# Encodes millions of instruction records at once instead of calling encode_r_type /
+# encode_b_type / encode_j_type ... per instruction. Output is bit-identical to those
+# scalar encoders (verify() checks this on random records). encode_scalar(), the
+# per-record reference, also works without NumPy (fuzzer.py uses it).
+#
+# Input is a structured array with RECORD_DTYPE fields:
+#     mnemonic  - lowercase 'U6' name ('add', 'beq', ...) or an integer index into MNEMONICS
+#     rd, rs1, rs2 (register numbers), imm (int32; shamt for slli/srli/srai,
+#     byte offset for branches/jal, upper-20 value for lui/auipc)
+# Fields a format does not use are ignored.
+# Usage:
+#     python batch_encoder.py [--records 1000000] [--seed 1]   # verify + benchmark
+
+import argparse
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from Assembler import (B_TYPE, DISPATCH_TABLE, I_TYPE, R_TYPE, S_TYPE, U_TYPE,
+                       encode_b_type, encode_i_shift_type, encode_i_type, encode_j_type,
+                       encode_r_type, encode_s_type, encode_u_type)
+
+# Format codes; shifts are separate because their immediate is a 5-bit shamt under funct7.
+FMT_R, FMT_I, FMT_SHIFT, FMT_S, FMT_B, FMT_U, FMT_J = range(7)
+
+def _format_of(mnemonic):
+    if mnemonic in R_TYPE:
+        return FMT_R
+    if mnemonic in ('slli', 'srli', 'srai'):
+        return FMT_SHIFT
+    if mnemonic in I_TYPE:
+        return FMT_I
+    if mnemonic in S_TYPE:
+        return FMT_S
+    if mnemonic in B_TYPE:
+        return FMT_B
+    if mnemonic in U_TYPE:
+        return FMT_U
+    return FMT_J
+
+MNEMONICS = list(DISPATCH_TABLE)
+MNEMONIC_IDS = {m: i for i, m in enumerate(MNEMONICS)}
+if np is not None:
+    RECORD_DTYPE = np.dtype([('mnemonic', 'U6'), ('rd', 'u1'), ('rs1', 'u1'), ('rs2', 'u1'), ('imm', 'i4')])
+    # Per-mnemonic-id lookup arrays: pre-ORed base word (opcode/funct3/funct7) and format code.
+    BASE_WORDS = np.array([DISPATCH_TABLE[m][0] for m in MNEMONICS], dtype=np.uint32)
+    FORMATS = np.array([_format_of(m) for m in MNEMONICS], dtype=np.uint8)
+
+    _SORTED_NAMES = np.array(sorted(MNEMONICS))
+    _SORTED_IDS = np.array([MNEMONIC_IDS[m] for m in sorted(MNEMONICS)], dtype=np.intp)
+
+def mnemonic_ids(mnemonics):
+    """Map an array of lowercase mnemonic strings to MNEMONICS indices. Raises ValueError for unknown names."""
+    mnemonics = np.asarray(mnemonics)
+    pos = np.searchsorted(_SORTED_NAMES, mnemonics).clip(0, len(_SORTED_NAMES) - 1)
+    unknown = _SORTED_NAMES[pos] != mnemonics
+    if unknown.any():
+        raise ValueError(f"Unsupported instruction '{mnemonics[np.argmax(unknown)]}'")
+    return _SORTED_IDS[pos]
+
+def encode_batch(records):
+    """Encode a RECORD_DTYPE structured array into a uint32 array of machine words."""
+    mnem = records['mnemonic']
+    if mnem.dtype.kind in 'iu':
+        ids = mnem.astype(np.intp)
+        if ids.size and (ids.min() < 0 or ids.max() >= len(MNEMONICS)):
+            raise ValueError("mnemonic index out of range")
+    else:
+        ids = mnemonic_ids(mnem)
+
+    fmt = FORMATS[ids]
+    words = BASE_WORDS[ids].copy()
+    rd = (records['rd'].astype(np.uint32) & 0x1F) << 7
+    rs1 = (records['rs1'].astype(np.uint32) & 0x1F) << 15
+    rs2 = (records['rs2'].astype(np.uint32) & 0x1F) << 20
+    imm = records['imm'].astype(np.int64).astype(np.uint32)   # two's complement view
+
+    uses_rd = (fmt == FMT_R) | (fmt == FMT_I) | (fmt == FMT_SHIFT) | (fmt == FMT_U) | (fmt == FMT_J)
+    uses_rs1 = (fmt <= FMT_B)
+    uses_rs2 = (fmt == FMT_R) | (fmt == FMT_S) | (fmt == FMT_B)
+    words |= np.where(uses_rd, rd, 0).astype(np.uint32)
+    words |= np.where(uses_rs1, rs1, 0).astype(np.uint32)
+    words |= np.where(uses_rs2, rs2, 0).astype(np.uint32)
+
+    # Immediate fields per format, all computed with masks and shifts on the whole array.
+    imm_i = (imm & 0xFFF) << 20
+    imm_shift = (imm & 0x1F) << 20
+    imm_s = (((imm >> 5) & 0x7F) << 25) | ((imm & 0x1F) << 7)
+    imm_b = (((imm >> 12) & 0x1) << 31) | (((imm >> 5) & 0x3F) << 25) | \
+            (((imm >> 1) & 0xF) << 8) | (((imm >> 11) & 0x1) << 7)
+    imm_u = (imm & 0xFFFFF) << 12
+    imm_j = (((imm >> 20) & 0x1) << 31) | (((imm >> 1) & 0x3FF) << 21) | \
+            (((imm >> 11) & 0x1) << 20) | (((imm >> 12) & 0xFF) << 12)
+    words |= np.select([fmt == FMT_I, fmt == FMT_SHIFT, fmt == FMT_S, fmt == FMT_B, fmt == FMT_U, fmt == FMT_J],
+                       [imm_i, imm_shift, imm_s, imm_b, imm_u, imm_j], 0).astype(np.uint32)
+    return words
+
+def encode_scalar(mnemonic, rd, rs1, rs2, imm):
+    """Reference: encode one record with the scalar per-format encoders from Assembler.py."""
+    fmt = _format_of(mnemonic)
+    if fmt == FMT_R:
+        return encode_r_type(mnemonic, rd, rs1, rs2)
+    if fmt == FMT_I:
+        return encode_i_type(mnemonic, rd, rs1, imm)
+    if fmt == FMT_SHIFT:
+        return encode_i_shift_type(mnemonic, rd, rs1, imm)
+    if fmt == FMT_S:
+        return encode_s_type(mnemonic, rs2, rs1, imm)
+    if fmt == FMT_B:
+        return encode_b_type(mnemonic, rs1, rs2, imm)
+    if fmt == FMT_U:
+        return encode_u_type(mnemonic, rd, imm)
+    return encode_j_type(mnemonic, rd, imm)
+
+def random_records(n, seed=1):
+    """n random records over every mnemonic, with immediates spanning each format's full range."""
+    rng = np.random.default_rng(seed)
+    records = np.zeros(n, dtype=RECORD_DTYPE)
+    ids = rng.integers(0, len(MNEMONICS), n)
+    records['mnemonic'] = np.array(MNEMONICS)[ids]
+    records['rd'] = rng.integers(0, 32, n)
+    records['rs1'] = rng.integers(0, 32, n)
+    records['rs2'] = rng.integers(0, 32, n)
+    fmt = FORMATS[ids]
+    imm = rng.integers(-2048, 2048, n)
+    imm = np.where(fmt == FMT_SHIFT, rng.integers(0, 32, n), imm)
+    imm = np.where(fmt == FMT_B, rng.integers(-2048, 2048, n) * 2, imm)
+    imm = np.where(fmt == FMT_U, rng.integers(0, 1 << 20, n), imm)
+    imm = np.where(fmt == FMT_J, rng.integers(-(1 << 19), 1 << 19, n) * 2, imm)
+    records['imm'] = imm
+    return records
+
+def verify(records, batch=None, scalar=None):
+    """
+    Return the indices where encode_batch disagrees with encode_scalar (empty when
+    bit-identical). batch and scalar are the two encodings, if already computed.
+    """
+    if batch is None:
+        batch = encode_batch(records)
+    if scalar is None:
+        scalar = [encode_scalar(*rec) for rec in records.tolist()]
+    return np.flatnonzero(np.array(scalar, dtype=np.uint32) != batch).tolist()
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify and benchmark the NumPy batch encoder")
+    parser.add_argument("--records", "-n", type=int, default=1000000, help="Number of random records")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    if np is None:
+        raise SystemExit("batch_encoder.py needs NumPy (pip install numpy)")
+
+    records = random_records(args.records, args.seed)
+
+    start = time.perf_counter()
+    scalar = [encode_scalar(*rec) for rec in records.tolist()]
+    scalar_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = encode_batch(records)
+    batch_time = time.perf_counter() - start
+
+    mismatches = verify(records, batch, scalar)
+    print(f"{args.records} records")
+    print(f"  scalar encoders: {scalar_time:8.3f} s  {args.records / scalar_time:14,.0f} records/s")
+    print(f"  encode_batch:    {batch_time:8.3f} s  {args.records / batch_time:14,.0f} records/s")
+    print(f"  speedup {scalar_time / batch_time:.1f}x, mismatches: {len(mismatches)}")
+    if mismatches:
+        raise SystemExit(f"first mismatch at record {mismatches[0]}: {records[mismatches[0]]}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+# Assembler throughput and memory benchmark.
+# Generates a synthetic program of configurable size and instruction mix, then measures:
+#   pass 1 (scan_instructions: comments, labels)   pass 2 (encode_instructions)
+#   lines/second, the time to write the .v and .hex (plain and run-length) outputs, and the
+#   peak memory each of those phases allocates (tracemalloc, in a separate untimed run).
+# Every run can be appended to a JSON history file; the newest run is compared with the
+# median of the last --baseline-runs runs that used the same generator settings, and any
+# timing that got slower than --tolerance is reported (exit status 1), so regressions are
+# caught in CI. Timings whose baseline is under --min-seconds are too noisy and are skipped.
+# --compare-reference also times the old if/elif chain in assmebler_test.updated_assemble
+# and checks that both produce identical machine words.
+# --startup instead measures cold-start time of whole CLI runs on a small program: the old
+# assmebler_test.py, Assembler.py through argparse and through its fast path, and the zipapp.
+# Usage:
+#     python benchmark.py [--lines 200000] [--repeat 3] [--seed 1]
+#     python benchmark.py --label-every 4 --branch-share 0.4 --comment-share 0.3 --history bench.json
+#     python benchmark.py --startup [--runs 20]
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import Assembler
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# === Synthetic program generator ===
+
+BANNER = "#" * 60
+
+def generate_program(n_lines, seed=1, label_every=16, branch_share=0.2, imm_bits=12, comment_share=0.0):
+    """
+    Return a list of assembly source lines covering every instruction format.
+      label_every   one label line per this many lines
+      branch_share  fraction of instructions that are branches or jal; targets are nearby
+                    labels in both directions so offsets stay inside the B/J immediate range
+      imm_bits      I-type immediates are drawn from the signed range of this many bits (max 12)
+      comment_share fraction of lines that are comment-only (banners, blank-ish lines and
+                    '# ...' notes, as in Golden_Program.asm); instructions also get trailing
+                    comments at the same rate
+    """
+    rng = random.Random(seed)
+    reg = lambda: f"x{rng.randrange(32)}"
+    r_ops = list(Assembler.R_TYPE)
+    i_ops = ['addi', 'andi', 'ori', 'xori', 'slti', 'sltiu']
+    shift_ops = ['slli', 'srli', 'srai']
+    b_ops = list(Assembler.B_TYPE)
+    imm_lo, imm_hi = -(1 << (min(imm_bits, 12) - 1)), 1 << (min(imm_bits, 12) - 1)
+    max_label = n_lines // label_every
+
+    lines = []
+    n_labels = 0
+    while len(lines) < n_lines:
+        if len(lines) % label_every == 0:
+            lines.append(f"L{n_labels}:")
+            n_labels += 1
+            continue
+        if rng.random() < comment_share:
+            kind = rng.randrange(3)
+            if kind == 0:
+                lines.append(BANNER)
+            elif kind == 1:
+                lines.append("")
+            else:
+                lines.append(f"# step {len(lines)}: x{rng.randrange(32)} holds the running value")
+            continue
+        # Targets within +/-4 labels of the current position.
+        target = f"L{max(0, min(n_labels + rng.randrange(-4, 4), max_label))}"
+        if rng.random() < branch_share:
+            if rng.randrange(4):
+                line = f"    {rng.choice(b_ops)} {reg()}, {reg()}, {target}"
+            else:
+                line = f"    jal {reg()}, {target}"
+        else:
+            kind = rng.randrange(8)
+            if kind < 3:
+                line = f"    {rng.choice(r_ops)} {reg()}, {reg()}, {reg()}"
+            elif kind < 5:
+                line = f"    {rng.choice(i_ops)} {reg()}, {reg()}, {rng.randrange(imm_lo, imm_hi)}"
+            elif kind == 5:
+                line = f"    {rng.choice(shift_ops)} {reg()}, {reg()}, {rng.randrange(32)}"
+            elif kind == 6:
+                line = f"    lw {reg()}, {rng.randrange(imm_lo // 4, imm_hi // 4) * 4}({reg()})"
+            else:
+                line = f"    sw {reg()}, {rng.randrange(imm_lo // 4, imm_hi // 4) * 4}({reg()})"
+        if rng.random() < comment_share:
+            line = f"{line:<32}# load/store/compute"
+        lines.append(line)
+    # Make sure every referenced label exists.
+    for extra in range(n_labels, max_label + 1):
+        lines.append(f"L{extra}:")
+    lines.append("    lui x5, 0x12345")
+    lines.append("    auipc x6, 1")
+    lines.append("    jalr x0, 0(x1)")
+    return [line + "\n" for line in lines]
+
+# === Measurements ===
+
+def best_of(repeat, fn):
+    """Return (best_seconds, last_result) over `repeat` calls of fn()."""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def traced_peak_mib(fn):
+    """
+    Peak MiB of Python memory allocated during one fn() call (tracemalloc; what was
+    allocated before the call is not counted). Tracing slows allocation down, so this
+    is a separate call from the timed ones.
+    """
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / (1 << 20)
+
+def run_suite(lines, repeat):
+    """Time both passes and the writers on `lines`. Returns a dict of results."""
+    def pass1():
+        labels = {}
+        return list(Assembler.scan_instructions(lines, labels)), labels
+
+    pass1_time, (instructions, labels) = best_of(repeat, pass1)
+    pass2_time, words = best_of(repeat, lambda: list(Assembler.encode_instructions(instructions, labels)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        v_path = os.path.join(tmp, "out.v")
+        hex_path = os.path.join(tmp, "out.hex")
+        write_v, _ = best_of(repeat, lambda: Assembler.write_verilog_memory_file(v_path, words))
+        write_hex, _ = best_of(repeat, lambda: Assembler.write_hex_file(hex_path, words))
+        write_rle, _ = best_of(repeat, lambda: Assembler.write_hex_file(hex_path, words, compress=True))
+        write_peak = max(traced_peak_mib(lambda: Assembler.write_verilog_memory_file(v_path, words)),
+                         traced_peak_mib(lambda: Assembler.write_hex_file(hex_path, words)),
+                         traced_peak_mib(lambda: Assembler.write_hex_file(hex_path, words, compress=True)))
+
+    total = pass1_time + pass2_time
+    return {
+        'source_lines': len(lines),
+        'instructions': len(words),
+        'pass1_s': pass1_time,
+        'pass2_s': pass2_time,
+        'lines_per_s': len(lines) / total if total else 0.0,
+        'write_verilog_s': write_v,
+        'write_hex_s': write_hex,
+        'write_hex_rle_s': write_rle,
+        'pass1_peak_mib': traced_peak_mib(pass1),
+        'pass2_peak_mib': traced_peak_mib(lambda: list(Assembler.encode_instructions(instructions, labels))),
+        'write_peak_mib': write_peak,
+    }
+
+def compare_reference(lines, repeat):
+    """Time assmebler_test.updated_assemble against Assembler.updated_assemble; abort on any mismatch."""
+    import assmebler_test
+    before, old_words = best_of(repeat, lambda: assmebler_test.updated_assemble(lines))
+    after, new_words = best_of(repeat, lambda: Assembler.updated_assemble(lines))
+    if old_words != new_words:
+        raise SystemExit("Mismatch: table-driven encoder output differs from the reference implementation")
+    print(f"  reference (if/elif chain): {before:8.3f} s  {len(lines) / before:12,.0f} lines/s")
+    print(f"  current (dispatch table):  {after:8.3f} s  {len(lines) / after:12,.0f} lines/s")
+    print(f"  speedup: {before / after:.2f}x")
+
+# === CLI start-up time ===
+
+def time_command(cmd, runs, cwd):
+    """Run cmd `runs` times with stdin closed; return (best, median) wall seconds. Exits if it fails."""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run(cmd, cwd=cwd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                stderr=subprocess.PIPE)
+        times.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            raise SystemExit(f"{' '.join(cmd)} failed: {result.stderr.decode(errors='replace').strip()}")
+    times.sort()
+    return times[0], times[len(times) // 2]
+
+def startup_benchmark(runs):
+    """Print cold-start times of the assembler CLIs on fibo.asm."""
+    import build_zipapp
+    source = os.path.join(HERE, "..", "Asm Programs", "fibo.asm")
+    with tempfile.TemporaryDirectory() as tmp:
+        out = os.path.join(tmp, "out.v")
+        pyz = os.path.join(tmp, "assembler.pyz")
+        build_zipapp.build(pyz)
+        py = sys.executable
+        # The first run of each script also writes its __pycache__, so every command gets
+        # one untimed warm-up run; "cold" here means a fresh interpreter process.
+        commands = [
+            ("interpreter only (python -c pass)", [py, "-c", "pass"]),
+            ("assmebler_test.py (before)", [py, os.path.join(HERE, "assmebler_test.py"), "-i", source, "-o", out]),
+            ("Assembler.py via argparse", [py, os.path.join(HERE, "Assembler.py"), f"--input={source}", "-o", out]),
+            ("Assembler.py fast path", [py, os.path.join(HERE, "Assembler.py"), "-i", source, "-o", out]),
+            ("assembler.pyz", [py, pyz, "-i", source, "-o", out]),
+        ]
+        results = []
+        for name, cmd in commands:
+            time_command(cmd, 1, tmp)
+            results.append((name,) + time_command(cmd, runs, tmp))
+    print(f"CLI start-up, {runs} runs each (best / median):")
+    for name, best, median in results:
+        print(f"  {name:<36} {best * 1000:7.1f} ms  {median * 1000:7.1f} ms")
+    before, fast = results[1][2], results[3][2]
+    print(f"  fast path vs before (median): {before / fast:.2f}x")
+
+# === History ===
+
+TIMING_KEYS = ('pass1_s', 'pass2_s', 'write_verilog_s', 'write_hex_s', 'write_hex_rle_s')
+
+def git_revision():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+def load_history(path):
+    """Return the list of past runs in path ([] if it does not exist yet). Raises ValueError on bad JSON."""
+    if not os.path.isfile(path):
+        return []
+    with open(path, 'r') as f:
+        history = json.load(f)
+    if not isinstance(history, list):
+        raise ValueError(f"'{path}' does not hold a list of benchmark runs")
+    return history
+
+def save_history(path, history):
+    """Rewrite the history file atomically."""
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'w') as f:
+        json.dump(history, f, indent=1)
+        f.write("\n")
+    os.replace(tmp_path, path)
+
+def _median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2
+
+def find_regressions(previous_runs, current, tolerance, min_seconds=0.0):
+    """
+    List (key, baseline, new) for every timing more than `tolerance` (fraction) slower than
+    the median of that timing over previous_runs. Timings whose baseline is below
+    min_seconds are skipped: single best-of-N values that short are mostly noise.
+    """
+    slower = []
+    for key in TIMING_KEYS:
+        history = [run['results'][key] for run in previous_runs if run['results'].get(key)]
+        new = current['results'].get(key)
+        if not history or not new:
+            continue
+        old = _median(history)
+        if old >= min_seconds and new > old * (1 + tolerance):
+            slower.append((key, old, new))
+    return slower
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark assembler passes, writers and memory use")
+    parser.add_argument("--lines", "-n", type=int, default=200000, help="Number of synthetic source lines")
+    parser.add_argument("--repeat", "-r", type=int, default=3, help="Runs per measurement (best is reported)")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for the program generator")
+    parser.add_argument("--label-every", type=int, default=16, help="One label line per N lines")
+    parser.add_argument("--branch-share", type=float, default=0.2, help="Fraction of branch/jal instructions")
+    parser.add_argument("--imm-bits", type=int, default=12, help="Signed width of I/S-type immediates (<= 12)")
+    parser.add_argument("--comment-share", type=float, default=0.0,
+                        help="Fraction of comment-only lines (and of instructions with trailing comments)")
+    parser.add_argument("--history", metavar="PATH", help="Append results to this JSON history file")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="Allowed slowdown against the baseline before failing (default 0.10)")
+    parser.add_argument("--baseline-runs", type=int, default=5,
+                        help="Previous matching runs whose median timings form the baseline (default 5)")
+    parser.add_argument("--min-seconds", type=float, default=0.05,
+                        help="Ignore timings whose baseline is shorter than this (default 0.05)")
+    parser.add_argument("--compare-reference", action="store_true",
+                        help="Also time the old if/elif encoder in assmebler_test.py and check identical output")
+    parser.add_argument("--startup", action="store_true",
+                        help="Measure CLI cold-start time instead of assembler throughput")
+    parser.add_argument("--runs", type=int, default=20, help="Processes started per CLI with --startup")
+    args = parser.parse_args()
+
+    if args.startup:
+        startup_benchmark(args.runs)
+        return
+
+    params = {'lines': args.lines, 'seed': args.seed, 'label_every': args.label_every,
+              'branch_share': args.branch_share, 'imm_bits': args.imm_bits, 'comment_share': args.comment_share}
+    lines = generate_program(args.lines, args.seed, args.label_every, args.branch_share,
+                             args.imm_bits, args.comment_share)
+    results = run_suite(lines, args.repeat)
+
+    print(f"Synthetic program: {results['source_lines']} lines, {results['instructions']} instructions")
+    print(f"  pass 1 (scan):       {results['pass1_s']:8.3f} s")
+    print(f"  pass 2 (encode):     {results['pass2_s']:8.3f} s")
+    print(f"  throughput:          {results['lines_per_s']:12,.0f} lines/s")
+    print(f"  write .v:            {results['write_verilog_s']:8.3f} s")
+    print(f"  write .hex:          {results['write_hex_s']:8.3f} s")
+    print(f"  write .hex (rle):    {results['write_hex_rle_s']:8.3f} s")
+    print(f"  peak traced memory:  pass 1 {results['pass1_peak_mib']:.1f} MiB, pass 2 "
+          f"{results['pass2_peak_mib']:.1f} MiB, writers {results['write_peak_mib']:.1f} MiB (tracemalloc)")
+
+    if args.compare_reference:
+        compare_reference(lines, args.repeat)
+
+    if not args.history:
+        return
+    try:
+        history = load_history(args.history)
+    except (OSError, ValueError) as e:
+        print(f"Error: cannot read history '{args.history}': {e}", file=sys.stderr)
+        sys.exit(1)
+    run = {'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'revision': git_revision(),
+           'python': platform.python_version(), 'params': params, 'results': results}
+    previous = [r for r in history if r.get('params') == params][-max(1, args.baseline_runs):]
+    history.append(run)
+    try:
+        save_history(args.history, history)
+    except OSError as e:
+        print(f"Error: cannot write history '{args.history}': {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if not previous:
+        print(f"Recorded first run with these settings in {args.history}")
+        return
+    slower = find_regressions(previous, run, args.tolerance, args.min_seconds)
+    since = previous[-1].get('revision') or previous[-1].get('time')
+    baseline = f"the median of {len(previous)} run(s) up to {since}"
+    for key, old, new in slower:
+        print(f"  REGRESSION {key}: {old:.3f} s -> {new:.3f} s ({(new / old - 1) * 100:+.0f}%)")
+    if slower:
+        print(f"{len(slower)} timings regressed by more than {args.tolerance:.0%} against {baseline}")
+        sys.exit(1)
+    print(f"No regressions against {baseline}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# Build a single-file assembler: dist/assembler.pyz (a zipapp, see the zipapp module docs).
+# The archive holds Assembler.py and encoding_cache.py plus precompiled bytecode for the
+# interpreter that builds it, because zipimport cannot write .pyc files itself and would
+# otherwise recompile Assembler.py on every start. Other Python versions ignore the
+# bytecode and fall back to the sources.
+# Usage:
+#     python build_zipapp.py [--output dist/assembler.pyz] [--python "/usr/bin/env python3"]
+#     python dist/assembler.pyz -i prog.asm -o prog.v -x prog.hex
+
+import argparse
+import os
+import py_compile
+import shutil
+import sys
+import tempfile
+import zipapp
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MODULES = ["Assembler.py", "encoding_cache.py"]
+
+def build(output, interpreter=None):
+    """Write the archive to output and return its size in bytes."""
+    with tempfile.TemporaryDirectory() as staging:
+        for name in MODULES:
+            source = os.path.join(staging, name)
+            shutil.copy2(os.path.join(HERE, name), source)
+            # zipimport looks for name.pyc next to name.py at the archive root. Unchecked
+            # hash-based pycs are used without comparing timestamps against the sources.
+            py_compile.compile(source, cfile=os.path.splitext(source)[0] + ".pyc", doraise=True,
+                               invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH)
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        zipapp.create_archive(staging, output, interpreter=interpreter, main="Assembler:main")
+    return os.path.getsize(output)
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack the assembler CLI into a single .pyz file")
+    parser.add_argument("--output", "-o", default=os.path.join(HERE, "dist", "assembler.pyz"),
+                        help="Archive to write (default: dist/assembler.pyz)")
+    parser.add_argument("--python", metavar="INTERPRETER",
+                        help="Shebang interpreter, e.g. '/usr/bin/env python3' (makes the archive executable)")
+    args = parser.parse_args()
+
+    try:
+        size = build(args.output, args.python)
+    except (OSError, py_compile.PyCompileError, zipapp.ZipAppError) as e:
+        print(f"Error: could not build '{args.output}': {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"Wrote '{args.output}' ({size} bytes)")
+
+if __name__ == "__main__":
+    main()
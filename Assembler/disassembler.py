@@ -0,0 +1,329 @@
+# Table-driven disassembler for v2.0 raw .hex and Verilog memory (.v) images.
+# The decode tables are built by reversing the assembler's R/I/S/B/U/J tables, so any
+# instruction added there is picked up here (and by simulator.py, which uses decode()).
+#
+# Whole images are decoded in bulk: with NumPy installed, field extraction is vectorized
+# and the mnemonic comes from a single gather into a 2**17-entry lookup table indexed by
+# opcode | funct3 << 7 | funct7 << 10. Without NumPy the same results come from decode().
+# Branch/jal targets inside the image become synthetic labels (L_0010:), so the listing
+# re-assembles to the same words; address and raw word are kept as trailing comments.
+# Words outside the instruction set are listed as '.word 0x...'.
+# Usage:
+#     python disassembler.py "../Test Programs/test.hex" [-o test.asm]
+#     python disassembler.py old.hex --diff new.hex          # exit status 1 if they differ
+
+import argparse
+import sys
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from Assembler import (B_TYPE, DISPATCH_TABLE, I_TYPE, J_TYPE, R_TYPE, S_TYPE, U_TYPE,
+                       read_hex_file, read_verilog_memory_file)
+
+class IllegalInstruction(ValueError):
+    """A word does not encode any instruction in the assembler tables."""
+
+# === Decode tables ===
+
+SHIFT_IMMEDIATES = ('slli', 'srli', 'srai')
+
+def _build_decode_table():
+    """
+    Reverse lookup {(opcode, funct3, funct7): (mnemonic, format)} from the assembler tables.
+    funct3/funct7 are None where the format does not use them.
+    """
+    table = {}
+    for m, info in R_TYPE.items():
+        table[(info['opcode'], info['funct3'], info['funct7'])] = (m, 'R')
+    for m, info in I_TYPE.items():
+        if m in SHIFT_IMMEDIATES:
+            table[(info['opcode'], info['funct3'], info['funct7'])] = (m, 'I')
+        else:
+            table[(info['opcode'], info['funct3'], None)] = (m, 'I')
+    for m, info in S_TYPE.items():
+        table[(info['opcode'], info['funct3'], None)] = (m, 'S')
+    for m, info in B_TYPE.items():
+        table[(info['opcode'], info['funct3'], None)] = (m, 'B')
+    for m, info in U_TYPE.items():
+        table[(info['opcode'], None, None)] = (m, 'U')
+    for m, info in J_TYPE.items():
+        table[(info['opcode'], None, None)] = (m, 'J')
+    return table
+
+DECODE_TABLE = _build_decode_table()
+
+# Mnemonic ids use the same order as batch_encoder.MNEMONICS, so decode_image() records
+# can be fed straight back into encode_batch().
+MNEMONICS = list(DISPATCH_TABLE)
+MNEMONIC_IDS = {m: i for i, m in enumerate(MNEMONICS)}
+
+def _sext(value, bits):
+    """Sign-extend the low `bits` bits of value."""
+    sign = 1 << (bits - 1)
+    return (value & (sign - 1)) - (value & sign)
+
+def decode(word):
+    """
+    Decode a 32-bit word into (mnemonic, rd, rs1, rs2, imm).
+    Fields a format does not use are 0; imm is sign-extended (U-type keeps the upper-20 value << 12).
+    Raises IllegalInstruction for words outside the supported instruction set.
+    """
+    opcode = word & 0x7F
+    funct3 = (word >> 12) & 0x7
+    funct7 = word >> 25
+    entry = (DECODE_TABLE.get((opcode, funct3, funct7)) or DECODE_TABLE.get((opcode, funct3, None))
+             or DECODE_TABLE.get((opcode, None, None)))
+    if entry is None:
+        raise IllegalInstruction(f"Illegal instruction word {word:08X}")
+    mnemonic, fmt = entry
+    rd = (word >> 7) & 0x1F
+    rs1 = (word >> 15) & 0x1F
+    rs2 = (word >> 20) & 0x1F
+    if fmt == 'R':
+        return mnemonic, rd, rs1, rs2, 0
+    if fmt == 'I':
+        if mnemonic in SHIFT_IMMEDIATES:
+            return mnemonic, rd, rs1, 0, rs2
+        return mnemonic, rd, rs1, 0, _sext(word >> 20, 12)
+    if fmt == 'S':
+        return mnemonic, 0, rs1, rs2, _sext(((word >> 25) << 5) | ((word >> 7) & 0x1F), 12)
+    if fmt == 'B':
+        imm = (((word >> 31) & 0x1) << 12) | (((word >> 7) & 0x1) << 11) | \
+              (((word >> 25) & 0x3F) << 5) | (((word >> 8) & 0xF) << 1)
+        return mnemonic, 0, rs1, rs2, _sext(imm, 13)
+    if fmt == 'U':
+        return mnemonic, rd, 0, 0, word & 0xFFFFF000
+    imm = (((word >> 31) & 0x1) << 20) | (((word >> 12) & 0xFF) << 12) | \
+          (((word >> 20) & 0x1) << 11) | (((word >> 21) & 0x3FF) << 1)
+    return mnemonic, rd, 0, 0, _sext(imm, 21)
+
+# === Bulk decoding ===
+# Records use batch_encoder's conventions: mnemonic is an index into MNEMONICS (-1 for an
+# illegal word), imm is the shamt for shifts and the upper-20 value for lui/auipc.
+
+FMT_R, FMT_I, FMT_SHIFT, FMT_S, FMT_B, FMT_U, FMT_J = range(7)
+_FORMAT_CODES = {'R': FMT_R, 'I': FMT_I, 'S': FMT_S, 'B': FMT_B, 'U': FMT_U, 'J': FMT_J}
+
+def _format_code(mnemonic, fmt):
+    return FMT_SHIFT if mnemonic in SHIFT_IMMEDIATES else _FORMAT_CODES[fmt]
+
+FORMAT_OF = {m: _format_code(m, fmt) for m, fmt in DECODE_TABLE.values()}
+
+if np is not None:
+    DECODED_DTYPE = np.dtype([('mnemonic', 'i2'), ('rd', 'u1'), ('rs1', 'u1'), ('rs2', 'u1'), ('imm', 'i4')])
+
+    def _build_lookup():
+        """Dense mnemonic-id table over all 2**17 (opcode, funct3, funct7) keys; -1 is illegal."""
+        lut = np.full(1 << 17, -1, dtype=np.int16)
+        keys = np.arange(1 << 17)
+        opcode, funct3, funct7 = keys & 0x7F, (keys >> 7) & 0x7, keys >> 10
+        # Wildcard entries first, so exact (funct3, funct7) matches overwrite them.
+        for (op, f3, f7), (m, _) in sorted(DECODE_TABLE.items(), key=lambda kv: (kv[0][1] is not None,
+                                                                                kv[0][2] is not None)):
+            match = opcode == op
+            if f3 is not None:
+                match &= funct3 == f3
+            if f7 is not None:
+                match &= funct7 == f7
+            lut[match] = MNEMONIC_IDS[m]
+        return lut
+
+    _LOOKUP = _build_lookup()
+    _FORMATS = np.array([FORMAT_OF[m] for m in MNEMONICS] + [FMT_R], dtype=np.uint8)   # [-1] -> unused
+
+def decode_image(words):
+    """
+    Decode a whole image (list or uint32 array) into a DECODED_DTYPE structured array.
+    Requires NumPy. Unused fields are 0, like decode(); illegal words have mnemonic -1.
+    """
+    if np is None:
+        raise RuntimeError("decode_image() requires NumPy")
+    w = np.asarray(words, dtype=np.uint32)
+    ws = w.view(np.int32)                       # arithmetic shifts give sign extension for free
+    ids = _LOOKUP[(w & 0x7F) | (((w >> 12) & 0x7) << 7) | ((w >> 25) << 10)]
+    fmt = _FORMATS[ids]
+
+    records = np.zeros(len(w), dtype=DECODED_DTYPE)
+    records['mnemonic'] = ids
+    legal = ids >= 0
+    uses_rd = legal & ((fmt == FMT_R) | (fmt == FMT_I) | (fmt == FMT_SHIFT) | (fmt == FMT_U) | (fmt == FMT_J))
+    uses_rs1 = legal & (fmt <= FMT_B)
+    uses_rs2 = legal & ((fmt == FMT_R) | (fmt == FMT_S) | (fmt == FMT_B))
+    records['rd'] = np.where(uses_rd, (w >> 7) & 0x1F, 0)
+    records['rs1'] = np.where(uses_rs1, (w >> 15) & 0x1F, 0)
+    records['rs2'] = np.where(uses_rs2, (w >> 20) & 0x1F, 0)
+
+    imm_i = ws >> 20
+    imm_shift = (w >> 20) & 0x1F
+    imm_s = ((ws >> 25) << 5) | ((w >> 7) & 0x1F)
+    imm_b = ((ws >> 31) << 12) | (((w >> 7) & 0x1) << 11) | (((w >> 25) & 0x3F) << 5) | (((w >> 8) & 0xF) << 1)
+    imm_u = w >> 12
+    imm_j = ((ws >> 31) << 20) | (((w >> 12) & 0xFF) << 12) | (((w >> 20) & 0x1) << 11) | (((w >> 21) & 0x3FF) << 1)
+    records['imm'] = np.select([~legal, fmt == FMT_I, fmt == FMT_SHIFT, fmt == FMT_S, fmt == FMT_B,
+                                fmt == FMT_U, fmt == FMT_J],
+                               [0, imm_i, imm_shift, imm_s, imm_b, imm_u, imm_j], 0)
+    return records
+
+def decode_rows(words):
+    """
+    Decode an image into a list of (mnemonic_or_None, rd, rs1, rs2, imm) tuples using the record
+    conventions above. Vectorized when NumPy is available, decode() per word otherwise.
+    """
+    if np is not None:
+        records = decode_image(words)
+        names = np.array(MNEMONICS + [None], dtype=object)[records['mnemonic']]
+        return list(zip(names.tolist(), records['rd'].tolist(), records['rs1'].tolist(),
+                        records['rs2'].tolist(), records['imm'].tolist()))
+    rows = []
+    for word in words:
+        try:
+            m, rd, rs1, rs2, imm = decode(word)
+        except IllegalInstruction:
+            rows.append((None, 0, 0, 0, 0))
+            continue
+        rows.append((m, rd, rs1, rs2, imm >> 12 if m in U_TYPE else imm))
+    return rows
+
+def find_targets(rows):
+    """Word-aligned byte addresses inside the image that some branch/jal jumps to."""
+    size = len(rows) * 4
+    targets = set()
+    for index, (m, _, _, _, imm) in enumerate(rows):
+        if m in B_TYPE or m in J_TYPE:
+            target = index * 4 + imm
+            if 0 <= target < size and target % 4 == 0:
+                targets.add(target)
+    return targets
+
+# === Formatting ===
+
+def label_name(addr):
+    return f"L_{addr:04x}"
+
+def _templates():
+    """Per-mnemonic str.format templates in the syntax Assembler.py accepts."""
+    templates = {}
+    for m in MNEMONICS:
+        fmt = FORMAT_OF[m]
+        if fmt == FMT_R:
+            templates[m] = m + " x{1}, x{2}, x{3}"
+        elif fmt == FMT_SHIFT:
+            templates[m] = m + " x{1}, x{2}, {4}"
+        elif fmt == FMT_I and I_TYPE[m]['opcode'] in (0b0000011, 0b1100111):   # loads, jalr
+            templates[m] = m + " x{1}, {4}(x{2})"
+        elif fmt == FMT_I:
+            templates[m] = m + " x{1}, x{2}, {4}"
+        elif fmt == FMT_S:
+            templates[m] = m + " x{3}, {4}(x{2})"
+        elif fmt == FMT_B:
+            templates[m] = m + " x{2}, x{3}, {5}"
+        elif fmt == FMT_U:
+            templates[m] = m + " x{1}, {4:#x}"
+        else:
+            templates[m] = m + " x{1}, {5}"
+    return templates
+
+TEMPLATES = _templates()
+
+def format_row(row, pc, word, targets):
+    """Assembly text for one decoded row at byte address pc; targets is the set of labelled addresses."""
+    m = row[0]
+    if m is None:
+        return f".word {word:#010x}"
+    target = ""
+    if m in B_TYPE or m in J_TYPE:
+        addr = pc + row[4]
+        target = label_name(addr) if addr in targets else str(row[4])
+    return TEMPLATES[m].format(*row, target)
+
+def disassemble(words, comments=True, rows=None):
+    """
+    Return the listing of an image as a list of lines (no newlines): synthetic labels at every
+    branch/jal target, and '# addr: word' comments unless comments=False.
+    rows skips decoding when the fields are already known, e.g. ProgramIR.rows().
+    """
+    if rows is None:
+        rows = decode_rows(words)
+    targets = find_targets(rows)
+    line_format = "    %-28s# %04x: %08x" if comments else "    %s"
+    lines = []
+    append = lines.append
+    for index, (row, word) in enumerate(zip(rows, words)):
+        pc = index * 4
+        if pc in targets:
+            append(f"{label_name(pc)}:")
+        text = format_row(row, pc, word, targets)
+        append(line_format % (text, pc, word) if comments else line_format % text)
+    return lines
+
+# === Image comparison ===
+
+def diff_images(old_words, new_words):
+    """Byte addresses (ascending) where two images differ; the shorter image reads as zeros past its end."""
+    n = max(len(old_words), len(new_words))
+    if np is not None:
+        old = np.zeros(n, dtype=np.uint32)
+        new = np.zeros(n, dtype=np.uint32)
+        old[:len(old_words)] = old_words
+        new[:len(new_words)] = new_words
+        return (np.flatnonzero(old != new) * 4).tolist()
+    old = list(old_words) + [0] * (n - len(old_words))
+    new = list(new_words) + [0] * (n - len(new_words))
+    return [i * 4 for i in range(n) if old[i] != new[i]]
+
+def _diff_line(rows, words, targets, addr):
+    index = addr // 4
+    if index >= len(words):
+        return "(past end of image)"
+    return f"{words[index]:08x}  {format_row(rows[index], addr, words[index], targets)}"
+
+# === I/O ===
+
+def load_image(path):
+    """Read a .v (Verilog memory assignments) or v2.0 raw .hex image into a word list."""
+    if path.lower().endswith('.v'):
+        return read_verilog_memory_file(path)
+    return read_hex_file(path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Disassemble a .hex/.v image back to assembly")
+    parser.add_argument("image", help="Input image (.hex in v2.0 raw format, or .v)")
+    parser.add_argument("--output", "-o", help="Write the listing here instead of stdout")
+    parser.add_argument("--no-comments", action="store_true", help="Omit the '# addr: word' comments")
+    parser.add_argument("--diff", metavar="OTHER", help="Compare against another image and list changed words")
+    args = parser.parse_args()
+
+    try:
+        words = load_image(args.image)
+        other = load_image(args.diff) if args.diff else None
+    except (ValueError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if other is not None:
+        changed = diff_images(words, other)
+        old_rows, new_rows = decode_rows(words), decode_rows(other)
+        old_targets, new_targets = find_targets(old_rows), find_targets(new_rows)
+        for addr in changed:
+            print(f"{addr:04x}: - {_diff_line(old_rows, words, old_targets, addr)}")
+            print(f"{addr:04x}: + {_diff_line(new_rows, other, new_targets, addr)}")
+        print(f"{len(changed)} of {max(len(words), len(other))} words differ")
+        sys.exit(1 if changed else 0)
+
+    listing = "\n".join(disassemble(words, comments=not args.no_comments)) + "\n"
+    if args.output:
+        try:
+            with open(args.output, 'w') as f:
+                f.write(listing)
+        except OSError as e:
+            print(f"Error: cannot write '{args.output}': {e}", file=sys.stderr)
+            sys.exit(1)
+        print(f"Disassembled {len(words)} words to: {args.output}")
+    else:
+        sys.stdout.write(listing)
+
+if __name__ == "__main__":
+    main()
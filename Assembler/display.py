@@ -0,0 +1,335 @@
+# Headless model of the display hardware in RISCV_Top.dig, driven by the simulator (requires NumPy).
+#
+#   GraphicCard (128 x 128, 7-bit colour, two banks)
+#       A = Result[14:0], D = {0, RD2[5:0]}, str = MemWrite, B = 0
+#       Every sw also writes one pixel: index = byte address & 0x7FFF, colour = stored word & 0x3F.
+#       Bank 0 (indices 0..16383, x = index % 128, y = index // 128) is the one shown.
+#   Six SixteenSeg displays (INSTRUCTION DISPLAY, through testDisplay.dig)
+#       Spell the current instruction's mnemonic; each character is looked up in the 128-entry
+#       ASCII ROM (alphanum.hex) as a 16-bit segment pattern.
+#   The LED only mirrors the Debug Mode switch, so it is not modelled.
+#
+# The framebuffer is a bytearray of palette indices with a NumPy view over it. Stores update
+# a dirty rectangle for the shown bank, so a frame is only written when pixels changed.
+# Only the sw instructions call into the model (Simulator.set_store_hook), so programs run
+# at simulator speed. Frames are written as PNG (no imaging library needed) or as .npy arrays
+# of palette indices, which --expect compares against for regression tests.
+# Usage:
+#     python display.py pixel.asm -o frame.png [--scale 4] [--max-cycles N]
+#     python display.py pixel.asm --frames out/ --every 100000       # one PNG per changed slice
+#     python display.py pixel.asm -o frame.npy                        # palette indices
+#     python display.py pixel.asm --expect frame.npy                  # exit 1 if the frame differs
+#     python display.py --font "ADD   "                               # show segment patterns
+
+import argparse
+import os
+import struct
+import sys
+import time
+import zlib
+
+import numpy as np
+
+from Assembler import AssemblyError, read_hex_file
+from disassembler import IllegalInstruction, decode
+from simulator import DEFAULT_MAX_CYCLES, SimulationError, Simulator
+
+GRAPHIC_WIDTH = GRAPHIC_HEIGHT = 128
+GRAPHIC_BANKS = 2
+ADDRESS_MASK = GRAPHIC_BANKS * GRAPHIC_WIDTH * GRAPHIC_HEIGHT - 1    # Result[14:0]
+COLOR_MASK = 0x3F                                                    # RD2[5:0]; D[6] is tied to 0
+SHOWN_BANK = 0                                                       # B is grounded
+
+DIGITS = 6
+FONT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "alphanum.hex")
+
+# === Palette ===
+
+def _palette():
+    """Digital's fixed GraphicCard palette as a (128, 3) uint8 array."""
+    palette = np.zeros((128, 3), dtype=np.uint8)
+    palette[:10] = [(255, 255, 255), (0, 0, 0), (255, 0, 0), (0, 255, 0), (0, 0, 255),
+                    (255, 255, 0), (0, 255, 255), (255, 0, 255), (255, 200, 0), (255, 175, 175)]
+    palette[32:64] = (np.arange(32) * 255 // 31)[:, None]
+    index = np.arange(64)
+    palette[64:] = np.stack([index >> 4 & 3, index >> 2 & 3, index & 3], axis=1) * 85
+    return palette
+
+PALETTE = _palette()
+
+# === GraphicCard ===
+
+class GraphicCard:
+    """
+    Both banks of palette indices. memory is the bytearray that stores write into;
+    frame is a (banks, height, width) uint8 NumPy view of it.
+    dirty is [x0, y0, x1, y1) of the shown bank's changes since take_dirty(), or None.
+    """
+    __slots__ = ('memory', 'frame', 'bank', 'dirty', 'stores')
+
+    def __init__(self, bank=SHOWN_BANK):
+        self.memory = bytearray(GRAPHIC_BANKS * GRAPHIC_WIDTH * GRAPHIC_HEIGHT)
+        self.frame = np.frombuffer(self.memory, dtype=np.uint8).reshape(GRAPHIC_BANKS, GRAPHIC_HEIGHT, GRAPHIC_WIDTH)
+        self.bank = bank
+        self.dirty = None
+        self.stores = 0
+
+    def reset(self):
+        self.memory[:] = bytes(len(self.memory))
+        self.dirty = None
+        self.stores = 0
+
+    def store(self, address, value):
+        """The GraphicCard side of one sw (a Simulator store hook)."""
+        index = address & ADDRESS_MASK
+        self.memory[index] = value & COLOR_MASK
+        self.stores += 1
+        if index // (GRAPHIC_WIDTH * GRAPHIC_HEIGHT) != self.bank:
+            return
+        y, x = divmod(index % (GRAPHIC_WIDTH * GRAPHIC_HEIGHT), GRAPHIC_WIDTH)
+        dirty = self.dirty
+        if dirty is None:
+            self.dirty = [x, y, x + 1, y + 1]
+            return
+        if x < dirty[0]:
+            dirty[0] = x
+        elif x >= dirty[2]:
+            dirty[2] = x + 1
+        if y < dirty[1]:
+            dirty[1] = y
+        elif y >= dirty[3]:
+            dirty[3] = y + 1
+
+    def take_dirty(self):
+        """(x, y, width, height) changed in the shown bank since the last call, or None."""
+        dirty, self.dirty = self.dirty, None
+        if dirty is None:
+            return None
+        x0, y0, x1, y1 = dirty
+        return x0, y0, x1 - x0, y1 - y0
+
+    def pixel(self, x, y, bank=None):
+        return self.frame[self.bank if bank is None else bank, y, x]
+
+    def indices(self, bank=None):
+        """(height, width) palette indices of a bank (a view, not a copy)."""
+        return self.frame[self.bank if bank is None else bank]
+
+    def rgb(self, bank=None):
+        """(height, width, 3) uint8 image of a bank."""
+        return PALETTE[self.indices(bank)]
+
+# === SixteenSeg ===
+
+# Bit n of a pattern drives SEGMENTS[n]: a1/a2 top, b/c right, d1/d2 bottom, e/f left,
+# g1/g2 middle, h/j/k/m diagonals, i/l centre verticals.
+SEGMENTS = ('a1', 'a2', 'b', 'c', 'd1', 'd2', 'e', 'f', 'g1', 'g2', 'h', 'i', 'j', 'k', 'l', 'm')
+CELL_WIDTH, CELL_HEIGHT = 9, 13
+
+def _segment_pixels():
+    """(y, x) pixels of each segment in a CELL_HEIGHT x CELL_WIDTH cell."""
+    line = lambda y0, x0, y1, x1: [(y0 + (y1 - y0) * t // 4, x0 + (x1 - x0) * t // 4) for t in range(5)]
+    return [
+        [(0, x) for x in range(1, 4)], [(0, x) for x in range(5, 8)],            # a1 a2
+        [(y, 8) for y in range(1, 6)], [(y, 8) for y in range(7, 12)],           # b c
+        [(12, x) for x in range(1, 4)], [(12, x) for x in range(5, 8)],          # d1 d2
+        [(y, 0) for y in range(7, 12)], [(y, 0) for y in range(1, 6)],           # e f
+        [(6, x) for x in range(1, 4)], [(6, x) for x in range(5, 8)],            # g1 g2
+        line(1, 1, 5, 3), [(y, 4) for y in range(1, 6)], line(1, 7, 5, 5),      # h i j
+        line(7, 5, 11, 7), [(y, 4) for y in range(7, 12)], line(7, 3, 11, 1),    # k l m
+    ]
+
+SEGMENT_PIXELS = _segment_pixels()
+
+def load_font(path=FONT_PATH):
+    """The ASCII ROM: 128 segment patterns indexed by character code (missing entries are blank)."""
+    words = read_hex_file(path)[:128]
+    return [w & 0xFFFF for w in words] + [0] * (128 - len(words))
+
+def font_lookup(font):
+    """pattern -> character for decoding; printable characters win over the hex-digit entries below 32."""
+    lookup = {}
+    for code in list(range(32, 128)) + list(range(32)):
+        lookup.setdefault(font[code], chr(code) if code >= 32 else '?')
+    lookup[0] = ' '
+    return lookup
+
+def instruction_text(word):
+    """What the six displays spell for an instruction word: its mnemonic, upper case, left-aligned."""
+    try:
+        mnemonic = decode(word)[0]
+    except IllegalInstruction:
+        mnemonic = ''
+    return mnemonic.upper()[:DIGITS].ljust(DIGITS)
+
+class SegmentDisplays:
+    """The six SixteenSeg displays: patterns holds the 16-bit value driven into each one."""
+    __slots__ = ('font', 'lookup', 'patterns')
+
+    def __init__(self, font=None):
+        self.font = load_font() if font is None else font
+        self.lookup = font_lookup(self.font)
+        self.patterns = [0] * DIGITS
+
+    def show(self, text):
+        """Drive the displays with text through the ASCII ROM (7-bit codes, like the circuit)."""
+        self.patterns = [self.font[ord(c) & 0x7F] for c in text[:DIGITS].ljust(DIGITS)]
+
+    def text(self):
+        """Decode the driven patterns back to characters ('?' for a pattern not in the font)."""
+        return ''.join(self.lookup.get(p, '?') for p in self.patterns)
+
+    def bitmap(self, gap=2):
+        """(CELL_HEIGHT, n * (CELL_WIDTH + gap)) bool image of the lit segments."""
+        image = np.zeros((CELL_HEIGHT, DIGITS * (CELL_WIDTH + gap)), dtype=bool)
+        for digit, pattern in enumerate(self.patterns):
+            left = digit * (CELL_WIDTH + gap)
+            for bit, pixels in enumerate(SEGMENT_PIXELS):
+                if pattern >> bit & 1:
+                    for y, x in pixels:
+                        image[y, left + x] = True
+        return image
+
+    def render(self):
+        """The displays as text art, one string per row."""
+        return [''.join('#' if lit else ' ' for lit in row).rstrip() for row in self.bitmap()]
+
+# === Display ===
+
+class Display:
+    """GraphicCard plus instruction displays, attached to a Simulator's stores."""
+    __slots__ = ('graphic', 'segments', 'sim')
+
+    def __init__(self, font=None):
+        self.graphic = GraphicCard()
+        self.segments = SegmentDisplays(font)
+        self.sim = None
+
+    def attach(self, sim):
+        self.sim = sim
+        sim.set_store_hook(self.graphic.store)
+
+    def detach(self):
+        if self.sim is not None:
+            self.sim.set_store_hook(None)
+            self.sim = None
+
+    def update_segments(self):
+        """Show the instruction at the simulator's PC, as the circuit does for the current cycle."""
+        sim = self.sim
+        index = sim.pc >> 2
+        self.segments.show(instruction_text(sim.words[index]) if index < len(sim.words) else '')
+
+    def run_frames(self, max_cycles=DEFAULT_MAX_CYCLES, every=None, blocks=False):
+        """
+        Run in slices of every instructions (one slice if None), yielding
+        (cycles, reason, dirty rectangle or None) after each. Stops at halt/end/breakpoint.
+        """
+        sim = self.sim
+        runner = sim.run_blocks if blocks else sim.run
+        remaining = max_cycles
+        while True:
+            reason = runner(min(every or remaining, remaining))
+            remaining = max_cycles - sim.cycles
+            self.update_segments()
+            yield sim.cycles, reason, self.graphic.take_dirty()
+            if reason != 'max_cycles' or remaining <= 0:
+                return
+
+# === Frame files ===
+
+def write_png(path, image, scale=1):
+    """Write a (height, width, 3) uint8 image as an 8-bit RGB PNG, each pixel scale x scale."""
+    if scale > 1:
+        image = image.repeat(scale, axis=0).repeat(scale, axis=1)
+    height, width = image.shape[:2]
+    rows = np.zeros((height, 1 + width * 3), dtype=np.uint8)       # filter byte 0 per row
+    rows[:, 1:] = image.reshape(height, width * 3)
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)))
+        f.write(chunk(b'IDAT', zlib.compress(rows.tobytes(), 6)))
+        f.write(chunk(b'IEND', b''))
+
+def save_frame(path, graphic, scale=1):
+    """.npy: palette indices of the shown bank; anything else: PNG."""
+    if path.lower().endswith('.npy'):
+        np.save(path, graphic.indices())
+    else:
+        write_png(path, graphic.rgb(), scale)
+
+def compare_frame(graphic, expected_path):
+    """None if the shown bank equals the saved .npy frame, else a one-line description of the difference."""
+    expected = np.load(expected_path)
+    actual = graphic.indices()
+    if expected.shape != actual.shape:
+        return f"shape {actual.shape} != expected {expected.shape}"
+    ys, xs = np.nonzero(actual != expected)
+    if not len(xs):
+        return None
+    return (f"{len(xs)} pixels differ within x {int(xs.min())}..{int(xs.max())}, "
+            f"y {int(ys.min())}..{int(ys.max())}; first ({int(xs[0])}, {int(ys[0])}) is "
+            f"{int(actual[ys[0], xs[0]])}, expected {int(expected[ys[0], xs[0]])}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a program headless and capture the GraphicCard and instruction displays")
+    parser.add_argument("program", nargs="?", help="Program to run: .asm source or v2.0 raw .hex image")
+    parser.add_argument("--data", metavar="IMAGE", help="Data Memory image for a .hex program")
+    parser.add_argument("--max-cycles", "-n", type=int, default=DEFAULT_MAX_CYCLES, help="Instruction limit")
+    parser.add_argument("--blocks", action="store_true", help="Run with basic-block translation")
+    parser.add_argument("--output", "-o", help="Final frame: .png, or .npy for palette indices")
+    parser.add_argument("--frames", metavar="DIR", help="Write frame_<cycle>.png for every slice that changed pixels")
+    parser.add_argument("--every", type=int, default=100_000, help="Instructions per slice with --frames")
+    parser.add_argument("--scale", type=int, default=4, help="PNG pixel size")
+    parser.add_argument("--expect", metavar="FRAME.npy", help="Compare the final frame; exit 1 if it differs")
+    parser.add_argument("--font", metavar="TEXT", help="Print TEXT as the displays would show it and exit")
+    args = parser.parse_args()
+
+    if args.font is not None:
+        segments = SegmentDisplays()
+        segments.show(args.font)
+        print("  ".join(f"{p:04x}" for p in segments.patterns))
+        print("\n".join(segments.render()))
+        return
+    if args.program is None:
+        parser.error("a program is required unless --font is given")
+
+    try:
+        kwargs = {'ram_image': read_hex_file(os.path.expanduser(args.data))} if args.data else {}
+        sim = Simulator.from_file(os.path.expanduser(args.program), **kwargs)
+    except (AssemblyError, SimulationError, ValueError, OSError) as e:
+        print(f"Cannot load '{args.program}': {e}", file=sys.stderr)
+        sys.exit(1)
+
+    display = Display()
+    display.attach(sim)
+    if args.frames:
+        os.makedirs(args.frames, exist_ok=True)
+    start = time.perf_counter()
+    written = 0
+    for cycles, reason, dirty in display.run_frames(args.max_cycles, args.every if args.frames else None, args.blocks):
+        if args.frames and dirty is not None:
+            write_png(os.path.join(args.frames, f"frame_{cycles:010d}.png"), display.graphic.rgb(), args.scale)
+            written += 1
+    elapsed = time.perf_counter() - start
+
+    print(f"Stopped ({reason}) at pc={sim.pc:#x} after {sim.cycles} instructions, {elapsed:.3f} s "
+          f"({sim.cycles / elapsed / 1e6 if elapsed else 0:.2f} M instr/s); "
+          f"{display.graphic.stores} stores{f', {written} frames' if args.frames else ''}")
+    print(f"Instruction display: '{display.segments.text()}'")
+    print("\n".join(display.segments.render()))
+    if args.output:
+        save_frame(args.output, display.graphic, args.scale)
+    if args.expect:
+        difference = compare_frame(display.graphic, args.expect)
+        if difference is not None:
+            print(f"Frame differs from '{args.expect}': {difference}")
+            sys.exit(1)
+        print(f"Frame matches '{args.expect}'")
+
+if __name__ == "__main__":
+    main()
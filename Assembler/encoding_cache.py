@@ -0,0 +1,133 @@
+# Incremental assembly cache: per-line encodings keyed by instruction text.
+# Used by Assembler.encode_instructions(..., cache=...) so that re-assembling an
+# edited file only re-encodes lines whose text changed, or whose branch/jal target
+# moved relative to them.
+#
+# Each entry is  text -> (word, target_label, offset)
+#   target_label is None for position-independent lines (the word is reused as is);
+#   otherwise the word was encoded with pc-relative `offset` and is reused only
+#   while labels[target_label] - pc is still equal to that offset.
+# Entries live in an OrderedDict in LRU order; the least recently used are dropped
+# once max_entries is exceeded. save()/load() persist the cache with pickle.
+# The cache also keeps the last build in memory; Assembler.assemble() patches it when only a
+# few lines changed, so the rest of the file is not scanned again either (see "Incremental
+# reassembly" in Assembler.py).
+# Usage:
+#     python encoding_cache.py        # self-check against uncached assembly
+
+import os
+import pickle
+from collections import OrderedDict
+
+CACHE_VERSION = 1
+DEFAULT_MAX_ENTRIES = 1 << 20
+
+def _valid_entry(item):
+    """True for a saved (text, (word, target_label, offset)) pair."""
+    if not (isinstance(item, tuple) and len(item) == 2 and isinstance(item[0], str)):
+        return False
+    value = item[1]
+    return (isinstance(value, tuple) and len(value) == 3 and isinstance(value[0], int)
+            and (value[1] is None or isinstance(value[1], str)) and isinstance(value[2], int))
+
+class EncodingCache:
+    """
+    Bounded LRU cache of line encodings, optionally backed by a file.
+    Assembler.encode_instructions() looks entries up in self.entries directly and keeps
+    the counts: hits are reused words, misses are lines with no entry, relinks are
+    entries that had to be re-encoded because a referenced label moved.
+    build is the last assembly made with this cache, which assemble() patches when the
+    source changes only in a few lines (kept in memory; save() does not write it).
+    """
+    def __init__(self, path=None, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.relinks = 0
+        self.build = None
+        if path and os.path.isfile(path):
+            self.load()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def put(self, text, word, target=None, offset=0):
+        """Store an encoding, evicting least recently used entries beyond max_entries."""
+        entries = self.entries
+        entries[text] = (word, target, offset)
+        entries.move_to_end(text)
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+        self.build = None
+        self.hits = self.misses = self.relinks = 0
+
+    def load(self, path=None):
+        """
+        Load entries from path (default: self.path). A missing, unreadable or
+        version-mismatched file just leaves the cache empty.
+        """
+        path = path or self.path
+        try:
+            with open(path, 'rb') as f:
+                data = pickle.load(f)
+        except Exception:
+            # A damaged pickle can raise almost anything (ValueError, AttributeError,
+            # ImportError, ...); the cache is only an optimization.
+            return
+        if not isinstance(data, dict) or data.get('version') != CACHE_VERSION:
+            return
+        entries = data.get('entries')
+        if not isinstance(entries, list) or not all(_valid_entry(item) for item in entries):
+            return
+        self.entries = OrderedDict(entries)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def save(self, path=None):
+        """Write the cache atomically (temp file + rename). Raises OSError on failure."""
+        path = path or self.path
+        tmp_path = f"{path}.tmp{os.getpid()}"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'version': CACHE_VERSION, 'entries': list(self.entries.items())},
+                        f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+def self_check():
+    """Cached assembly must match uncached assembly, including its errors; returns failures."""
+    from Assembler import AssemblyError, assemble
+
+    def words_or_error(source, cache):
+        try:
+            return assemble(source, cache).words
+        except AssemblyError as e:
+            return str(e)
+
+    cases = [
+        # A label removed after its jal was cached with offset 0 must still be undefined.
+        ("addi x1,x0,1\ndone: jal x0, done\n", "addi x1,x0,1\njal x0, done\n"),
+        ("beq x1, x2, end\nend: add x3, x1, x2\n", "beq x1, x2, end\nnop\nend: add x3, x1, x2\n"),
+        ("loop: bne x1, x0, loop\n", "bne x1, x0, loop\n"),
+        # Patched builds: words on both sides of an inserted line and .data pointers move.
+        ("top: nop\nbeq x1, x2, end\nend: jal x0, top\n.data\np: .word end\n",
+         "top: nop\nbeq x1, x2, end\nadd x3, x1, x2\nend: jal x0, top\n.data\np: .word end\n"),
+        ("a: nop\nb: nop\nj a\n", "a: nop\nb: nop\nj b\nj c\n"),
+    ]
+    failures = []
+    for first, second in cases:
+        cache = EncodingCache()
+        words_or_error(first, cache)
+        cached, expected = words_or_error(second, cache), words_or_error(second, None)
+        if cached != expected:
+            failures.append(f"{second!r}: cached {cached!r}, uncached {expected!r}")
+    return failures
+
+if __name__ == "__main__":
+    import sys
+    problems = self_check()
+    print("\n".join(problems) if problems else "encoding cache matches uncached assembly")
+    sys.exit(1 if problems else 0)
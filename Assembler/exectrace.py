@@ -0,0 +1,374 @@
+# Binary execution traces for debugging the circuit (RISCV_Top.dig) against the simulator.
+# Every retired instruction (one per cycle on the single-cycle core) becomes one fixed-width
+# little-endian record, so record n is at HEADER_SIZE + n * RECORD_SIZE and any cycle is a
+# single seek away:
+#
+#   pc u32 | word u32 | value u32 | address u32 | rd u8 | flags u8 | reserved u16     (20 bytes)
+#
+#   flags    WROTE_RD (rd written), LOAD (lw), STORE (sw)
+#   value    rd's new value when WROTE_RD, else the word stored by sw, else 0
+#   address  byte address of the lw/sw, else 0
+#
+# With --delta, pc holds pc - previous pc and, for rd writes, value holds the new value minus
+# rd's previous value (both mod 2**32). The file is the same size but mostly small numbers,
+# so it compresses several times better. A keyframe (pc + all 32 registers) is kept every
+# --keyframe records, so random access only replays from the nearest keyframe.
+#
+# Records are buffered in an array('I') and written in chunks, then read back through mmap: TraceReader
+# gives records by cycle number, and with NumPy installed, zero-copy structured-array views
+# and fully decoded columns for bulk analysis.
+# Usage:
+#     python exectrace.py prog.asm -o prog.trace [--delta] [--max-cycles N]    # record
+#     python exectrace.py prog.trace [--cycle 1000] [--count 20]                # list records
+#     python exectrace.py prog.trace --stats                                    # summary
+
+import argparse
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections import namedtuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from Assembler import AssemblyError, read_hex_file
+from disassembler import decode_rows, format_row
+from simulator import (DEFAULT_MAX_CYCLES, MASK, TRACE_LOAD, TRACE_STORE, TRACE_WROTE_RD,
+                       SimulationError, Simulator)
+
+# === File format ===
+
+TRACE_MAGIC = b'RVTRACE\0'
+TRACE_VERSION = 1
+FLAG_DELTA = 1
+WROTE_RD, LOAD, STORE = TRACE_WROTE_RD, TRACE_LOAD, TRACE_STORE
+
+# magic, version, file flags, record size, keyframe interval, record count,
+# keyframe table offset, keyframe count; padded to HEADER_SIZE.
+HEADER = struct.Struct('<8sHHIIQQQ')
+HEADER_SIZE = 64
+RECORD = struct.Struct('<IIIIBBH')
+RECORD_SIZE = RECORD.size
+KEYFRAME = struct.Struct('<I32I')            # pc, then x0..x31, before the keyframe's record
+DEFAULT_KEYFRAME_INTERVAL = 4096
+CHUNK_RECORDS = 1 << 16
+
+TraceRecord = namedtuple('TraceRecord', 'cycle pc word rd flags value address')
+
+if np is not None:
+    RECORD_DTYPE = np.dtype([('pc', '<u4'), ('word', '<u4'), ('value', '<u4'), ('address', '<u4'),
+                             ('rd', 'u1'), ('flags', 'u1'), ('reserved', '<u2')])
+    assert RECORD_DTYPE.itemsize == RECORD_SIZE
+
+class TraceError(ValueError):
+    """A trace file is missing, truncated or not in this format."""
+
+# === Writing ===
+
+class TraceWriter:
+    """
+    Appends records to a trace file; pass it to Simulator.run_traced() and close() it
+    (or use it as a context manager) to write the keyframe table and final header.
+    pc and regs are the state before the first record (pc 0, all zero after reset).
+    """
+    __slots__ = ('file', 'delta', 'interval', 'count', 'keyframes', 'chunk', 'prev_pc', 'shadow')
+
+    def __init__(self, path, delta=False, keyframe_interval=DEFAULT_KEYFRAME_INTERVAL, pc=0, regs=None):
+        if keyframe_interval < 1:
+            raise ValueError("keyframe interval must be at least 1")
+        self.file = open(path, 'wb')
+        self.delta = delta
+        self.interval = keyframe_interval
+        self.count = 0
+        self.keyframes = array('I')
+        # A record is five little-endian u32 words (rd | flags << 8 is the last), so records
+        # are buffered as a flat list of ints and written as one array('I') per chunk.
+        self.chunk = []
+        self.prev_pc = pc
+        self.shadow = list(regs) if regs is not None else [0] * 32    # registers before the next record
+        self.file.write(bytes(HEADER_SIZE))
+
+    def append(self, pc, word, rd, flags, value, address):
+        """Add the record for one retired instruction."""
+        count = self.count
+        if not count % self.interval:
+            self.keyframes.append(pc)
+            self.keyframes.extend(self.shadow)
+        if not count % CHUNK_RECORDS and count:
+            # Every CHUNK_RECORDS records, whatever the keyframe interval.
+            self.flush()
+        self.count = count + 1
+        if self.delta:
+            if flags & WROTE_RD:
+                shadow = self.shadow
+                shadow[rd], value = value, (value - shadow[rd]) & MASK
+            self.chunk.extend(((pc - self.prev_pc) & MASK, word, value, address, rd | flags << 8))
+            self.prev_pc = pc
+        else:
+            if flags & WROTE_RD:
+                self.shadow[rd] = value
+            self.chunk.extend((pc, word, value, address, rd | flags << 8))
+
+    def flush(self):
+        words = array('I', self.chunk)
+        if sys.byteorder != 'little':
+            words.byteswap()
+        words.tofile(self.file)
+        self.chunk.clear()
+
+    def close(self):
+        """Write outstanding records, the keyframe table and the header, then close the file."""
+        if self.file.closed:
+            return
+        self.flush()
+        if not self.keyframes:
+            self.keyframes.append(self.prev_pc)
+            self.keyframes.extend(self.shadow)
+        keyframes = self.keyframes
+        offset = HEADER_SIZE + self.count * RECORD_SIZE
+        self.file.write(b''.join(KEYFRAME.pack(*keyframes[i:i + 33]) for i in range(0, len(keyframes), 33)))
+        self.file.seek(0)
+        self.file.write(HEADER.pack(TRACE_MAGIC, TRACE_VERSION, FLAG_DELTA if self.delta else 0,
+                                    RECORD_SIZE, self.interval, self.count, offset, len(keyframes) // 33))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def record_trace(sim, path, delta=False, max_cycles=DEFAULT_MAX_CYCLES,
+                 keyframe_interval=DEFAULT_KEYFRAME_INTERVAL):
+    """Run sim from its current state, tracing every instruction into path; returns run()'s reason."""
+    with TraceWriter(path, delta, keyframe_interval, sim.pc, sim.regs) as writer:
+        return sim.run_traced(writer, max_cycles)
+
+# === Reading ===
+
+class TraceReader:
+    """
+    Memory-mapped view of a trace file. reader[cycle] and records() return TraceRecords with
+    absolute pc/value in either encoding; regs_at(cycle) gives the register file before a
+    cycle. array() and columns() need NumPy.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < HEADER_SIZE:
+                raise TraceError(f"'{path}' is too short to be a trace")
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, flags, record_size, self.interval, self.count,
+         keyframe_offset, keyframe_count) = HEADER.unpack_from(self.map)
+        if magic != TRACE_MAGIC:
+            raise TraceError(f"'{path}' is not a trace file")
+        if version != TRACE_VERSION or record_size != RECORD_SIZE:
+            raise TraceError(f"'{path}' has trace version {version}, record size {record_size}; "
+                             f"expected {TRACE_VERSION}, {RECORD_SIZE}")
+        if keyframe_offset == 0:
+            raise TraceError(f"'{path}' was not closed properly (no keyframe table)")
+        if keyframe_offset + keyframe_count * KEYFRAME.size > size:
+            raise TraceError(f"'{path}' is truncated")
+        self.delta = bool(flags & FLAG_DELTA)
+        self.keyframe_offset = keyframe_offset
+        self.keyframe_count = keyframe_count
+
+    def close(self):
+        try:
+            self.map.close()
+        except BufferError:
+            pass            # array()/columns() views still use the mapping; it goes away with them
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def raw(self, cycle):
+        """The stored fields (pc, word, value, address, rd, flags, reserved) of one record, undecoded."""
+        return RECORD.unpack_from(self.map, HEADER_SIZE + cycle * RECORD_SIZE)
+
+    def keyframe(self, index):
+        """(pc, regs) before record index * interval."""
+        values = KEYFRAME.unpack_from(self.map, self.keyframe_offset + index * KEYFRAME.size)
+        return values[0], list(values[1:])
+
+    def _check(self, cycle):
+        if cycle < 0:
+            cycle += self.count
+        if not 0 <= cycle < self.count:
+            raise IndexError(f"cycle {cycle} is outside the trace (0..{self.count - 1})")
+        return cycle
+
+    def _regs_before(self, cycle):
+        """Register file before record cycle, replayed from the nearest keyframe."""
+        k = min(cycle // self.interval, self.keyframe_count - 1)
+        regs = self.keyframe(k)[1]
+        unpack, raw_map, delta = RECORD.unpack_from, self.map, self.delta
+        for n in range(k * self.interval, cycle):
+            _, _, value, _, rd, flags, _ = unpack(raw_map, HEADER_SIZE + n * RECORD_SIZE)
+            if flags & WROTE_RD:
+                regs[rd] = (regs[rd] + value) & MASK if delta else value
+        return regs
+
+    def _pc(self, cycle):
+        if not self.delta:
+            return self.raw(cycle)[0]
+        k = cycle // self.interval
+        pc = self.keyframe(k)[0]
+        unpack, raw_map = RECORD.unpack_from, self.map
+        for n in range(k * self.interval + 1, cycle + 1):
+            pc += unpack(raw_map, HEADER_SIZE + n * RECORD_SIZE)[0]
+        return pc & MASK
+
+    def regs_at(self, cycle):
+        """Register file before record cycle executes (cycle == len(self) gives the final state)."""
+        if cycle != self.count:
+            cycle = self._check(cycle)
+        return self._regs_before(cycle)
+
+    def __getitem__(self, cycle):
+        cycle = self._check(cycle)
+        _, word, value, address, rd, flags, _ = self.raw(cycle)
+        if self.delta and flags & WROTE_RD:
+            value = (self._regs_before(cycle)[rd] + value) & MASK
+        return TraceRecord(cycle, self._pc(cycle), word, rd, flags, value, address)
+
+    def records(self, start=0, stop=None):
+        """Iterate TraceRecords for cycles [start, stop), decoding deltas sequentially."""
+        stop = self.count if stop is None else min(stop, self.count)
+        if start >= stop:
+            return
+        if self.delta:
+            pc, regs = self._pc(start), self._regs_before(start)
+        unpack, raw_map, delta = RECORD.unpack_from, self.map, self.delta
+        for n in range(start, stop):
+            record_pc, word, value, address, rd, flags, _ = unpack(raw_map, HEADER_SIZE + n * RECORD_SIZE)
+            if delta:
+                if n > start:
+                    pc = (pc + record_pc) & MASK
+                record_pc = pc
+                if flags & WROTE_RD:
+                    value = regs[rd] = (regs[rd] + value) & MASK
+            yield TraceRecord(n, record_pc, word, rd, flags, value, address)
+
+    def array(self):
+        """Zero-copy structured NumPy view (RECORD_DTYPE) of the stored records."""
+        if np is None:
+            raise RuntimeError("NumPy is required for array views")
+        return np.frombuffer(self.map, dtype=RECORD_DTYPE, count=self.count, offset=HEADER_SIZE)
+
+    def columns(self):
+        """
+        Dict of decoded uint32/uint8 columns: pc, word, value, address, rd, flags.
+        For full traces these are views into the file; delta traces are decoded with cumulative
+        sums (pc over the whole trace, value per destination register).
+        """
+        records = self.array()
+        cols = {name: records[name] for name in ('pc', 'word', 'value', 'address', 'rd', 'flags')}
+        if not self.delta or not self.count:
+            return cols
+        start_pc, start_regs = self.keyframe(0)
+        pc_deltas = records['pc'].astype(np.int64)
+        pc_deltas[0] = start_pc
+        cols['pc'] = (np.cumsum(pc_deltas) & MASK).astype(np.uint32)
+        value = records['value'].copy()
+        writes = (records['flags'] & WROTE_RD) != 0
+        rd = records['rd']
+        for reg in np.unique(rd[writes]):
+            where = np.flatnonzero(writes & (rd == reg))
+            sums = np.cumsum(records['value'][where].astype(np.int64)) + start_regs[int(reg)]
+            value[where] = (sums & MASK).astype(np.uint32)
+        cols['value'] = value
+        return cols
+
+# === Listing ===
+
+def format_record(record):
+    """One line: cycle, pc, word, disassembly, then the register write and memory access."""
+    row = decode_rows([record.word])[0]
+    text = format_row(row, record.pc, record.word, ()) if row[0] is not None else f".word {record.word:#010x}"
+    effects = []
+    if record.flags & WROTE_RD:
+        effects.append(f"x{record.rd} <- {record.value:08x}")
+    if record.flags & LOAD:
+        effects.append(f"load [{record.address:#x}]")
+    if record.flags & STORE:
+        effects.append(f"[{record.address:#x}] <- {record.value:08x}")
+    return f"{record.cycle:>10}  {record.pc:08x}  {record.word:08x}  {text:<28}{'  '.join(effects)}"
+
+def print_stats(reader, top=10):
+    """Instruction mix and hottest PCs, computed over the mapped columns."""
+    print(f"{reader.path}: {len(reader)} records, {'delta' if reader.delta else 'full'} encoding, "
+          f"keyframe every {reader.interval}")
+    if np is None:
+        print("  (install NumPy for the detailed summary)")
+        return
+    if not len(reader):
+        return
+    cols = reader.columns()
+    flags = cols['flags']
+    print(f"  register writes {int(np.count_nonzero(flags & WROTE_RD))}, "
+          f"loads {int(np.count_nonzero(flags & LOAD))}, stores {int(np.count_nonzero(flags & STORE))}")
+    pcs, first, counts = np.unique(cols['pc'], return_index=True, return_counts=True)
+    print(f"  {len(pcs)} distinct PCs; hottest:")
+    for i in np.argsort(counts)[::-1][:top]:
+        pc, word = int(pcs[i]), int(cols['word'][first[i]])
+        row = decode_rows([word])[0]
+        text = format_row(row, pc, word, ()) if row[0] is not None else f".word {word:#010x}"
+        print(f"    {pc:08x}  {int(counts[i]):>10}  {text}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Record or inspect a binary execution trace")
+    parser.add_argument("path", help="Program to trace (.asm or v2.0 raw .hex), or a .trace file to read")
+    parser.add_argument("--output", "-o", help="Trace file to write (recording)")
+    parser.add_argument("--data", metavar="IMAGE", help="Data Memory image for a .hex program")
+    parser.add_argument("--delta", action="store_true", help="Delta-encode pc and register values")
+    parser.add_argument("--max-cycles", "-n", type=int, default=DEFAULT_MAX_CYCLES, help="Instruction limit")
+    parser.add_argument("--keyframe", type=int, default=DEFAULT_KEYFRAME_INTERVAL, metavar="N",
+                        help=f"Records between register keyframes (default {DEFAULT_KEYFRAME_INTERVAL})")
+    parser.add_argument("--cycle", "-c", type=int, default=0, help="First record to list (negative counts from the end)")
+    parser.add_argument("--count", type=int, default=20, help="Records to list")
+    parser.add_argument("--stats", action="store_true", help="Print a summary instead of records")
+    args = parser.parse_args()
+    path = os.path.expanduser(args.path)
+
+    if path.lower().endswith(('.asm', '.hex')):
+        if not args.output:
+            parser.error("recording needs --output")
+        try:
+            kwargs = {'ram_image': read_hex_file(os.path.expanduser(args.data))} if args.data else {}
+            sim = Simulator.from_file(path, **kwargs)
+            reason = record_trace(sim, args.output, args.delta, args.max_cycles, args.keyframe)
+        except (AssemblyError, SimulationError, ValueError, OSError) as e:
+            print(f"Error: cannot trace '{args.path}': {e}", file=sys.stderr)
+            sys.exit(1)
+        size = os.path.getsize(args.output)
+        print(f"Stopped ({reason}) at pc={sim.pc:#x}; wrote {sim.cycles} records to "
+              f"'{args.output}' ({size} bytes)")
+        return
+
+    try:
+        reader = TraceReader(path)
+    except (TraceError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    with reader:
+        if args.stats:
+            print_stats(reader)
+            return
+        start = args.cycle + len(reader) if args.cycle < 0 else args.cycle
+        for record in reader.records(max(start, 0), start + args.count):
+            print(format_record(record))
+
+if __name__ == "__main__":
+    main()
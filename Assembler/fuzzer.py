@@ -0,0 +1,300 @@
+# Encoder/decoder round-trip fuzzer.
+# Generates random valid instructions for every mnemonic in the assembler's format tables,
+# with a quarter of the immediates taken from each format's boundary values (range ends,
+# -1, 0, sign flips), and checks each one field by field:
+#   text     the source line assembled through encode_instructions() (the real pipeline,
+#            with random hex/decimal, mnemonic case and spacing) must give the same word
+#            as the per-format encode_*_type() functions
+#   decode   disassembler.decode() of that word must give back every field
+#   disasm   the disassembled line must re-assemble to the same word
+#   batch    with NumPy, batch_encoder.encode_batch() and decode_image() must agree too
+# Every case comes from a 64-bit case seed (splitmix64 of the run seed and case number), so
+# a failure is reproducible on its own with --replay. Failures are shrunk (registers and
+# immediates toward 0, plain formatting) while they keep failing the same check.
+# Chunks of cases run on a process pool.
+# Usage:
+#     python fuzzer.py [--cases 5000000] [--seed 1] [--jobs 4]
+#     python fuzzer.py --replay 0x9e3779b97f4a7c15
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from Assembler import B_RANGE, J_RANGE, AssemblyError, encode_instructions
+from batch_encoder import encode_scalar
+from disassembler import (FMT_B, FMT_I, FMT_J, FMT_R, FMT_S, FMT_SHIFT, FMT_U, FORMAT_OF, MNEMONICS,
+                          IllegalInstruction, decode, format_row)
+
+try:
+    import numpy as np
+    from batch_encoder import encode_batch
+    from disassembler import DECODED_DTYPE, MNEMONIC_IDS, decode_image
+except ImportError:
+    np = None
+
+MASK64 = (1 << 64) - 1
+FIELDS = ('mnemonic', 'rd', 'rs1', 'rs2', 'imm')
+
+# === Case generation ===
+
+# Immediate (low, high, step) per format: shamt for shifts, upper-20 value for U-type,
+# even byte offsets for branches and jal.
+IMM_RANGES = {
+    FMT_R: (0, 0, 1),
+    FMT_I: (-2048, 2047, 1),
+    FMT_SHIFT: (0, 31, 1),
+    FMT_S: (-2048, 2047, 1),
+    FMT_B: (B_RANGE[0], B_RANGE[1], 2),
+    FMT_U: (0, 0xFFFFF, 1),
+    FMT_J: (J_RANGE[0], J_RANGE[1], 2),
+}
+
+def _boundaries(low, high, step):
+    values = {low, low + step, -step, 0, step, high - step, high}
+    if low < 0:
+        values |= {-(1 << (high.bit_length() - 1)), (1 << (high.bit_length() - 1)) - step}
+    else:
+        values |= {(high + 1) // 2 - step, (high + 1) // 2}
+    return sorted(v for v in values if low <= v <= high and v % step == 0)
+
+BOUNDARY_IMMEDIATES = {fmt: _boundaries(*r) for fmt, r in IMM_RANGES.items()}
+
+# Style bits: immediate in hex, upper-case mnemonic, no spaces after commas,
+# 'jalr rd, rs1, imm' instead of 'jalr rd, imm(rs1)'.
+STYLE_HEX, STYLE_UPPER, STYLE_TIGHT, STYLE_JALR_REG = 1, 2, 4, 8
+
+def _mix(x):
+    """splitmix64 finalizer."""
+    x = (x + 0x9E3779B97F4A7C15) & MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK64
+    return x ^ (x >> 31)
+
+def case_seed(run_seed, index):
+    return _mix((run_seed << 40) ^ index)
+
+def normalize(mnemonic, rd, rs1, rs2, imm):
+    """The record decode() should give back: fields the format does not use are 0."""
+    fmt = FORMAT_OF[mnemonic]
+    if fmt == FMT_R:
+        return mnemonic, rd, rs1, rs2, 0
+    if fmt in (FMT_I, FMT_SHIFT):
+        return mnemonic, rd, rs1, 0, imm
+    if fmt in (FMT_S, FMT_B):
+        return mnemonic, 0, rs1, rs2, imm
+    return mnemonic, rd, 0, 0, imm
+
+def case_from_seed(seed):
+    """(record, style) for a 64-bit case seed; record uses batch_encoder's field conventions."""
+    mnemonic = MNEMONICS[seed % len(MNEMONICS)]
+    bits = seed // len(MNEMONICS)
+    rd, rs1, rs2 = bits & 31, (bits >> 5) & 31, (bits >> 10) & 31
+    style = (bits >> 15) & 15
+    bits >>= 19
+    fmt = FORMAT_OF[mnemonic]
+    if bits & 3 == 0:
+        edges = BOUNDARY_IMMEDIATES[fmt]
+        imm = edges[(bits >> 2) % len(edges)]
+    else:
+        low, high, step = IMM_RANGES[fmt]
+        imm = low + ((bits >> 2) % ((high - low) // step + 1)) * step
+    return normalize(mnemonic, rd, rs1, rs2, imm), style
+
+def _imm_text(value, style):
+    if style & STYLE_HEX:
+        return f"-{-value:#x}" if value < 0 else f"{value:#x}"
+    return str(value)
+
+def case_text(record, style):
+    """Source line for a record in the given style."""
+    mnemonic, rd, rs1, rs2, imm = record
+    fmt = FORMAT_OF[mnemonic]
+    imm_text = _imm_text(imm, style)
+    if fmt == FMT_R:
+        ops = (f"x{rd}", f"x{rs1}", f"x{rs2}")
+    elif fmt == FMT_I and (mnemonic == 'lw' or mnemonic == 'jalr' and not style & STYLE_JALR_REG):
+        ops = (f"x{rd}", f"{imm_text}(x{rs1})")
+    elif fmt in (FMT_I, FMT_SHIFT):
+        ops = (f"x{rd}", f"x{rs1}", imm_text)
+    elif fmt == FMT_S:
+        ops = (f"x{rs2}", f"{imm_text}(x{rs1})")
+    elif fmt == FMT_B:
+        ops = (f"x{rs1}", f"x{rs2}", imm_text)
+    else:
+        ops = (f"x{rd}", imm_text)
+    name = mnemonic.upper() if style & STYLE_UPPER else mnemonic
+    return f"{name} {(',' if style & STYLE_TIGHT else ', ').join(ops)}"
+
+# === Checking ===
+
+def assemble_lines(lines):
+    """Words for source lines through encode_instructions(); an AssemblyError in place of a rejected line."""
+    results = []
+    start = 0
+    while start < len(lines):
+        batch = [(n + 1, line, line) for n, line in enumerate(lines[start:], start)]
+        try:
+            results.extend(encode_instructions(batch, {}))
+            break
+        except AssemblyError as e:
+            # Everything before the rejected line was encoded; resume after it.
+            results.extend(encode_instructions(batch[:e.line - 1 - start], {}))
+            results.append(e)
+            start = e.line
+    return results
+
+def _compare(record, word, text_word, disasm_word):
+    """(check, detail) for the first disagreement, or None."""
+    if isinstance(text_word, AssemblyError):
+        return 'text', f"rejected: {text_word}"
+    if text_word != word:
+        return 'text', f"assembled {text_word:08x}, encode_*_type gives {word:08x}"
+    try:
+        decoded = decode(word)
+    except IllegalInstruction as e:
+        return 'decode', str(e)
+    if FORMAT_OF[decoded[0]] == FMT_U:
+        decoded = decoded[:4] + (decoded[4] >> 12,)
+    for name, expected, actual in zip(FIELDS, record, decoded):
+        if expected != actual:
+            return 'decode', f"{name}: expected {expected}, decoded {actual} from {word:08x}"
+    if isinstance(disasm_word, AssemblyError):
+        return 'disasm', f"'{format_row(record, 0, word, ())}' rejected: {disasm_word}"
+    if disasm_word != word:
+        return 'disasm', f"'{format_row(record, 0, word, ())}' assembles to {disasm_word:08x}, not {word:08x}"
+    return None
+
+def check_cases(cases):
+    """[(check, detail) or None] for a list of (record, style) cases, sharing two assembler passes."""
+    words = [encode_scalar(*record) for record, _ in cases]
+    text_words = assemble_lines([case_text(record, style) for record, style in cases])
+    disasm_words = assemble_lines([format_row(record, 0, word, ()) for (record, _), word in zip(cases, words)])
+    return [_compare(record, word, t, d)
+            for (record, _), word, t, d in zip(cases, words, text_words, disasm_words)]
+
+def check_batch(cases):
+    """Indices and details where encode_batch/decode_image disagree with the scalar path (NumPy)."""
+    records = np.array([(MNEMONIC_IDS[m], rd, rs1, rs2, imm) for (m, rd, rs1, rs2, imm), _ in cases],
+                       dtype=DECODED_DTYPE)
+    words = encode_batch(records)
+    expected = np.array([encode_scalar(*record) for record, _ in cases], dtype=np.uint32)
+    bad_words = np.flatnonzero(words != expected)
+    decoded = decode_image(words)
+    bad_fields = np.flatnonzero(decoded != records)
+    problems = {}
+    for i in bad_fields.tolist():
+        problems[i] = f"decode_image gives {tuple(decoded[i].tolist())}"
+    for i in bad_words.tolist():
+        problems[i] = f"encode_batch gives {int(words[i]):08x}, encode_*_type {int(expected[i]):08x}"
+    return problems
+
+def failure(record, style, use_batch=False):
+    """(check, detail) for a single case, or None."""
+    result = check_cases([(record, style)])[0]
+    if result is None and use_batch:
+        problem = check_batch([(record, style)]).get(0)
+        if problem is not None:
+            return 'batch', problem
+    return result
+
+def run_chunk(run_seed, start, count, use_batch=True, max_failures=20):
+    """Worker: check cases [start, start + count); returns (count, [(seed, record, style, check, detail)])."""
+    seeds = [case_seed(run_seed, i) for i in range(start, start + count)]
+    cases = [case_from_seed(s) for s in seeds]
+    failures = []
+    for seed, case, result in zip(seeds, cases, check_cases(cases)):
+        if result is not None and len(failures) < max_failures:
+            failures.append((seed,) + case + result)
+    if use_batch and np is not None:
+        for i, detail in sorted(check_batch(cases).items())[:max_failures - len(failures)]:
+            failures.append((seeds[i],) + cases[i] + ('batch', detail))
+    return count, failures
+
+# === Minimizing ===
+
+def _smaller(record, style):
+    """Candidate simplifications of a case, simplest first."""
+    mnemonic, rd, rs1, rs2, imm = record
+    step = IMM_RANGES[FORMAT_OF[mnemonic]][2]
+    if style:
+        yield record, 0
+    for index, value in ((1, rd), (2, rs1), (3, rs2)):
+        for smaller in (0, 1, value // 2):
+            if smaller < value:
+                yield normalize(*(record[:index] + (smaller,) + record[index + 1:])), style
+    for smaller in (0, step if imm > 0 else -step, int(imm / 2) // step * step):
+        if abs(smaller) < abs(imm):
+            yield normalize(mnemonic, rd, rs1, rs2, smaller), style
+
+def minimize(record, style, check, use_batch=False):
+    """Shrink a failing case while it keeps failing the same check; returns (record, style, detail)."""
+    detail = None
+    improved = True
+    while improved:
+        improved = False
+        for candidate, candidate_style in _smaller(record, style):
+            result = failure(candidate, candidate_style, use_batch)
+            if result is not None and result[0] == check:
+                record, style, detail = candidate, candidate_style, result[1]
+                improved = True
+                break
+    return record, style, detail
+
+def replay(seed, use_batch):
+    record, style = case_from_seed(seed)
+    text = case_text(record, style)
+    word = encode_scalar(*record)
+    print(f"case {seed:#018x}: {text}")
+    print(f"  fields  {dict(zip(FIELDS, record))}")
+    print(f"  encoded {word:08x}   disassembly '{format_row(record, 0, word, ())}'")
+    result = failure(record, style, use_batch)
+    if result is None:
+        print("  passes")
+        return True
+    print(f"  FAILS {result[0]}: {result[1]}")
+    small, small_style, detail = minimize(record, style, result[0], use_batch)
+    print(f"  minimized: {case_text(small, small_style)}  ({detail or result[1]})")
+    return False
+
+def main():
+    parser = argparse.ArgumentParser(description="Fuzz the instruction encoders and decoders with round trips")
+    parser.add_argument("--cases", "-n", type=int, default=1_000_000, help="Cases to generate")
+    parser.add_argument("--seed", type=int, default=1, help="Run seed")
+    parser.add_argument("--jobs", "-j", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--chunk", type=int, default=50_000, help="Cases per worker task")
+    parser.add_argument("--no-batch", action="store_true", help="Skip the NumPy batch encoder/decoder check")
+    parser.add_argument("--max-failures", type=int, default=10, help="Failures to minimize and report")
+    parser.add_argument("--replay", type=lambda s: int(s, 0), metavar="CASE_SEED",
+                        help="Re-run (and minimize) one case from its seed")
+    args = parser.parse_args()
+    use_batch = not args.no_batch and np is not None
+
+    if args.replay is not None:
+        sys.exit(0 if replay(args.replay, use_batch) else 1)
+
+    chunks = [(args.seed, start, min(args.chunk, args.cases - start), use_batch, args.max_failures)
+              for start in range(0, args.cases, args.chunk)]
+    start_time = time.perf_counter()
+    if args.jobs == 1 or len(chunks) == 1:
+        results = [run_chunk(*chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            results = list(pool.map(run_chunk, *zip(*chunks)))
+    elapsed = time.perf_counter() - start_time
+
+    total = sum(count for count, _ in results)
+    failures = [f for _, found in results for f in found]
+    print(f"{total} cases over {len(MNEMONICS)} mnemonics in {elapsed:.2f} s "
+          f"({total / elapsed * 60 / 1e6:.2f} M cases/min, {os.cpu_count()} CPUs"
+          f"{', batch encoder checked' if use_batch else ''}), {len(failures)} failures")
+    for seed, record, style, check, detail in failures[:args.max_failures]:
+        small, small_style, small_detail = minimize(record, style, check, use_batch)
+        print(f"  {check:<6} {case_text(record, style):<32} {detail}")
+        print(f"         minimized: {case_text(small, small_style):<21} {small_detail or detail}")
+        print(f"         replay:    python fuzzer.py --replay {seed:#x}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
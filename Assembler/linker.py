@@ -0,0 +1,348 @@
+# Separate assembly and linking for programs split over several .asm files.
+# Each module is assembled on its own into a relocatable object:
+#     text        - encoded words, with 0 in every field that refers to another module's
+#                   symbol or to an absolute address
+#     lines       - source line of each text word
+#     data        - bytes from the module's .data directives
+#     symbols     - {label: (section, offset)} for every label in the module
+#     globals     - labels listed in .globl/.global; only these are visible to other modules
+#     relocations - [(section, offset, kind, symbol, line)] fields to patch at link time
+# Branches and jal to a label in the same module are pc-relative and fully encoded. Everything
+# else (calls into other modules, %hi/%lo and la addresses, .word label) becomes a relocation:
+#     R_BRANCH (B-type offset), R_JAL (J-type offset), R_HI20 (lui/auipc upper 20 bits),
+#     R_LO12_I / R_LO12_S (%lo in an I-type / S-type immediate), R_ABS32 (whole word)
+# link() places the modules' text one after another from address 0 (the first module holds
+# the entry point) and their data from DATA_BASE, each module's data 4-byte aligned, then
+# resolves every relocation against the module's own labels first and then the globals.
+# Objects are cached on disk under the SHA-256 of their source, so rebuilding a program only
+# re-assembles the modules that changed.
+# Usage:
+#     python linker.py main.asm lib/factorial.asm -o prog.v -x prog.hex [-d prog_data.hex]
+#     python linker.py -c lib/factorial.asm                 # just write lib/factorial.o
+#     python linker.py main.asm lib/factorial.o -x prog.hex --map
+
+import argparse
+import hashlib
+import os
+import pickle
+import sys
+import time
+
+from Assembler import (B_RANGE, B_TYPE, DATA_BASE, J_RANGE, S_TYPE, AssemblyError, DataSegment, Program,
+                       data_image_words, encode_instructions, is_label, report_assembly_error,
+                       scan_instructions, write_hex_file, write_verilog_memory_file)
+
+OBJECT_VERSION = 1
+DEFAULT_CACHE_DIR = ".objcache"
+TEXT, DATA = 'text', 'data'
+R_BRANCH, R_JAL, R_HI20, R_LO12_I, R_LO12_S, R_ABS32 = 'branch', 'jal', 'hi20', 'lo12_i', 'lo12_s', 'abs32'
+
+class LinkError(ValueError):
+    """Undefined or duplicate symbols, or a relocation that does not fit its field."""
+
+# === Objects ===
+
+class ObjectModule:
+    """One assembled module; see the header comment for the fields."""
+    __slots__ = ('name', 'text', 'lines', 'data', 'symbols', 'globals', 'relocations')
+
+    def __init__(self, name, text, lines, data, symbols, globals_, relocations):
+        self.name = name
+        self.text = text
+        self.lines = lines
+        self.data = data
+        self.symbols = symbols
+        self.globals = globals_
+        self.relocations = relocations
+
+    def to_dict(self):
+        return {'version': OBJECT_VERSION, 'name': self.name, 'text': self.text, 'lines': self.lines,
+                'data': bytes(self.data), 'symbols': self.symbols, 'globals': sorted(self.globals),
+                'relocations': self.relocations}
+
+    @classmethod
+    def from_dict(cls, d):
+        if not isinstance(d, dict) or d.get('version') != OBJECT_VERSION:
+            raise ValueError("not an object file of this version")
+        return cls(d['name'], d['text'], d['lines'], bytearray(d['data']), d['symbols'],
+                   set(d['globals']), d['relocations'])
+
+def _replace_last(text, token, value):
+    head, _, tail = text.rpartition(token)
+    return head + value + tail
+
+def _relocate_operands(text, lineno, offset, relocations):
+    """
+    Replace %hi(sym)/%lo(sym) operands naming labels with 0, recording a relocation for each.
+    Numeric %hi/%lo operands are left for encode_instructions().
+    """
+    mnemonic = text.split(None, 1)[0].lower()
+    parts = []
+    pos = 0
+    while True:
+        start = text.find('%', pos)
+        end = text.find(')', start)
+        if start < 0 or end < 0:
+            break
+        sym = text[start + 4:end].strip()
+        if is_label(sym):
+            kind = text[start + 1:start + 3]
+            if kind == 'hi':
+                relocations.append((TEXT, offset, R_HI20, sym, lineno))
+            else:
+                relocations.append((TEXT, offset, R_LO12_S if mnemonic in S_TYPE else R_LO12_I, sym, lineno))
+            parts.append(text[pos:start] + "0")
+        else:
+            parts.append(text[pos:end + 1])
+        pos = end + 1
+    parts.append(text[pos:])
+    return "".join(parts)
+
+def assemble_object(source, name="<module>"):
+    """
+    Assemble one module (a string or iterable of lines) into an ObjectModule.
+    Raises AssemblyError for errors inside the module; undefined labels become relocations.
+    """
+    if isinstance(source, str):
+        source = source.splitlines()
+    labels = {}
+    data = DataSegment(relocatable=True)
+    instructions = list(scan_instructions(source, labels, data))
+    local_text = {label for label in labels if label not in data.labels}
+
+    relocations = []
+    rewritten = []
+    for index, (lineno, text, raw) in enumerate(instructions):
+        offset = 4 * index
+        if '%' in text:
+            text = _relocate_operands(text, lineno, offset, relocations)
+        tokens = text.replace(',', ' ').split()
+        mnemonic, target = tokens[0].lower(), tokens[-1]
+        if (mnemonic in B_TYPE or mnemonic == 'jal') and is_label(target) and target not in local_text:
+            relocations.append((TEXT, offset, R_BRANCH if mnemonic in B_TYPE else R_JAL, target, lineno))
+            text = _replace_last(text, target, "0")
+        elif mnemonic == '.word' and is_label(target):
+            relocations.append((TEXT, offset, R_ABS32, target, lineno))
+            text = _replace_last(text, target, "0")
+        rewritten.append((lineno, text, raw))
+    text_words = list(encode_instructions(rewritten, labels))
+
+    for offset, label, lineno, _ in data.fixups:
+        relocations.append((DATA, offset, R_ABS32, label, lineno))
+    data.fixups.clear()
+
+    symbols = {label: (DATA, address) if label in data.labels else (TEXT, address)
+               for label, address in labels.items()}
+    for label, (lineno, column) in data.globals.items():
+        if label not in symbols:
+            raise AssemblyError(f"'.globl {label}' names a label this module does not define", lineno, column)
+    return ObjectModule(name, text_words, [lineno for lineno, _, _ in instructions], data.data, symbols,
+                        set(data.globals), relocations)
+
+def save_object(obj, path):
+    """Write an object file atomically (temp file + rename). Raises OSError."""
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(obj.to_dict(), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+def load_object(path):
+    """Read an object file. Raises OSError, or ValueError for a foreign/outdated file."""
+    with open(path, 'rb') as f:
+        try:
+            return ObjectModule.from_dict(pickle.load(f))
+        except (pickle.UnpicklingError, EOFError, KeyError) as e:
+            raise ValueError(f"'{path}' is not an object file: {e}") from None
+
+# === Object cache ===
+
+def source_hash(source_bytes):
+    """Cache key of a module: its bytes plus the object format version."""
+    return hashlib.sha256(b"rv-object-%d\n" % OBJECT_VERSION + source_bytes).hexdigest()
+
+def object_for_source(path, cache_dir=None):
+    """
+    ObjectModule for the .asm file at path, loaded from cache_dir if an object for the same
+    content is there, otherwise assembled (and stored). Returns (obj, reused).
+    """
+    with open(path, 'rb') as f:
+        source_bytes = f.read()
+    name = os.path.basename(path)
+    cached_path = None
+    if cache_dir:
+        cached_path = os.path.join(cache_dir, source_hash(source_bytes) + ".o")
+        try:
+            obj = load_object(cached_path)
+            obj.name = name
+            return obj, True
+        except (OSError, ValueError):
+            pass
+    obj = assemble_object(source_bytes.decode().splitlines(), name)
+    if cached_path:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            save_object(obj, cached_path)
+        except OSError as e:
+            print(f"Warning: could not cache object for '{path}': {e}", file=sys.stderr)
+    return obj, False
+
+# === Linking ===
+
+def _patch(word, kind, value, place):
+    """word with the field for relocation kind set from value (place = address of the word)."""
+    if kind == R_BRANCH:
+        imm = value - place
+        if not B_RANGE[0] <= imm <= B_RANGE[1]:
+            raise ValueError(f"branch offset {imm:+d} is out of B-type range")
+        return (word & 0x01FFF07F) | (((imm >> 12) & 0x1) << 31) | (((imm >> 5) & 0x3F) << 25) | \
+            (((imm >> 1) & 0xF) << 8) | (((imm >> 11) & 0x1) << 7)
+    if kind == R_JAL:
+        imm = value - place
+        if not J_RANGE[0] <= imm <= J_RANGE[1]:
+            raise ValueError(f"jump offset {imm:+d} is out of jal range")
+        return (word & 0x00000FFF) | (((imm >> 20) & 0x1) << 31) | (((imm >> 1) & 0x3FF) << 21) | \
+            (((imm >> 11) & 0x1) << 20) | (((imm >> 12) & 0xFF) << 12)
+    hi = (value + 0x800) >> 12
+    lo = value - (hi << 12)
+    if kind == R_HI20:
+        return (word & 0x00000FFF) | ((hi & 0xFFFFF) << 12)
+    if kind == R_LO12_I:
+        return (word & 0x000FFFFF) | ((lo & 0xFFF) << 20)
+    if kind == R_LO12_S:
+        return (word & 0x01FFF07F) | (((lo >> 5) & 0x7F) << 25) | ((lo & 0x1F) << 7)
+    return value & 0xFFFFFFFF
+
+def link(objects, data_base=DATA_BASE):
+    """
+    Lay out and relocate ObjectModules (the first one starts at address 0).
+    Returns a Assembler.Program whose labels are the global symbols. Raises LinkError.
+    """
+    text_bases, data_bases = [], []
+    text_size, data_size = 0, 0
+    for obj in objects:
+        text_bases.append(text_size)
+        data_bases.append(data_base + data_size)
+        text_size += 4 * len(obj.text)
+        data_size += len(obj.data) + (-len(obj.data) % 4)
+
+    def address(i, section, offset):
+        return (text_bases[i] if section == TEXT else data_bases[i]) + offset
+
+    exports = {}
+    for i, obj in enumerate(objects):
+        for name in obj.globals:
+            if name in exports:
+                raise LinkError(f"symbol '{name}' is defined in both {objects[exports[name][0]].name} "
+                                f"and {obj.name}")
+            exports[name] = (i, address(i, *obj.symbols[name]))
+
+    words, lines = [], []
+    data = bytearray()
+    for i, obj in enumerate(objects):
+        text = list(obj.text)
+        blob = bytearray(obj.data)
+        for section, offset, kind, symbol, lineno in obj.relocations:
+            if symbol in obj.symbols:
+                value = address(i, *obj.symbols[symbol])
+            elif symbol in exports:
+                value = exports[symbol][1]
+            else:
+                raise LinkError(f"{obj.name}:{lineno}: undefined symbol '{symbol}'")
+            try:
+                if section == TEXT:
+                    text[offset >> 2] = _patch(text[offset >> 2], kind, value, text_bases[i] + offset)
+                else:
+                    blob[offset:offset + 4] = (value & 0xFFFFFFFF).to_bytes(4, 'little')
+            except ValueError as e:
+                raise LinkError(f"{obj.name}:{lineno}: '{symbol}': {e}") from None
+        words.extend(text)
+        lines.extend(obj.lines)
+        data += blob + bytes(-len(blob) % 4)
+    labels = {name: value for name, (_, value) in exports.items()}
+    return Program(words, labels, lines, data, data_base)
+
+def link_map(objects, program):
+    """Text of a link map: where each module landed and the global symbol addresses."""
+    out = ["Modules:"]
+    text_addr, data_addr = 0, program.data_base
+    for obj in objects:
+        out.append(f"  {obj.name:<24} text {text_addr:#07x} ({4 * len(obj.text)} bytes)  "
+                   f"data {data_addr:#07x} ({len(obj.data)} bytes)  {len(obj.relocations)} relocations")
+        text_addr += 4 * len(obj.text)
+        data_addr += len(obj.data) + (-len(obj.data) % 4)
+    out.append("Symbols:")
+    for name, value in sorted(program.labels.items(), key=lambda kv: kv[1]):
+        out.append(f"  {value:#010x}  {name}")
+    return "\n".join(out)
+
+def main():
+    parser = argparse.ArgumentParser(description="Assemble modules into relocatable objects and link them")
+    parser.add_argument("inputs", nargs="+", help=".asm sources and/or .o objects, entry module first")
+    parser.add_argument("--compile-only", "-c", action="store_true",
+                        help="Only write <source>.o next to each .asm input")
+    parser.add_argument("--output", "-o", help="Verilog memory file for the linked program")
+    parser.add_argument("--hex-output", "-x", help="v2.0 raw .hex for the linked program")
+    parser.add_argument("--data-output", "-d", help="Data Memory image (default: <hex or output name>_data.hex)")
+    parser.add_argument("--data-base", type=lambda value: int(value, 0), default=DATA_BASE, metavar="ADDR",
+                        help=f"Address of the first module's data (default: {DATA_BASE:#x})")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR,
+                        help=f"Object cache directory (default: {DEFAULT_CACHE_DIR}; '' disables it)")
+    parser.add_argument("--map", action="store_true", help="Print the link map")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    objects, assembled, reused = [], 0, 0
+    try:
+        for path in args.inputs:
+            if path.lower().endswith('.o'):
+                objects.append(load_object(path))
+                continue
+            if args.compile_only:
+                with open(path) as f:
+                    obj = assemble_object(f.read(), os.path.basename(path))
+                save_object(obj, os.path.splitext(path)[0] + ".o")
+                print(f"Wrote '{os.path.splitext(path)[0]}.o' ({len(obj.text)} words, "
+                      f"{len(obj.relocations)} relocations)")
+                continue
+            obj, hit = object_for_source(path, args.cache_dir)
+            objects.append(obj)
+            reused += hit
+            assembled += not hit
+    except AssemblyError as e:
+        print(f"{path}: ", end="", file=sys.stderr)
+        report_assembly_error(e)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    if args.compile_only:
+        return
+
+    try:
+        program = link(objects, args.data_base)
+    except LinkError as e:
+        print(f"Link failed: {e}", file=sys.stderr)
+        sys.exit(1)
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"Linked {len(objects)} modules ({assembled} assembled, {reused} from cache), "
+          f"{len(program.words)} words in {elapsed:.1f} ms")
+    if args.map:
+        print(link_map(objects, program))
+
+    outputs = []
+    if args.output:
+        outputs.append((write_verilog_memory_file, args.output, program.words))
+    if args.hex_output:
+        outputs.append((write_hex_file, args.hex_output, program.words))
+    if program.data and (args.output or args.hex_output or args.data_output):
+        data_path = args.data_output or os.path.splitext(args.hex_output or args.output)[0] + "_data.hex"
+        outputs.append((write_hex_file, data_path, data_image_words(program.data, program.data_base)))
+    for writer, path, words in outputs:
+        try:
+            count = writer(path, words)
+        except OSError as e:
+            print(f"Error: cannot write '{path}': {e}", file=sys.stderr)
+            sys.exit(1)
+        print(f"Wrote '{path}', {count} entries.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+# Sparse paged Data Memory for the simulator, for address spaces far larger than the circuit's
+# 4096-word RAMDualPort (programs that put stacks, data and lui-built pointers anywhere).
+#
+# Memory is split into fixed-size pages (4 KiB by default). A page is allocated on its first
+# write; reads of a page that was never written return 0 without allocating. Pages are
+# bytearrays, or with path= slices of one mmap'ed sparse file covering the whole address
+# space, so a 4 GiB space costs only the pages actually written (in RAM or on disk).
+# Words are read through memoryview.cast('I') (host byte order).
+#
+# PagedMemory indexes by word like the simulator's RAM list, so Simulator(..., memory=...)
+# runs unchanged on top of it. Every access is counted per page (reads, writes).
+# load_hex() streams a v2.0 raw image: 'N*0' runs skip unallocated pages and other runs are
+# filled a page slice at a time. snapshot()/restore() copy only the allocated pages.
+# Usage:
+#     python paged_memory.py prog.asm [--addr-bits 32] [--page-bits 12] [--top 10]
+#     python paged_memory.py prog.hex --data prog_data.hex [--data-at 0x10000] [--backing ram.bin]
+
+import argparse
+import mmap
+import os
+import sys
+import time
+from array import array
+
+from Assembler import AssemblyError
+from simulator import DEFAULT_MAX_CYCLES, MASK, SimulationError, Simulator
+
+DEFAULT_ADDR_BITS = 32
+DEFAULT_PAGE_BITS = 12      # 4 KiB pages
+
+class PagedMemory:
+    """
+    addr_bits of byte address space (word_bits = addr_bits - 2 for the simulator's mask)
+    in pages of 2**page_bits bytes. pages maps page number -> word view;
+    reads/writes map page number -> access count. path backs the pages with a sparse
+    file instead of bytearrays (it is created or truncated; call close() when done).
+    """
+    __slots__ = ('addr_bits', 'word_bits', 'page_bits', 'page_shift', 'page_words', 'page_mask',
+                 'pages', 'reads', 'writes', 'path', 'file', 'map')
+
+    def __init__(self, addr_bits=DEFAULT_ADDR_BITS, page_bits=DEFAULT_PAGE_BITS, path=None):
+        if not 2 < page_bits <= addr_bits:
+            raise ValueError(f"page_bits must be in 3..{addr_bits}, not {page_bits}")
+        self.addr_bits = addr_bits
+        self.word_bits = addr_bits - 2
+        self.page_bits = page_bits
+        self.page_shift = page_bits - 2
+        self.page_words = 1 << self.page_shift
+        self.page_mask = self.page_words - 1
+        self.pages = {}
+        self.reads = {}
+        self.writes = {}
+        self.path = path
+        self.file = self.map = None
+        if path is not None:
+            self.file = open(path, 'w+b')
+            self.file.truncate(1 << addr_bits)
+            self.map = mmap.mmap(self.file.fileno(), 1 << addr_bits)
+
+    def close(self):
+        """Release the backing file (no-op for bytearray pages)."""
+        if self.map is None:
+            return
+        for view in self.pages.values():
+            view.release()
+        self.pages = {}
+        try:
+            self.map.close()
+        except BufferError:
+            pass        # a caller still holds a view; the map closes when it is released
+        self.file.close()
+        self.map = self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return 1 << self.word_bits
+
+    def _page(self, number):
+        """Allocate page number (first touch)."""
+        if not 0 <= number < 1 << (self.addr_bits - self.page_bits):
+            raise IndexError(f"page {number} is outside the {self.addr_bits}-bit address space")
+        if self.map is None:
+            view = memoryview(bytearray(1 << self.page_bits)).cast('I')
+        else:
+            view = memoryview(self.map)[number << self.page_bits:(number + 1) << self.page_bits].cast('I')
+        self.pages[number] = view
+        return view
+
+    # === Word access (the simulator's ram[index] interface) ===
+
+    def __getitem__(self, index):
+        try:
+            number = index >> self.page_shift
+        except TypeError:
+            start, stop, step = index.indices(len(self))
+            return [self[i] for i in range(start, stop, step)]
+        reads = self.reads
+        reads[number] = reads.get(number, 0) + 1
+        page = self.pages.get(number)
+        if page is None:
+            return 0
+        return page[index & self.page_mask]
+
+    def __setitem__(self, index, value):
+        try:
+            number = index >> self.page_shift
+        except TypeError:
+            start, stop, step = index.indices(len(self))
+            if step != 1 or len(value) != stop - start:
+                raise ValueError("only contiguous slices of the same length can be assigned") from None
+            self.load_words(value, start)
+            return
+        writes = self.writes
+        writes[number] = writes.get(number, 0) + 1
+        page = self.pages.get(number)
+        if page is None:
+            page = self._page(number)
+        page[index & self.page_mask] = value
+
+    def read_word(self, address):
+        return self[(address & MASK) >> 2 & ((1 << self.word_bits) - 1)]
+
+    def write_word(self, address, value):
+        self[(address & MASK) >> 2 & ((1 << self.word_bits) - 1)] = value & MASK
+
+    # === Bulk operations ===
+
+    def _spans(self, start, count):
+        """(page number, offset in page, words, offset in the run) covering count words from word start."""
+        done = 0
+        while done < count:
+            number, offset = divmod(start + done, self.page_words)
+            take = min(self.page_words - offset, count - done)
+            yield number, offset, take, done
+            done += take
+
+    def load_words(self, words, start=0):
+        """
+        Write words from word index start, one page slice at a time. All-zero slices of
+        pages that were never written are skipped. Not counted as accesses.
+        """
+        words = words if isinstance(words, array) and words.typecode == 'I' else array('I', words)
+        if start + len(words) > len(self):
+            raise IndexError(f"{len(words)} words from {start} run past the {self.addr_bits}-bit address space")
+        pages = self.pages
+        for number, offset, take, done in self._spans(start, len(words)):
+            chunk = words[done:done + take]
+            page = pages.get(number)
+            if page is None:
+                if not any(chunk):
+                    continue
+                page = self._page(number)
+            page[offset:offset + take] = chunk
+        return len(words)
+
+    def fill(self, start, count, value):
+        """Set count words from word index start to value (zero only touches allocated pages)."""
+        if start + count > len(self):
+            raise IndexError(f"{count} words from {start} run past the {self.addr_bits}-bit address space")
+        pages = self.pages
+        run = array('I', [value & MASK]) * min(count, self.page_words)
+        for number, offset, take, _ in self._spans(start, count):
+            page = pages.get(number)
+            if page is None:
+                if not value:
+                    continue
+                page = self._page(number)
+            page[offset:offset + take] = run[:take]
+
+    def load_hex(self, path, start=0):
+        """
+        Stream a v2.0 raw .hex image into memory from word index start, without expanding
+        'N*value' runs into lists. Returns the number of words. Raises ValueError for a
+        missing header or a bad value (as read_hex_file), IndexError past the address space.
+        """
+        pending = array('I')
+        cursor = start
+        with open(path, 'r') as f:
+            header = f.readline().strip()
+            if header != "v2.0 raw":
+                raise ValueError(f"'{path}' is not a v2.0 raw file (header '{header}')")
+            for lineno, line in enumerate(f, start=2):
+                for value in line.split():
+                    try:
+                        if '*' in value:
+                            run, _, word = value.partition('*')
+                            run, word = int(run), int(word, 16) & MASK
+                        else:
+                            pending.append(int(value, 16) & MASK)
+                            continue
+                    except ValueError:
+                        raise ValueError(f"Bad hex value '{value}' on line {lineno} of '{path}'") from None
+                    cursor += self.load_words(pending, cursor)
+                    pending = array('I')
+                    self.fill(cursor, run, word)
+                    cursor += run
+        cursor += self.load_words(pending, cursor)
+        return cursor - start
+
+    def clear(self):
+        """Zero all memory and the access counts (Simulator.reset)."""
+        if self.map is None:
+            self.pages = {}
+        else:
+            zero = bytes(1 << self.page_bits)
+            for view in self.pages.values():
+                view.cast('B')[:] = zero
+        self.reads = {}
+        self.writes = {}
+
+    def snapshot(self):
+        """{page number: bytes} of every allocated page that is not all zero."""
+        return {number: view.tobytes() for number, view in self.pages.items() if any(view)}
+
+    def restore(self, snapshot):
+        """Replace memory with a snapshot() (the access counts are kept)."""
+        reads, writes = self.reads, self.writes
+        self.clear()
+        self.reads, self.writes = reads, writes
+        for number, data in snapshot.items():
+            page = self.pages.get(number)
+            if page is None:
+                page = self._page(number)
+            page.cast('B')[:] = data
+
+    # === Statistics ===
+
+    def page_stats(self):
+        """[(page number, reads, writes, allocated)] for every page that was accessed, by page number."""
+        numbers = set(self.reads) | set(self.writes) | set(self.pages)
+        return [(n, self.reads.get(n, 0), self.writes.get(n, 0), n in self.pages) for n in sorted(numbers)]
+
+    def resident_bytes(self):
+        return len(self.pages) << self.page_bits
+
+def print_page_stats(memory, top=10):
+    """Allocation summary and the most accessed pages."""
+    stats = memory.page_stats()
+    print(f"{memory.addr_bits}-bit address space, {1 << memory.page_bits}-byte pages"
+          f"{f' backed by {memory.path}' if memory.path else ''}: {len(memory.pages)} allocated "
+          f"({memory.resident_bytes() / 1024:.0f} KiB), {len(stats)} touched, "
+          f"{sum(s[1] for s in stats)} word reads, {sum(s[2] for s in stats)} word writes")
+    if not stats:
+        return
+    print(f"  {'page address':<14}{'reads':>12}{'writes':>12}")
+    for number, reads, writes, allocated in sorted(stats, key=lambda s: s[1] + s[2], reverse=True)[:top]:
+        print(f"  {number << memory.page_bits:#010x}    {reads:>12}{writes:>12}{'' if allocated else '  (never written)'}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a program on sparse paged Data Memory and report page usage")
+    parser.add_argument("program", help="Program to run: .asm source or v2.0 raw .hex image")
+    parser.add_argument("--data", metavar="IMAGE", help="Data Memory image (v2.0 raw .hex) to stream in")
+    parser.add_argument("--data-at", type=lambda value: int(value, 0), default=0, metavar="ADDR",
+                        help="Byte address the --data image starts at (default: 0)")
+    parser.add_argument("--addr-bits", type=int, default=DEFAULT_ADDR_BITS, help="Byte address bits")
+    parser.add_argument("--page-bits", type=int, default=DEFAULT_PAGE_BITS, help="log2 of the page size in bytes")
+    parser.add_argument("--backing", metavar="FILE", help="Keep the pages in a sparse mmap'ed file")
+    parser.add_argument("--max-cycles", "-n", type=int, default=DEFAULT_MAX_CYCLES, help="Instruction limit")
+    parser.add_argument("--blocks", action="store_true", help="Run with basic-block translation")
+    parser.add_argument("--top", type=int, default=10, help="Pages to list")
+    args = parser.parse_args()
+
+    try:
+        memory = PagedMemory(args.addr_bits, args.page_bits, os.path.expanduser(args.backing) if args.backing else None)
+    except (ValueError, OSError) as e:
+        print(f"Cannot create memory: {e}", file=sys.stderr)
+        sys.exit(1)
+    with memory:
+        try:
+            sim = Simulator.from_file(os.path.expanduser(args.program), memory=memory)
+            if args.data:
+                start = time.perf_counter()
+                count = memory.load_hex(os.path.expanduser(args.data), args.data_at >> 2)
+                print(f"Loaded {count} words from '{args.data}' in {time.perf_counter() - start:.3f} s")
+        except (AssemblyError, SimulationError, ValueError, IndexError, OSError) as e:
+            print(f"Cannot load '{args.program}': {e}", file=sys.stderr)
+            sys.exit(1)
+
+        start = time.perf_counter()
+        reason = sim.run_blocks(args.max_cycles) if args.blocks else sim.run(args.max_cycles)
+        elapsed = time.perf_counter() - start
+        print(f"Stopped ({reason}) at pc={sim.pc:#x} after {sim.cycles} instructions, "
+              f"{elapsed:.3f} s ({sim.cycles / elapsed / 1e6 if elapsed else 0:.2f} M instr/s)")
+        print_page_stats(memory, args.top)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+# Regression runner for the example programs.
+# Each .asm file is assembled (same pipeline as updated_assemble), run on the instruction-set
+# simulator, and its final registers / Data Memory are checked against EXPECTATIONS below.
+# Programs run on a process pool; a JUnit XML report can be written for CI.
+# Usage:
+#     python regression.py                                   # everything in ../Asm Programs
+#     python regression.py "../Asm Programs/fibo.asm" --junit report.xml --jobs 4
+#
+# Expectation keys (all optional):
+#     regs       {register: value}              final register values (negative values allowed)
+#     mem        {address: value or [values]}   final Data Memory words from that byte address
+#     ram_init   {address: [values]}            Data Memory preloaded before the run
+#     stop_at    label or byte address          stop when PC reaches it, before it executes
+#     halt       'halt' | 'end' | 'breakpoint'  required stop reason (default: anything but max_cycles)
+#     max_cycles instruction limit (default DEFAULT_MAX_CYCLES)
+#     skip       reason string; the program is reported as skipped
+# Programs with no entry only have to assemble and stop within max_cycles.
+
+import argparse
+import glob
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+
+from Assembler import AssemblyError, assemble_file
+from simulator import DEFAULT_MAX_CYCLES, MASK, SimulationError, Simulator
+
+DEFAULT_PROGRAM_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Asm Programs")
+
+# === Expected results ===
+
+EXPECTATIONS = {
+    'Factorial_using_Stack.asm': {'regs': {10: 1, 11: 24}, 'halt': 'halt'},         # n = 4 in the source
+    'Golden_Program.asm': {'skip': "uses lb/lbu/sb, which the core does not implement"},
+    'avg.asm': {
+        'ram_init': {0x100: [12, 40, 7, 25, 16]},
+        'regs': {20: 40, 21: 7, 22: 100, 23: 20},
+        'mem': {0x120: [40, 7, 20]},
+        'halt': 'halt',
+    },
+    'bubbleSort.asm': {'regs': {10: 1, 11: 2, 12: 4, 13: 5, 14: 7, 15: 8}, 'halt': 'halt'},
+    'factorial.asm': {'regs': {6: 120, 2: 256}, 'halt': 'halt'},
+    'fibo.asm': {'regs': {3: 55, 10: 55}, 'halt': 'halt'},
+    'gcd.asm': {
+        'regs': {15: 1, 16: 0, 17: 1, 18: 4},
+        'mem': {0x100: [5, 1, 1, 0, 1, 4]},
+        'halt': 'halt',
+    },
+    'nodeDeletion.asm': {
+        # List 3 -> 9 -> 2 -> 6 at 0x100; nodes above the threshold (4) are unlinked.
+        'ram_init': {0x100: [3, 0x108, 9, 0x110, 2, 0x118, 6, 0]},
+        'stop_at': 0x1C,                # the 'addi x0, x0, 0' after the call falls into the function
+        'regs': {7: 0x100, 10: 0x100, 2: 256},
+        'mem': {0x100: [3, 0x110], 0x110: [2, 0]},
+        'halt': 'breakpoint',
+    },
+    'primeCounter.asm': {
+        'stop_at': 'count_done',        # the program ends by jumping back to address 0
+        'regs': {21: 25},
+        'mem': {0x1000: [1, 1, 1, 1, 0, 1, 0, 1, 0, 0, 0, 1]},
+        'halt': 'breakpoint',
+    },
+    'prog.asm': {'regs': {3: 15, 4: 0, 5: 99, 6: 0x1C, 7: 0, 8: 88}, 'halt': 'end'},
+    'summer.asm': {'regs': {5: 11, 6: 55}, 'halt': 'end'},
+    'test.asm': {'regs': {2: 7, 4: 15, 5: 6, 6: 1, 7: 15, 8: 0, 9: 4}, 'mem': {0x100: 15}, 'halt': 'end'},
+}
+
+# === Running one program ===
+
+def check_state(sim, expect):
+    """Return a list of mismatch descriptions (empty when the final state matches)."""
+    problems = []
+    for reg, value in expect.get('regs', {}).items():
+        if sim.regs[reg] != value & MASK:
+            problems.append(f"x{reg} = {sim.signed_reg(reg)}, expected {value}")
+    for address, values in expect.get('mem', {}).items():
+        if not isinstance(values, (list, tuple)):
+            values = [values]
+        for offset, value in enumerate(values):
+            actual = sim.read_word(address + 4 * offset)
+            if actual != value & MASK:
+                problems.append(f"mem[{address + 4 * offset:#x}] = {actual:#x}, expected {value & MASK:#x}")
+    return problems
+
+def run_program(asm_path):
+    """
+    Worker: assemble, simulate and check one program.
+    Returns (name, status, message, seconds, cycles) with status one of
+    'passed', 'failed', 'error', 'skipped'; never raises.
+    """
+    start = time.perf_counter()
+    name = os.path.basename(asm_path)
+    expect = EXPECTATIONS.get(name, {})
+    if 'skip' in expect:
+        return name, 'skipped', expect['skip'], 0.0, 0
+    cycles = 0
+    try:
+        program = assemble_file(asm_path)
+        sim = Simulator(program.words, ram_image=program.ram_words())
+        for address, values in expect.get('ram_init', {}).items():
+            for offset, value in enumerate(values):
+                sim.write_word(address + 4 * offset, value)
+        stop_at = expect.get('stop_at')
+        if stop_at is not None:
+            if isinstance(stop_at, str):
+                if stop_at not in program.labels:
+                    raise SimulationError(f"stop_at label '{stop_at}' is not defined")
+                stop_at = program.labels[stop_at]
+            sim.set_breakpoint(stop_at)
+        reason = sim.run(expect.get('max_cycles', DEFAULT_MAX_CYCLES))
+        cycles = sim.cycles
+    except AssemblyError as e:
+        return name, 'error', f"assembly failed: {e}", time.perf_counter() - start, cycles
+    except (SimulationError, ValueError, OSError) as e:
+        return name, 'error', f"{e}", time.perf_counter() - start, cycles
+
+    problems = []
+    wanted = expect.get('halt')
+    if reason == 'max_cycles' or (wanted and reason != wanted):
+        problems.append(f"stopped with '{reason}' at pc={sim.pc:#x}, expected '{wanted or 'halt/end'}'")
+    problems.extend(check_state(sim, expect))
+    status = 'failed' if problems else 'passed'
+    return name, status, "; ".join(problems), time.perf_counter() - start, cycles
+
+def run_all(paths, jobs=None):
+    """Run every program on a process pool; returns run_program() results in input order."""
+    if jobs == 1 or len(paths) <= 1:
+        return [run_program(p) for p in paths]
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(run_program, paths))
+
+# === Reporting ===
+
+def write_junit(path, results, wall):
+    """Write results as a single JUnit <testsuite>."""
+    counts = {status: sum(1 for r in results if r[1] == status) for status in ('failed', 'error', 'skipped')}
+    suite = ET.Element('testsuite', name='asm-programs', tests=str(len(results)),
+                       failures=str(counts['failed']), errors=str(counts['error']),
+                       skipped=str(counts['skipped']), time=f"{wall:.3f}")
+    for name, status, message, seconds, cycles in results:
+        case = ET.SubElement(suite, 'testcase', classname='regression', name=name, time=f"{seconds:.3f}")
+        if status == 'failed':
+            ET.SubElement(case, 'failure', message=message)
+        elif status == 'error':
+            ET.SubElement(case, 'error', message=message)
+        elif status == 'skipped':
+            ET.SubElement(case, 'skipped', message=message)
+        else:
+            ET.SubElement(case, 'system-out').text = f"{cycles} instructions"
+    ET.ElementTree(suite).write(path, encoding='utf-8', xml_declaration=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Assemble, simulate and check every example program")
+    parser.add_argument("sources", nargs="*", help="Programs or directories (default: ../Asm Programs)")
+    parser.add_argument("--jobs", "-j", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--junit", metavar="PATH", help="Write a JUnit XML report here")
+    args = parser.parse_args()
+
+    paths = []
+    for source in args.sources or [DEFAULT_PROGRAM_DIR]:
+        if os.path.isdir(source):
+            paths.extend(sorted(glob.glob(os.path.join(glob.escape(source), '*.asm'))))
+        else:
+            paths.append(source)
+    if not paths:
+        print("No .asm files found.", file=sys.stderr)
+        sys.exit(1)
+
+    start = time.perf_counter()
+    results = run_all(paths, args.jobs)
+    wall = time.perf_counter() - start
+
+    width = max(len(r[0]) for r in results)
+    for name, status, message, seconds, cycles in results:
+        line = f"  {status.upper():<7} {name:<{width}}  {seconds * 1000:8.1f} ms  {cycles:>9} instr"
+        print(f"{line}  {message}" if message else line)
+    bad = sum(1 for r in results if r[1] in ('failed', 'error'))
+    skipped = sum(1 for r in results if r[1] == 'skipped')
+    print(f"{len(results)} programs, {len(results) - bad - skipped} passed, {bad} failed, "
+          f"{skipped} skipped, wall {wall:.3f} s")
+
+    if args.junit:
+        try:
+            write_junit(args.junit, results, wall)
+        except OSError as e:
+            print(f"Error: cannot write '{args.junit}': {e}", file=sys.stderr)
+            sys.exit(1)
+    sys.exit(1 if bad else 0)
+
+if __name__ == "__main__":
+    main()
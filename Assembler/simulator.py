@@ -0,0 +1,713 @@
+# Instruction-set simulator (golden model) for the single-cycle RISC-V core in RISCV_Top.dig.
+# Executes exactly the instructions in the assembler's R/I/S/B/U/J tables (RV32I subset + mul/div/rem).
+#
+# Memory model matches the circuit:
+#   Instruction Memory (ROM)  - indexed by PC[9:2]; the program is the assembled word list
+#   Data Memory (RAMDualPort) - 4096 x 32-bit words indexed by address[13:2]; lw/sw move whole
+#                               words and ignore address bits 1:0
+# div/rem follow the RV32M spec (signed, x/0 = -1, x%0 = x). Note that the Div block in alu.dig
+# is unsigned, so programs that divide negative numbers will differ from the circuit.
+#
+# Each instruction is predecoded once into a closure that updates the register list and returns
+# the next PC, so the run loop is just  pc = code[pc >> 2]().
+# A program halts when it reaches an idle loop (a branch/jal to itself, or a backward
+# 'jal x0' over instructions that only write x0), runs past its last instruction, or hits max_cycles.
+# Usage:
+#     python simulator.py prog.asm [--max-cycles N] [--mem 0x100:0x140]
+#     python simulator.py prog.hex [--data prog_data.hex]
+# A .asm program's .data section (or --data for a .hex) is loaded into Data Memory from word 0.
+
+import argparse
+import os
+import sys
+import time
+
+from Assembler import (B_TYPE, J_TYPE, R_TYPE, RAM_ADDR_BITS, S_TYPE, U_TYPE, AssemblyError,
+                       assemble_file, read_hex_file)
+from disassembler import IllegalInstruction, decode
+
+MASK = 0xFFFFFFFF
+TRACE_WROTE_RD, TRACE_LOAD, TRACE_STORE = 1, 2, 4     # run_traced() record flags
+DEFAULT_MAX_CYCLES = 10_000_000
+
+class SimulationError(Exception):
+    """An instruction word could not be decoded or executed."""
+
+class _Halt(Exception):
+    """Raised by an idle-loop instruction to stop the run loop."""
+
+class _Breakpoint(Exception):
+    """Raised in place of the instruction at a breakpoint address, before it executes."""
+
+def _breakpoint():
+    raise _Breakpoint()
+
+# === Semantics ===
+
+def _signed(v):
+    return v - ((v & 0x80000000) << 1)
+
+def _div(a, b):
+    a, b = _signed(a), _signed(b)
+    if b == 0:
+        return MASK
+    q = abs(a) // abs(b)
+    return (-q if (a < 0) != (b < 0) else q) & MASK
+
+def _rem(a, b):
+    a, b = _signed(a), _signed(b)
+    if b == 0:
+        return a & MASK
+    r = abs(a) % abs(b)
+    return (-r if a < 0 else r) & MASK
+
+# Register-register ALU results as functions of the two unsigned source values.
+ALU_R = {
+    'add':  lambda a, b: (a + b) & MASK,
+    'sub':  lambda a, b: (a - b) & MASK,
+    'sll':  lambda a, b: (a << (b & 0x1F)) & MASK,
+    'slt':  lambda a, b: int(_signed(a) < _signed(b)),
+    'sltu': lambda a, b: int(a < b),
+    'xor':  lambda a, b: a ^ b,
+    'srl':  lambda a, b: a >> (b & 0x1F),
+    'sra':  lambda a, b: (_signed(a) >> (b & 0x1F)) & MASK,
+    'or':   lambda a, b: a | b,
+    'and':  lambda a, b: a & b,
+    'mul':  lambda a, b: (a * b) & MASK,
+    'div':  _div,
+    'rem':  _rem,
+}
+
+# Register-immediate ALU ops map onto the same functions with imm as the second operand.
+ALU_I = {'addi': 'add', 'andi': 'and', 'ori': 'or', 'xori': 'xor', 'slti': 'slt', 'sltiu': 'sltu',
+         'slli': 'sll', 'srli': 'srl', 'srai': 'sra'}
+
+# Branch conditions on the two unsigned source values.
+BRANCH = {
+    'beq':  lambda a, b: a == b,
+    'bne':  lambda a, b: a != b,
+    'blt':  lambda a, b: _signed(a) < _signed(b),
+    'bge':  lambda a, b: _signed(a) >= _signed(b),
+    'bltu': lambda a, b: a < b,
+    'bgeu': lambda a, b: a >= b,
+}
+
+# === Predecoding into closures ===
+
+def _compile(fields, pc, regs, ram, ram_mask, idle_loop, on_store=None):
+    """
+    Build the closure for one decoded instruction at address pc. The common ALU ops get
+    hand-written closures; the rest go through the ALU_R/BRANCH function tables.
+    on_store(address, value), if given, is called after every sw (see Simulator.set_store_hook).
+    """
+    mnemonic, rd, rs1, rs2, imm = fields
+    next_pc = (pc + 4) & MASK
+
+    if mnemonic in ALU_R or mnemonic in ALU_I:
+        if rd == 0:
+            return lambda: next_pc
+        if mnemonic == 'add':
+            def op():
+                regs[rd] = (regs[rs1] + regs[rs2]) & MASK
+                return next_pc
+        elif mnemonic == 'sub':
+            def op():
+                regs[rd] = (regs[rs1] - regs[rs2]) & MASK
+                return next_pc
+        elif mnemonic == 'addi':
+            uimm = imm & MASK
+            def op():
+                regs[rd] = (regs[rs1] + uimm) & MASK
+                return next_pc
+        elif mnemonic == 'slli':
+            def op():
+                regs[rd] = (regs[rs1] << imm) & MASK
+                return next_pc
+        elif mnemonic in ALU_R:
+            fn = ALU_R[mnemonic]
+            def op():
+                regs[rd] = fn(regs[rs1], regs[rs2])
+                return next_pc
+        else:
+            fn = ALU_R[ALU_I[mnemonic]]
+            uimm = imm & MASK
+            def op():
+                regs[rd] = fn(regs[rs1], uimm)
+                return next_pc
+        return op
+
+    if mnemonic == 'lw':
+        if rd == 0:
+            return lambda: next_pc
+        def op():
+            regs[rd] = ram[((regs[rs1] + imm) >> 2) & ram_mask]
+            return next_pc
+        return op
+
+    if mnemonic == 'sw':
+        if on_store is not None:
+            def op():
+                address = (regs[rs1] + imm) & MASK
+                value = regs[rs2]
+                ram[(address >> 2) & ram_mask] = value
+                on_store(address, value)
+                return next_pc
+            return op
+        def op():
+            ram[((regs[rs1] + imm) >> 2) & ram_mask] = regs[rs2]
+            return next_pc
+        return op
+
+    if mnemonic in BRANCH:
+        target = (pc + imm) & MASK
+        cond = BRANCH[mnemonic]
+        if target == pc:
+            def op():
+                if cond(regs[rs1], regs[rs2]):
+                    raise _Halt()
+                return next_pc
+        elif mnemonic == 'beq':
+            def op():
+                return target if regs[rs1] == regs[rs2] else next_pc
+        elif mnemonic == 'bne':
+            def op():
+                return target if regs[rs1] != regs[rs2] else next_pc
+        else:
+            def op():
+                return target if cond(regs[rs1], regs[rs2]) else next_pc
+        return op
+
+    if mnemonic == 'jal':
+        target = (pc + imm) & MASK
+        if target == pc or idle_loop:
+            def op():
+                if rd:
+                    regs[rd] = next_pc
+                raise _Halt()
+        elif rd == 0:
+            def op():
+                return target
+        else:
+            def op():
+                regs[rd] = next_pc
+                return target
+        return op
+
+    if mnemonic == 'jalr':
+        def op():
+            target = (regs[rs1] + imm) & 0xFFFFFFFE
+            if rd:
+                regs[rd] = next_pc
+            return target
+        return op
+
+    if mnemonic == 'lui':
+        if rd == 0:
+            return lambda: next_pc
+        def op():
+            regs[rd] = imm
+            return next_pc
+        return op
+
+    if mnemonic == 'auipc':
+        if rd == 0:
+            return lambda: next_pc
+        value = (pc + imm) & MASK
+        def op():
+            regs[rd] = value
+            return next_pc
+        return op
+
+    raise SimulationError(f"No semantics for '{mnemonic}'")
+
+def _is_idle_loop(decoded, index):
+    """
+    True if decoded[index] is 'jal x0' jumping backwards over instructions that only
+    write x0 (e.g. 'addi x0, x0, 0' / 'jal x0, -4'): such a loop can never change state.
+    """
+    mnemonic, rd, _, _, imm = decoded[index]
+    if mnemonic != 'jal' or rd != 0 or imm > 0:
+        return False
+    start = index + imm // 4
+    if start < 0:
+        return False
+    for m, body_rd, _, _, _ in decoded[start:index]:
+        if body_rd != 0 or m in B_TYPE or m in S_TYPE or m in J_TYPE or m == 'jalr':
+            return False
+    return True
+
+def predecode(words):
+    """Decode every word once. Returns the list of (mnemonic, rd, rs1, rs2, imm) tuples."""
+    decoded = []
+    for index, word in enumerate(words):
+        try:
+            decoded.append(decode(word))
+        except IllegalInstruction as e:
+            raise SimulationError(f"{e} at address {index * 4:#x}") from None
+    return decoded
+
+def predecode_rows(rows, words):
+    """
+    predecode() from disassembler-style rows (ProgramIR.rows()): lui/auipc get their upper
+    value shifted back into place, and rows without a mnemonic ('.word') are decoded from words.
+    """
+    decoded = []
+    for index, (row, word) in enumerate(zip(rows, words)):
+        mnemonic, rd, rs1, rs2, imm = row
+        if mnemonic is None:
+            try:
+                decoded.append(decode(word))
+            except IllegalInstruction as e:
+                raise SimulationError(f"{e} at address {index * 4:#x}") from None
+        elif mnemonic in U_TYPE:
+            decoded.append((mnemonic, rd, rs1, rs2, (imm << 12) & MASK))
+        else:
+            decoded.append(row)
+    return decoded
+
+# === Basic-block translation ===
+# Alternative to the per-instruction closures for loop-heavy programs. The image is split into
+# basic blocks at branch/jal targets and after every branch/jal/jalr. The first time a block
+# runs it is translated into Python source, with registers loaded into locals on entry and
+# written back on exit, and compiled into a function cached by start PC. Blocks return the
+# next Block object directly (chaining); only jalr needs a lookup by address.
+# max_cycles is checked between blocks, so a run may overshoot it by less than one block.
+
+class Block:
+    """A basic block: start pc, instruction count, compiled function (None until first executed)."""
+    __slots__ = ('start', 'size', 'fn', 'source')
+
+    def __init__(self, start, size=0):
+        self.start = start
+        self.size = size
+        self.fn = None
+        self.source = None
+
+def find_leaders(decoded):
+    """Indices that start a basic block: 0, every in-range branch/jal target, and every instruction after a control transfer."""
+    leaders = {0}
+    for index, (mnemonic, _, _, _, imm) in enumerate(decoded):
+        if mnemonic in B_TYPE or mnemonic in J_TYPE:
+            target = index + imm // 4
+            if 0 <= target < len(decoded):
+                leaders.add(target)
+        if mnemonic in B_TYPE or mnemonic in J_TYPE or mnemonic == 'jalr':
+            leaders.add(index + 1)
+    return leaders
+
+def _translate(decoded, start_index, leaders, idle_flags, ram_mask, block_at, on_store=None):
+    """
+    Generate the Python source for the block starting at start_index; sw also calls on_store if given.
+    Returns (source, size, refs) where refs maps the names the source uses to objects
+    (successor blocks, helpers); they are bound as default arguments for fast access.
+    """
+    body = []
+    loads = []          # registers read before being written in this block
+    defined = set()     # registers currently held in locals
+    dirty = []          # registers written, in first-write order
+    refs = {}
+
+    def src(n):
+        if n == 0:
+            return '0'
+        if n not in defined:
+            defined.add(n)
+            loads.append(n)
+        return f"x{n}"
+
+    def dst(n, expr):
+        body.append(f"    x{n} = {expr}")
+        defined.add(n)
+        if n not in dirty:
+            dirty.append(n)
+
+    def successor(pc):
+        name = f"B{pc:x}"
+        refs[name] = block_at(pc)
+        return name
+
+    terminator = None
+    index = start_index
+    while index < len(decoded):
+        mnemonic, rd, rs1, rs2, imm = decoded[index]
+        pc = index * 4
+        next_pc = pc + 4
+        index += 1
+        if mnemonic in B_TYPE:
+            a, b = src(rs1), src(rs2)
+            cond = {
+                'beq': f"{a} == {b}", 'bne': f"{a} != {b}",
+                'blt': f"({a} ^ 0x80000000) < ({b} ^ 0x80000000)",
+                'bge': f"({a} ^ 0x80000000) >= ({b} ^ 0x80000000)",
+                'bltu': f"{a} < {b}", 'bgeu': f"{a} >= {b}",
+            }[mnemonic]
+            target = (pc + imm) & MASK
+            if target == pc:
+                refs['_Halt'] = _Halt
+                terminator = [f"    if {cond}:", "        raise _Halt()", f"    return {successor(next_pc)}"]
+            else:
+                terminator = [f"    if {cond}:", f"        return {successor(target)}", f"    return {successor(next_pc)}"]
+            break
+        if mnemonic == 'jal':
+            if rd:
+                dst(rd, f"{next_pc:#x}")
+            target = (pc + imm) & MASK
+            if target == pc or idle_flags[index - 1]:
+                refs['_Halt'] = _Halt
+                terminator = ["    raise _Halt()"]
+            else:
+                terminator = [f"    return {successor(target)}"]
+            break
+        if mnemonic == 'jalr':
+            body.append(f"    _t = ({src(rs1)} + {imm}) & 0xFFFFFFFE")
+            if rd:
+                dst(rd, f"{next_pc:#x}")
+            refs['block_at'] = block_at
+            terminator = ["    return block_at(_t)"]
+            break
+
+        if mnemonic == 'sw' and on_store is not None:
+            # Registers stay in locals until the block ends, so the hook is handed the
+            # address and value rather than reading sim.regs.
+            refs['on_store'] = on_store
+            body.append(f"    _a = ({src(rs1)} + {imm}) & 0xFFFFFFFF")
+            body.append(f"    ram[(_a >> 2) & {ram_mask:#x}] = {src(rs2)}")
+            body.append(f"    on_store(_a, {src(rs2)})")
+        elif mnemonic == 'sw':
+            body.append(f"    ram[(({src(rs1)} + {imm}) >> 2) & {ram_mask:#x}] = {src(rs2)}")
+        elif rd != 0:
+            a = src(rs1)
+            uimm = imm & MASK
+            if mnemonic in R_TYPE:
+                b = src(rs2)
+                if mnemonic in ('div', 'rem'):
+                    refs['_div'], refs['_rem'] = _div, _rem
+                expr = {
+                    'add': f"({a} + {b}) & 0xFFFFFFFF", 'sub': f"({a} - {b}) & 0xFFFFFFFF",
+                    'sll': f"({a} << ({b} & 31)) & 0xFFFFFFFF",
+                    'slt': f"1 if ({a} ^ 0x80000000) < ({b} ^ 0x80000000) else 0",
+                    'sltu': f"1 if {a} < {b} else 0", 'xor': f"{a} ^ {b}",
+                    'srl': f"{a} >> ({b} & 31)",
+                    'sra': f"((({a} ^ 0x80000000) - 0x80000000) >> ({b} & 31)) & 0xFFFFFFFF",
+                    'or': f"{a} | {b}", 'and': f"{a} & {b}",
+                    'mul': f"({a} * {b}) & 0xFFFFFFFF", 'div': f"_div({a}, {b})", 'rem': f"_rem({a}, {b})",
+                }[mnemonic]
+            else:
+                expr = {
+                    'addi': f"({a} + {uimm:#x}) & 0xFFFFFFFF", 'andi': f"{a} & {uimm:#x}",
+                    'ori': f"{a} | {uimm:#x}", 'xori': f"{a} ^ {uimm:#x}",
+                    'slti': f"1 if ({a} ^ 0x80000000) < {uimm ^ 0x80000000:#x} else 0",
+                    'sltiu': f"1 if {a} < {uimm:#x} else 0",
+                    'slli': f"({a} << {imm}) & 0xFFFFFFFF", 'srli': f"{a} >> {imm}",
+                    'srai': f"((({a} ^ 0x80000000) - 0x80000000) >> {imm}) & 0xFFFFFFFF",
+                    'lw': f"ram[(({a} + {imm}) >> 2) & {ram_mask:#x}]",
+                    'lui': f"{uimm:#x}", 'auipc': f"{(pc + imm) & MASK:#x}",
+                }[mnemonic]
+            dst(rd, expr)
+        if index in leaders:
+            terminator = [f"    return {successor(index * 4)}"]
+            break
+    else:
+        terminator = [f"    return {successor(index * 4)}"]
+
+    size = index - start_index
+    names = ", ".join(["r=r", "ram=ram"] + [f"{name}={name}" for name in refs])
+    lines = [f"def block({names}):"]
+    lines += [f"    x{n} = r[{n}]" for n in loads]
+    lines += body
+    lines += [f"    r[{n}] = x{n}" for n in dirty]
+    lines += terminator
+    return "\n".join(lines) + "\n", size, refs
+
+# === Simulator ===
+
+def _ram_bits(kwargs):
+    """RAM word-address bits for the Simulator constructor arguments (None: the default)."""
+    memory = kwargs.get('memory')
+    return memory.word_bits if memory is not None else kwargs.get('ram_addr_bits')
+
+class Simulator:
+    """
+    Golden-model CPU state plus the predecoded program.
+      regs - 32 unsigned register values (x0 is never written)
+      ram  - Data Memory words, indexed by address[13:2]
+      pc, cycles (instructions retired so far), halt_reason
+    ram_image (e.g. Program.ram_words()) is copied into ram from word 0 at start and on reset().
+    decoded may pass in predecode()-style tuples that are already known (see from_ir()).
+    memory (e.g. a paged_memory.PagedMemory) replaces the RAM list; ram_addr_bits is then its word_bits.
+    """
+    def __init__(self, words, ram_addr_bits=RAM_ADDR_BITS, ram_image=None, decoded=None, memory=None):
+        self.words = list(words)
+        self.decoded = predecode(self.words) if decoded is None else decoded
+        if memory is not None:
+            ram_addr_bits = memory.word_bits
+        self.ram_mask = (1 << ram_addr_bits) - 1
+        self.regs = [0] * 32
+        self.ram = [0] * (1 << ram_addr_bits) if memory is None else memory
+        self.ram_image = list(ram_image or [])[:len(self.ram)]
+        self.ram[:len(self.ram_image)] = self.ram_image
+        self.pc = 0
+        self.cycles = 0
+        self.halt_reason = None
+        self.on_store = None
+        self.idle_flags = [_is_idle_loop(self.decoded, index) for index in range(len(self.decoded))]
+        self.code = [_compile(fields, index * 4, self.regs, self.ram, self.ram_mask, self.idle_flags[index])
+                     for index, fields in enumerate(self.decoded)]
+        # Basic-block translation state (run_blocks); blocks are translated lazily.
+        self.leaders = find_leaders(self.decoded)
+        self.blocks = {}
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        """Load a .asm source (assembled in-process, with its .data image) or a v2.0 raw .hex image."""
+        if path.lower().endswith('.asm'):
+            program = assemble_file(path)
+            kwargs.setdefault('ram_image', program.ram_words(_ram_bits(kwargs)))
+            return cls(program.words, **kwargs)
+        return cls(read_hex_file(path), **kwargs)
+
+    @classmethod
+    def from_ir(cls, ir, **kwargs):
+        """Build from an Assembler.ProgramIR: operands come from its columns, not from decoding words."""
+        words = ir.encode()
+        kwargs.setdefault('ram_image', ir.ram_words(_ram_bits(kwargs)))
+        return cls(words, decoded=predecode_rows(ir.rows(), words), **kwargs)
+
+    def reset(self):
+        self.regs[:] = [0] * 32
+        if type(self.ram) is list:
+            self.ram[:] = [0] * len(self.ram)
+        else:
+            self.ram.clear()
+        self.ram[:len(self.ram_image)] = self.ram_image
+        self.pc = 0
+        self.cycles = 0
+        self.halt_reason = None
+
+    def read_word(self, address):
+        return self.ram[(address >> 2) & self.ram_mask]
+
+    def write_word(self, address, value):
+        self.ram[(address >> 2) & self.ram_mask] = value & MASK
+
+    def set_breakpoint(self, address):
+        """Make run() stop with reason 'breakpoint' when PC reaches address (before executing it)."""
+        index = address >> 2
+        if not 0 <= index < len(self.code):
+            raise SimulationError(f"Breakpoint address {address:#x} is outside the program")
+        self.code[index] = _breakpoint
+
+    def clear_breakpoint(self, address):
+        index = address >> 2
+        self.code[index] = _compile(self.decoded[index], index * 4, self.regs, self.ram,
+                                    self.ram_mask, self.idle_flags[index], self.on_store)
+
+    def set_store_hook(self, on_store):
+        """
+        Call on_store(address, value) after every sw, e.g. to drive memory-mapped devices
+        (display.Display). Only the sw instructions are recompiled, so everything else runs at
+        full speed; None removes the hook. Translated blocks are discarded and rebuilt.
+        """
+        self.on_store = on_store
+        for index, fields in enumerate(self.decoded):
+            if fields[0] == 'sw' and self.code[index] is not _breakpoint:
+                self.code[index] = _compile(fields, index * 4, self.regs, self.ram, self.ram_mask,
+                                            self.idle_flags[index], on_store)
+        self.blocks = {}
+
+    def step(self):
+        """Execute one instruction. Returns run()'s reason; 'max_cycles' means still running."""
+        return self.run(1)
+
+    def run(self, max_cycles=DEFAULT_MAX_CYCLES):
+        """
+        Run until halt or max_cycles more instructions. Returns the halt reason:
+        'halt' (idle loop reached), 'end' (PC ran past the program), 'breakpoint'
+        (see set_breakpoint) or 'max_cycles'.
+        """
+        code = self.code
+        pc = self.pc
+        executed = 0
+        try:
+            for executed in range(max_cycles):
+                pc = code[pc >> 2]()
+            executed = max_cycles
+            reason = 'max_cycles'
+        except _Halt:
+            # The halting instruction itself retired; PC stays on it.
+            executed += 1
+            reason = 'halt'
+        except _Breakpoint:
+            reason = 'breakpoint'
+        except IndexError:
+            reason = 'end'
+        self.pc = pc
+        self.cycles += executed
+        self.halt_reason = None if reason == 'max_cycles' else reason
+        return reason
+
+    def run_traced(self, trace, max_cycles=DEFAULT_MAX_CYCLES):
+        """
+        Same contract as run(), additionally passing every retired instruction to
+        trace.append(pc, word, rd, flags, value, address) (see exectrace.TraceWriter):
+        flags has TRACE_WROTE_RD / TRACE_LOAD / TRACE_STORE; value is rd's new value, or the
+        stored word for sw; address is the lw/sw byte address.
+        """
+        code, regs = self.code, self.regs
+        # Per instruction: (word, rd if it is written else 0, memory flag, rs1, rs2, imm).
+        info = [(word, rd if rd and m not in B_TYPE and m not in S_TYPE else 0,
+                 TRACE_LOAD if m == 'lw' else TRACE_STORE if m == 'sw' else 0, rs1, rs2, imm)
+                for word, (m, rd, rs1, rs2, imm) in zip(self.words, self.decoded)]
+        append = trace.append
+        pc = self.pc
+        executed = 0
+        reason = 'max_cycles'
+        while executed < max_cycles:
+            index = pc >> 2
+            if index >= len(code):
+                reason = 'end'
+                break
+            word, rd, flags, rs1, rs2, imm = info[index]
+            address = value = 0
+            if flags:
+                address = (regs[rs1] + imm) & MASK
+                if flags == TRACE_STORE:
+                    value = regs[rs2]
+            try:
+                next_pc = code[index]()
+            except _Halt:
+                next_pc = None
+            except _Breakpoint:
+                reason = 'breakpoint'
+                break
+            if rd:
+                flags |= TRACE_WROTE_RD
+                value = regs[rd]
+            append(pc, word, rd, flags, value, address)
+            executed += 1
+            if next_pc is None:
+                reason = 'halt'
+                break
+            pc = next_pc
+        self.pc = pc
+        self.cycles += executed
+        self.halt_reason = None if reason == 'max_cycles' else reason
+        return reason
+
+    def block_at(self, pc):
+        """Return the (possibly not yet translated) Block starting at pc; size None past the program."""
+        index = (pc & MASK) >> 2
+        block = self.blocks.get(index)
+        if block is None:
+            block = Block(index * 4, 0 if index < len(self.decoded) else None)
+            self.blocks[index] = block
+        return block
+
+    def translate(self, block):
+        """Compile block's source once and cache the function on it."""
+        source, block.size, refs = _translate(self.decoded, block.start >> 2, self.leaders,
+                                              self.idle_flags, self.ram_mask, self.block_at, self.on_store)
+        namespace = dict(refs, r=self.regs, ram=self.ram)
+        exec(compile(source, f"<block {block.start:#x}>", 'exec'), namespace)
+        block.source = source
+        block.fn = namespace['block']
+        return block.fn
+
+    def run_blocks(self, max_cycles=DEFAULT_MAX_CYCLES):
+        """
+        Same contract as run(), executing translated basic blocks. State (regs, ram, pc,
+        cycles) is shared with run(), so the two modes can be mixed. Breakpoints are
+        not seen by translated blocks.
+        """
+        block = self.block_at(self.pc)
+        executed = 0
+        reason = 'max_cycles'
+        try:
+            while executed < max_cycles:
+                fn = block.fn
+                if fn is None:
+                    if block.size is None:
+                        reason = 'end'
+                        break
+                    fn = self.translate(block)
+                executed += block.size
+                block = fn()
+            self.pc = block.start
+        except _Halt:
+            # The halting branch/jal is the block's last instruction and has retired.
+            reason = 'halt'
+            self.pc = block.start + 4 * (block.size - 1)
+        self.cycles += executed
+        self.halt_reason = None if reason == 'max_cycles' else reason
+        return reason
+
+    def signed_reg(self, index):
+        return _signed(self.regs[index])
+
+def format_registers(regs):
+    """Four registers per line as 'x10 = 0x00000078 (120)'."""
+    lines = []
+    for row in range(0, 32, 4):
+        lines.append("  ".join(f"x{i:<2}= {regs[i]:08X} ({_signed(regs[i]):>11})" for i in range(row, row + 4)))
+    return "\n".join(lines)
+
+def compare_modes(sim, max_cycles):
+    """Run the same program with run() and run_blocks() from reset; print speed and check final state."""
+    results = {}
+    for name, runner in (("interpreter", sim.run), ("blocks", sim.run_blocks)):
+        sim.reset()
+        start = time.perf_counter()
+        reason = runner(max_cycles)
+        elapsed = time.perf_counter() - start
+        results[name] = (reason, sim.cycles, list(sim.regs), list(sim.ram))
+        rate = sim.cycles / elapsed / 1e6 if elapsed else 0
+        print(f"  {name:<12} {reason:<10} {sim.cycles:>10} instr  {elapsed:8.3f} s  {rate:6.2f} M instr/s")
+    interp, blocks = results["interpreter"], results["blocks"]
+    if interp[0] == 'max_cycles' or blocks[0] == 'max_cycles':
+        print("  (state not compared: max_cycles stops at block granularity)")
+    elif interp != blocks:
+        print("  MISMATCH between interpreter and block translation")
+        sys.exit(1)
+    else:
+        print("  final registers and memory match")
+
+def main():
+    parser = argparse.ArgumentParser(description="Instruction-set simulator for the single-cycle RISC-V core")
+    parser.add_argument("program", help="Program to run: .asm source or v2.0 raw .hex image")
+    parser.add_argument("--data", metavar="IMAGE",
+                        help="Data Memory image (v2.0 raw .hex, e.g. from the assembler's --data-output)")
+    parser.add_argument("--max-cycles", "-n", type=int, default=DEFAULT_MAX_CYCLES, help="Instruction limit")
+    parser.add_argument("--blocks", action="store_true", help="Run with basic-block translation")
+    parser.add_argument("--compare", action="store_true",
+                        help="Benchmark the interpreter against block translation and check they agree")
+    parser.add_argument("--mem", action="append", default=[], metavar="START:END",
+                        help="Dump Data Memory byte range, e.g. 0x100:0x120 (repeatable)")
+    args = parser.parse_args()
+
+    try:
+        kwargs = {'ram_image': read_hex_file(os.path.expanduser(args.data))} if args.data else {}
+        sim = Simulator.from_file(os.path.expanduser(args.program), **kwargs)
+    except (AssemblyError, SimulationError, ValueError, OSError) as e:
+        print(f"Cannot load '{args.program}': {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.compare:
+        compare_modes(sim, args.max_cycles)
+        return
+
+    start = time.perf_counter()
+    reason = sim.run_blocks(args.max_cycles) if args.blocks else sim.run(args.max_cycles)
+    elapsed = time.perf_counter() - start
+
+    print(f"Stopped ({reason}) at pc={sim.pc:#x} after {sim.cycles} instructions, "
+          f"{elapsed:.3f} s ({sim.cycles / elapsed / 1e6 if elapsed else 0:.2f} M instr/s)")
+    print(format_registers(sim.regs))
+    for spec in args.mem:
+        lo, _, hi = spec.partition(':')
+        lo = int(lo, 0)
+        hi = int(hi, 0) if hi else lo + 4
+        for address in range(lo & ~3, hi, 4):
+            print(f"  mem[{address:#06x}] = {sim.read_word(address):08X}")
+
+if __name__ == "__main__":
+    main()
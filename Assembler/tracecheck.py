@@ -0,0 +1,594 @@
+# Differential checker: compares a simulator execution trace (exectrace.py) against a signal
+# dump of the real design, cycle by cycle, and reports the first divergence with the PC, the
+# disassembled instruction and the register or memory value that differs.
+#
+# Dumps accepted:
+#   .vcd    Verilog value-change dump (e.g. $dumpfile/$dumpvars on EDA Playground)
+#   .csv    Digital's data-graph CSV export, one column per signal
+#   .trace  another exectrace.py trace
+# A cycle is sampled just before each rising edge of clk while rst is low. Signals are found
+# by name (exact, then by last path component, then case-insensitively); the defaults are the
+# net names in RISCV_Top.dig and can be overridden with --signal key=name:
+#   clk rst pc instr rd reg_write(RegWrite) reg_data(WriteData) mem_write(MemWrite)
+#   mem_addr(Result) mem_data(RD2)
+# Only clk and pc are required; checks for missing signals are skipped.
+#
+# Large dumps are split into byte ranges of --segment-mb and checked on a process pool in
+# two passes, both reading through mmap or bounded chunks so memory stays constant:
+#   1. scan   - per segment, count the sampled cycles and (VCD) the last value of every
+#               signal, mostly with bytes.find/count; stitching these gives each segment
+#               its first cycle number and the signal values it starts from
+#   2. check  - parse each segment and compare it against the reference from that cycle
+# The earliest divergence over all segments is reported. With --jobs 1 (the default on a
+# single-CPU machine) the dump is read as one stream instead.
+# Usage:
+#     python tracecheck.py prog.trace dump.vcd [--signal pc=tb.dut.pc] [--jobs 4]
+#     python tracecheck.py prog.asm digital.csv           # reference simulated into a temp trace
+
+import argparse
+import csv
+import mmap
+import os
+import sys
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import chain
+from operator import itemgetter
+
+from Assembler import RAM_ADDR_BITS, AssemblyError, read_hex_file
+from exectrace import (LOAD, RECORD_SIZE, STORE, WROTE_RD, TraceError, TraceReader,
+                       format_record, record_trace)
+from simulator import DEFAULT_MAX_CYCLES, MASK, SimulationError, Simulator
+
+DEFAULT_SIGNALS = {
+    'clk': 'clk', 'rst': 'rst', 'pc': 'pc', 'instr': 'instr', 'rd': 'rd',
+    'reg_write': 'RegWrite', 'reg_data': 'WriteData',
+    'mem_write': 'MemWrite', 'mem_addr': 'Result', 'mem_data': 'RD2',
+}
+REQUIRED_SIGNALS = ('clk', 'pc')
+# A dumped cycle is a tuple in this order; None marks a signal that is missing, x or z
+# (a missing rd is taken from instr[11:7]).
+CYCLE_FIELDS = ('pc', 'instr', 'rd', 'reg_write', 'reg_data', 'mem_write', 'mem_addr', 'mem_data')
+DEFAULT_SEGMENT_MB = 64
+READ_CHUNK_BYTES = 1 << 20
+SCALAR_VALUES = (b'0', b'1', b'x', b'X', b'z', b'Z')
+
+class DumpError(ValueError):
+    """A dump cannot be read or lacks a required signal."""
+
+# === Signal lookup ===
+
+def resolve_signals(names, requested):
+    """
+    Map each signal key to an index into names (full hierarchical names, '.'-separated).
+    requested holds user overrides; those and REQUIRED_SIGNALS must resolve, others may be None.
+    """
+    leaves = [n.rsplit('.', 1)[-1] for n in names]
+    resolved = {}
+    for key, default in DEFAULT_SIGNALS.items():
+        wanted = requested.get(key, default)
+        matches = [i for i, n in enumerate(names) if n == wanted]
+        if not matches:
+            matches = [i for i, n in enumerate(names) if n.endswith('.' + wanted) or leaves[i] == wanted]
+        if not matches:
+            matches = [i for i, leaf in enumerate(leaves) if leaf.lower() == wanted.lower()]
+        if matches:
+            # Prefer the shallowest scope (the top-level net over same-named submodule ports).
+            depth = min(names[i].count('.') for i in matches)
+            matches = [i for i in matches if names[i].count('.') == depth]
+            if len({names[i] for i in matches}) > 1:
+                raise DumpError(f"signal '{wanted}' for {key} is ambiguous: "
+                                f"{', '.join(sorted({names[i] for i in matches}))} (use --signal {key}=...)")
+            resolved[key] = matches[0]
+        elif key in requested or key in REQUIRED_SIGNALS:
+            raise DumpError(f"signal '{wanted}' for {key} is not in the dump (use --signal {key}=...)")
+        else:
+            resolved[key] = None
+    return resolved
+
+def _sampler(slots, width):
+    """Function building a CYCLE_FIELDS tuple from a list of width values plus a trailing None."""
+    return itemgetter(*[width if slots[key] is None else slots[key] for key in CYCLE_FIELDS])
+
+# === Chunked reading ===
+
+def _ranged_lines(path, start, end):
+    """Lists of lines (without newlines) in bytes [start, end) of a file, a chunk at a time."""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start
+        carry = b''
+        while remaining > 0:
+            data = f.read(min(READ_CHUNK_BYTES, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            data = carry + data
+            cut = data.rfind(b'\n') + 1 if remaining > 0 else len(data)
+            carry = data[cut:]
+            yield data[:cut].decode('ascii', 'replace').splitlines()
+        if carry:
+            yield carry.decode('ascii', 'replace').splitlines()
+
+def _count(mm, pattern, start, end):
+    """Occurrences of pattern lying inside [start, end) of a mapped file, counted a window at a time."""
+    count = 0
+    for base in range(start, end, READ_CHUNK_BYTES):
+        count += mm[base:min(base + READ_CHUNK_BYTES + len(pattern) - 1, end)].count(pattern)
+    return count
+
+def _mapped(path):
+    with open(path, 'rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+# === VCD dumps ===
+
+def _vcd_value(text):
+    """Value of one VCD change ('1', 'x', 'b1010', 'r2.5'); None for x/z."""
+    head = text[:1]
+    try:
+        if head in ('b', 'B'):
+            return int(text[1:], 2)
+        if head in ('r', 'R'):
+            return int(float(text[1:]))
+        return int(head) if head in ('0', '1') else None
+    except ValueError:
+        return None
+
+class VcdDump:
+    """
+    Header of a VCD file. Segments start at a timestamp in which clk rises; the state carried
+    between segments is the list of signal values (indexed like names, plus a trailing None).
+    """
+    __slots__ = ('path', 'names', 'widths', 'codes', 'slots', 'tracked', 'body', 'size')
+
+    def __init__(self, path, requested):
+        self.path = path
+        scope, self.names, self.widths, self.codes = [], [], [], []
+        self.body = None
+        with open(path, 'rb') as f:
+            for line in f:
+                tokens = line.decode('ascii', 'replace').split()
+                if not tokens:
+                    continue
+                if tokens[0] == '$scope':
+                    scope.append(tokens[2])
+                elif tokens[0] == '$upscope':
+                    scope.pop()
+                elif tokens[0] == '$var':
+                    # $var wire 32 ! pc [31:0] $end
+                    self.names.append('.'.join(scope + [tokens[4]]))
+                    self.widths.append(int(tokens[2]))
+                    self.codes.append(tokens[3])
+                elif tokens[0] == '$enddefinitions':
+                    self.body = f.tell()
+                    break
+            self.size = os.fstat(f.fileno()).st_size
+        if self.body is None:
+            raise DumpError(f"'{path}' has no $enddefinitions; not a VCD file?")
+        self.slots = resolve_signals(self.names, requested)
+        for key in ('clk', 'rst'):
+            if self.slots[key] is not None and self.widths[self.slots[key]] != 1:
+                raise DumpError(f"{key} must be a 1-bit signal")
+        self.tracked = {}                        # id code -> indices into the values list
+        for index in sorted(set(self.slots.values()) - {None}):
+            self.tracked.setdefault(self.codes[index], []).append(index)
+
+    def _code(self, key):
+        index = self.slots[key]
+        return None if index is None else self.codes[index]
+
+    def initial_state(self):
+        return [None] * (len(self.names) + 1)
+
+    def segments(self, segment_bytes):
+        """Byte offsets body, ..., size; a single range when segment_bytes is None."""
+        offsets = [self.body]
+        if segment_bytes:
+            rise = b'\n1' + self._code('clk').encode() + b'\n'
+            with _mapped(self.path) as mm:
+                position = self.body + segment_bytes
+                while position < self.size:
+                    hit = mm.find(rise, position)
+                    if hit < 0:
+                        break
+                    stamp = mm.rfind(b'\n#', offsets[-1], hit)
+                    if stamp >= offsets[-1]:
+                        offsets.append(stamp + 1)
+                    position = hit + 1 + segment_bytes
+        offsets.append(self.size)
+        return offsets
+
+    def scan(self, start, end):
+        """
+        Pass 1 over bytes [start, end): (last change text per tracked code,
+        [(new rst text, or None for the inherited value, clk rises while it holds)]).
+        Counting '1' changes of clk as rises assumes they alternate with '0' (pass 2 checks).
+        """
+        rise = b'\n1' + self._code('clk').encode() + b'\n'
+        rst_code = self._code('rst')
+        with _mapped(self.path) as mm:
+            last = {}
+            for code, indices in self.tracked.items():
+                encoded = code.encode()
+                if self.widths[indices[0]] == 1:
+                    position, value = max((mm.rfind(b'\n' + v + encoded + b'\n', start - 1, end), v)
+                                          for v in SCALAR_VALUES)
+                    if position >= 0:
+                        last[code] = value.decode()
+                else:
+                    position = mm.rfind(b' ' + encoded + b'\n', start, end)
+                    if position >= 0:
+                        line_start = mm.rfind(b'\n', start - 1, position) + 1
+                        last[code] = mm[line_start:position].decode('ascii', 'replace')
+            # rst changes split the range; each takes effect after its own timestamp.
+            changes = []
+            if rst_code is not None:
+                for v in SCALAR_VALUES:
+                    pattern = b'\n' + v + rst_code.encode() + b'\n'
+                    hit = mm.find(pattern, start - 1, end)
+                    while hit >= 0:
+                        stamp = mm.find(b'\n#', hit + 1, end)
+                        changes.append((end if stamp < 0 else stamp + 1, v.decode()))
+                        hit = mm.find(pattern, hit + 1, end)
+            ranges, low, rst = [], start, None
+            for boundary, value in sorted(changes) + [(end, None)]:
+                ranges.append((rst, _count(mm, rise, low - 1, boundary)))
+                low, rst = boundary, value
+        return last, ranges
+
+    def advance(self, state, summary):
+        """(state after a segment, cycles it samples) from its starting state and scan() summary."""
+        last, ranges = summary
+        rst_index = self.slots['rst']
+        rst = 0 if rst_index is None else state[rst_index]
+        cycles = 0
+        for value, rises in ranges:
+            if value is not None:
+                rst = _vcd_value(value)
+            if rst == 0:
+                cycles += rises
+        state = list(state)
+        for code, text in last.items():
+            for index in self.tracked[code]:
+                state[index] = _vcd_value(text)
+        return state, cycles
+
+    def cycles(self, start, end, state):
+        """Pass 2: one CYCLE_FIELDS tuple per sampled cycle in bytes [start, end), from state."""
+        sample = _sampler(self.slots, len(self.names))
+        tracked = self.tracked
+        clk, rst = self.slots['clk'], self.slots['rst']
+        clk_code = self._code('clk')
+        values = list(state)
+        before = None                            # values at the start of the current timestamp
+        for block in _ranged_lines(self.path, start, end):
+            for line in block:
+                head = line[:1]
+                if head == '#':
+                    before = None
+                    continue
+                if head == 'b' or head == 'r':
+                    text, code = line[1:].split()
+                    indices = tracked.get(code)
+                    if indices is None:
+                        continue
+                    try:
+                        value = int(text, 2) if head == 'b' else int(float(text))
+                    except ValueError:
+                        value = None             # x/z bits
+                elif head in ('0', '1', 'x', 'X', 'z', 'Z'):
+                    code = line[1:].rstrip()
+                    indices = tracked.get(code)
+                    if indices is None:
+                        continue
+                    value = 1 if head == '1' else 0 if head == '0' else None
+                else:
+                    continue                     # $dumpvars, $end, comments
+                if before is None:
+                    before = values[:]
+                if code == clk_code and value == 1 and values[clk] == 0 and (rst is None or before[rst] == 0):
+                    yield sample(before)
+                for index in indices:
+                    values[index] = value
+
+# === CSV dumps ===
+
+def _csv_value(text):
+    """Decimal, or 0x/0b-prefixed; anything else (Z, X, empty) is None."""
+    text = text.strip()
+    try:
+        return int(text)
+    except ValueError:
+        try:
+            return int(text, 0)
+        except ValueError:
+            return None
+
+class CsvDump:
+    """
+    Header of a Digital CSV export. Every row holds all signals, so no state is carried
+    between segments; each segment re-reads the row before it to see the clock edge.
+    """
+    __slots__ = ('path', 'slots', 'width', 'body', 'size')
+
+    def __init__(self, path, requested):
+        self.path = path
+        with open(path, 'rb') as f:
+            header = f.readline().decode('utf-8', 'replace')
+            self.body = f.tell()
+            self.size = os.fstat(f.fileno()).st_size
+        names = next(csv.reader([header]), None)
+        if not names:
+            raise DumpError(f"'{path}' is empty")
+        self.slots = resolve_signals([name.strip() for name in names], requested)
+        self.width = len(names)
+
+    def initial_state(self):
+        return None
+
+    def segments(self, segment_bytes):
+        """Line-aligned byte offsets body, ..., size; a single range when segment_bytes is None."""
+        offsets = [self.body]
+        if segment_bytes:
+            with _mapped(self.path) as mm:
+                position = self.body + segment_bytes
+                while position < self.size:
+                    newline = mm.find(b'\n', position)
+                    if newline < 0 or newline + 1 >= self.size:
+                        break
+                    offsets.append(newline + 1)
+                    position = newline + 1 + segment_bytes
+        offsets.append(self.size)
+        return offsets
+
+    def _blocks(self, start, end):
+        """_ranged_lines() for [start, end), starting one row early so the first edge is seen."""
+        if start > self.body:
+            with _mapped(self.path) as mm:
+                start = mm.rfind(b'\n', self.body - 1, start - 1) + 1
+        return _ranged_lines(self.path, start, end)
+
+    def scan(self, start, end):
+        """Pass 1: sampled cycles in [start, end), reading only the clk and rst columns."""
+        clk, rst = self.slots['clk'], self.slots['rst']
+        cycles = 0
+        previous = None
+        for block in self._blocks(start, end):
+            for line in block:
+                fields = line.split(',')
+                if len(fields) < self.width:
+                    continue
+                edge = (_csv_value(fields[clk]), 0 if rst is None else _csv_value(fields[rst]))
+                if previous is not None and edge[0] == 1 and previous == (0, 0):
+                    cycles += 1
+                previous = edge
+        return cycles
+
+    def advance(self, state, summary):
+        return None, summary
+
+    def cycles(self, start, end, state):
+        sample = _sampler(self.slots, self.width)
+        clk, rst = self.slots['clk'], self.slots['rst']
+        pad = [None]
+        previous = None
+        for row in csv.reader(chain.from_iterable(self._blocks(start, end))):
+            if not row:
+                continue
+            values = [_csv_value(v) for v in row] + pad
+            if (previous is not None and values[clk] == 1 and previous[clk] == 0
+                    and (rst is None or previous[rst] == 0)):
+                yield sample(previous)
+            previous = values
+
+# === Trace dumps ===
+
+class TraceDump:
+    """Another exectrace.py trace; segments are record ranges."""
+    __slots__ = ('path', 'count')
+
+    def __init__(self, path, requested):
+        self.path = path
+        with TraceReader(path) as reader:
+            self.count = len(reader)
+
+    def initial_state(self):
+        return None
+
+    def segments(self, segment_bytes):
+        if not segment_bytes:
+            return [0, self.count]
+        return list(range(0, self.count, max(1, segment_bytes // RECORD_SIZE))) + [self.count]
+
+    def scan(self, start, end):
+        return end - start
+
+    def advance(self, state, summary):
+        return None, summary
+
+    def cycles(self, start, end, state):
+        with TraceReader(self.path) as reader:
+            for r in reader.records(start, end):
+                wrote, stored = r.flags & WROTE_RD, r.flags & STORE
+                yield (r.pc, r.word, r.rd, 1 if wrote else 0, r.value if wrote else None,
+                       1 if stored else 0, r.address if r.flags & (LOAD | STORE) else None,
+                       r.value if stored else None)
+
+DUMP_TYPES = {'.vcd': VcdDump, '.csv': CsvDump, '.trace': TraceDump}
+
+def open_dump(path, requested=None):
+    dump_type = DUMP_TYPES.get(os.path.splitext(path)[1].lower())
+    if dump_type is None:
+        raise DumpError(f"'{path}': unknown dump type (expected {', '.join(DUMP_TYPES)})")
+    return dump_type(path, requested or {})
+
+# === Checking ===
+
+_readers = {}                                    # per-process TraceReader cache
+
+def _reference(path):
+    reader = _readers.get(path)
+    if reader is None:
+        reader = _readers[path] = TraceReader(path)
+    return reader
+
+def _hex(value):
+    return "x" if value is None else f"{value & MASK:08x}"
+
+def compare_cycle(ref, dut, ram_mask):
+    """First (signal, reference, dump) difference between a TraceRecord and a dumped cycle, or None."""
+    pc, instr, rd, reg_write, reg_data, mem_write, mem_addr, mem_data = dut
+    if pc != ref.pc:
+        return 'pc', f"{ref.pc:08x}", _hex(pc)
+    if instr is not None and instr != ref.word:
+        return 'instr', f"{ref.word:08x}", _hex(instr)
+    if reg_write is not None:
+        if rd is None and instr is not None:
+            rd = (instr >> 7) & 0x1F
+        dut_writes = bool(reg_write) and rd != 0
+        if dut_writes != bool(ref.flags & WROTE_RD):
+            return ('register write', f"x{ref.rd} <- {ref.value:08x}" if ref.flags & WROTE_RD else "none",
+                    f"x{rd} <- {_hex(reg_data)}" if dut_writes else "none")
+        if dut_writes and reg_data is not None and reg_data & MASK != ref.value:
+            return f"x{ref.rd}", f"{ref.value:08x}", f"{reg_data & MASK:08x}"
+    if mem_write is not None:
+        stored = bool(ref.flags & STORE)
+        if bool(mem_write) != stored:
+            return ('memory write', f"[{ref.address:#x}] <- {ref.value:08x}" if stored else "none",
+                    f"[{_hex(mem_addr)}] <- {_hex(mem_data)}" if mem_write else "none")
+        if stored:
+            if mem_addr is not None and (mem_addr >> 2) & ram_mask != (ref.address >> 2) & ram_mask:
+                return 'memory address', f"{ref.address:#x}", _hex(mem_addr)
+            if mem_data is not None and mem_data & MASK != ref.value:
+                return f"mem[{ref.address:#x}]", f"{ref.value:08x}", f"{mem_data & MASK:08x}"
+    return None
+
+def scan_segment(dump, start, end):
+    """Worker for pass 1."""
+    return dump.scan(start, end)
+
+def check_segment(reference_path, dump, start, end, state, first_cycle, ram_mask):
+    """
+    Worker for pass 2: compare the dump's cycles in [start, end) against the reference from
+    first_cycle on. Returns (divergence, cycles compared) with divergence None or
+    (cycle, signal, reference, dump); stops at the end of the reference.
+    """
+    reader = _reference(reference_path)
+    compared = 0
+    for dut, ref in zip(dump.cycles(start, end, state), reader.records(first_cycle)):
+        difference = compare_cycle(ref, dut, ram_mask)
+        if difference is not None:
+            return (ref.cycle,) + difference, compared
+        compared += 1
+    return None, compared
+
+def check(reference_path, dump, jobs=None, segment_mb=DEFAULT_SEGMENT_MB, ram_addr_bits=RAM_ADDR_BITS):
+    """
+    Compare a dump (VcdDump / CsvDump / TraceDump) against a reference trace file.
+    Returns (divergence or None, cycles compared, reference length).
+    """
+    ram_mask = (1 << ram_addr_bits) - 1
+    total = len(_reference(reference_path))
+    if jobs == 1 or (jobs is None and (os.cpu_count() or 1) == 1):
+        start, end = dump.segments(None)
+        divergence, compared = check_segment(reference_path, dump, start, end,
+                                             dump.initial_state(), 0, ram_mask)
+        return divergence, compared, total
+
+    bounds = dump.segments(segment_mb << 20)
+    ranges = list(zip(bounds, bounds[1:]))
+    limit = 2 * (jobs or os.cpu_count() or 1)
+    results = []                                 # (divergence, compared, first cycle, cycles expected)
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        # The last segment's summary would only feed a segment after it.
+        summaries = list(pool.map(scan_segment, [dump] * (len(ranges) - 1),
+                                  *zip(*ranges[:-1]))) if len(ranges) > 1 else []
+        pending = {}
+        state, first_cycle = dump.initial_state(), 0
+        for index, (start, end) in enumerate(ranges):
+            if first_cycle >= total or any(d is not None and d[0] < first_cycle for d, *_ in results):
+                break
+            next_state, cycles = (dump.advance(state, summaries[index]) if index < len(summaries)
+                                  else (state, None))
+            future = pool.submit(check_segment, reference_path, dump, start, end, state, first_cycle, ram_mask)
+            pending[future] = (first_cycle, cycles)
+            if len(pending) >= limit:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                results.extend(f.result() + pending.pop(f) for f in done)
+            state = next_state
+            first_cycle += cycles or 0
+        results.extend(f.result() + expected for f, expected in pending.items())
+
+    for divergence, compared, first_cycle, cycles in results:
+        # A segment that disagrees with its pass-1 count shifts every later cycle number.
+        if divergence is None and cycles is not None and compared != min(cycles, total - first_cycle):
+            raise DumpError(f"the segment at cycle {first_cycle} holds {compared} cycles but pass 1 "
+                            f"counted {cycles} (irregular clock?); rerun with --jobs 1")
+    divergences = [d for d, *_ in results if d is not None]
+    if divergences:
+        divergence = min(divergences)
+        return divergence, divergence[0], total
+    return None, min(sum(c for _, c, _, _ in results), total), total
+
+def report(reference_path, divergence, context=4):
+    """Lines describing a divergence: the reference records leading up to it, then the difference."""
+    cycle, signal, expected, actual = divergence
+    reader = _reference(reference_path)
+    lines = [f"First divergence at cycle {cycle}, pc {reader[cycle].pc:#010x}:"]
+    for r in reader.records(max(0, cycle - context), cycle + 1):
+        lines.append(("> " if r.cycle == cycle else "  ") + format_record(r))
+    lines.append(f"  {signal}: reference {expected}, dump {actual}")
+    return lines
+
+def main():
+    parser = argparse.ArgumentParser(description="Check a Verilog/Digital signal dump against the simulator, cycle by cycle")
+    parser.add_argument("reference", help="Reference: exectrace .trace file, or a .asm/.hex program to simulate")
+    parser.add_argument("dump", help="Dump of the design: .vcd, Digital .csv export, or .trace")
+    parser.add_argument("--signal", "-s", action="append", default=[], metavar="KEY=NAME",
+                        help=f"Dump signal for a key ({', '.join(DEFAULT_SIGNALS)}); repeatable")
+    parser.add_argument("--jobs", "-j", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--segment-mb", type=int, default=DEFAULT_SEGMENT_MB, metavar="MB",
+                        help=f"Dump bytes per parallel segment (default {DEFAULT_SEGMENT_MB})")
+    parser.add_argument("--data", metavar="IMAGE", help="Data Memory image when the reference is a .hex program")
+    parser.add_argument("--max-cycles", "-n", type=int, default=DEFAULT_MAX_CYCLES,
+                        help="Instruction limit when simulating the reference")
+    args = parser.parse_args()
+
+    requested = {}
+    for spec in args.signal:
+        key, sep, name = spec.partition('=')
+        if not sep or key not in DEFAULT_SIGNALS or not name:
+            parser.error(f"--signal expects KEY=NAME with KEY one of {', '.join(DEFAULT_SIGNALS)}")
+        requested[key] = name
+
+    reference = os.path.expanduser(args.reference)
+    temporary = None
+    try:
+        if reference.lower().endswith(('.asm', '.hex')):
+            kwargs = {'ram_image': read_hex_file(os.path.expanduser(args.data))} if args.data else {}
+            sim = Simulator.from_file(reference, **kwargs)
+            fd, temporary = tempfile.mkstemp(suffix='.trace')
+            os.close(fd)
+            record_trace(sim, temporary, max_cycles=args.max_cycles)
+            reference = temporary
+        dump = open_dump(os.path.expanduser(args.dump), requested)
+        divergence, compared, total = check(reference, dump, args.jobs, args.segment_mb)
+        if divergence is not None:
+            print("\n".join(report(reference, divergence)))
+        elif compared < total:
+            print(f"No divergence in {compared} cycles; the dump ends before the reference's {total}")
+        else:
+            print(f"No divergence in {compared} cycles (the whole reference trace)")
+    except (AssemblyError, SimulationError, TraceError, DumpError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
+    finally:
+        for reader in _readers.values():
+            reader.close()
+        if temporary:
+            os.remove(temporary)
+    sys.exit(1 if divergence is not None else 0)
+
+if __name__ == "__main__":
+    main()